@@ -50,58 +50,51 @@
 # if __name__ == "__main__":
 #     chat_with_memory_and_save()
 
-import os
-import json
 from datetime import datetime
-from openai import OpenAI
+import llm_client
+from conversation_store import get_store
 
-client = OpenAI()
+store = get_store()
 
-CONVO_DIR = "conversations"
-os.makedirs(CONVO_DIR, exist_ok=True)
-
-def save_conversation(messages, filename):
-    """Save conversation to JSON for easy reload."""
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(messages, f, indent=2, ensure_ascii=False)
-    print(f"💾 Conversation saved to {filename}")
+def save_conversation(messages, session_id):
+    """Append the not-yet-saved messages to the conversation store."""
+    store.extend(session_id, messages)
+    print(f"💾 Conversation saved as {session_id}")
 
 def load_conversation():
     """List available conversations and let user pick one to load."""
-    files = [f for f in os.listdir(CONVO_DIR) if f.endswith(".json")]
-    if not files:
+    sessions = store.list_sessions()
+    if not sessions:
         print("No saved conversations found. Starting a new one.\n")
-        return [
+        return None, [
             {"role": "system", "content": "You are a friendly and helpful AI assistant."}
         ]
 
     print("📁 Saved conversations:")
-    for i, file in enumerate(files, 1):
-        print(f"{i}. {file}")
+    for i, session_id in enumerate(sessions, 1):
+        print(f"{i}. {session_id}")
 
     choice = input("\nEnter number to load, or press Enter for a new chat: ").strip()
     if not choice:
-        return [
+        return None, [
             {"role": "system", "content": "You are a friendly and helpful AI assistant."}
         ]
 
     try:
         idx = int(choice) - 1
-        filename = os.path.join(CONVO_DIR, files[idx])
-        with open(filename, "r", encoding="utf-8") as f:
-            messages = json.load(f)
-        print(f"✅ Loaded conversation: {files[idx]}\n")
-        return messages
+        messages = store.load(sessions[idx])
+        print(f"✅ Loaded conversation: {sessions[idx]}\n")
+        return sessions[idx], messages
     except (ValueError, IndexError):
         print("❌ Invalid choice. Starting a new chat.\n")
-        return [
+        return None, [
             {"role": "system", "content": "You are a friendly and helpful AI assistant."}
         ]
 
 def chat_with_reload():
     """Chat that can load previous memory and save progress."""
-    messages = load_conversation()
-    filename = os.path.join(CONVO_DIR, f"chat_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    session_id, messages = load_conversation()
+    session_id = session_id or f"chat_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
 
     print("🤖 Chat started! Type '/save', '/exit', or '/reset' anytime.\n")
 
@@ -109,14 +102,15 @@ def chat_with_reload():
         user_input = input("You: ").strip()
 
         if user_input.lower() in {"/exit", "exit", "quit"}:
-            save_conversation(messages, filename)
+            save_conversation(messages, session_id)
             print("👋 Goodbye!")
             break
         elif user_input.lower() in {"/save"}:
-            save_conversation(messages, filename)
+            save_conversation(messages, session_id)
             continue
         elif user_input.lower() in {"/reset"}:
             print("🔄 Conversation reset.\n")
+            session_id = f"chat_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
             messages = [
                 {"role": "system", "content": "You are a friendly and helpful AI assistant."}
             ]
@@ -126,12 +120,7 @@ def chat_with_reload():
         messages.append({"role": "user", "content": user_input})
 
         # Get GPT response
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-
-        reply = response.choices[0].message.content
+        reply = llm_client.complete(messages)
         print(f"AI: {reply}\n")
 
         # Add assistant response to memory
@@ -42,9 +42,7 @@
 # for model in models.data:
 #     print(model.id)
 
-from openai import OpenAI
-
-client = OpenAI()
+import llm_client
 
 def chat_with_memory():
     """Simple terminal chat with conversation memory."""
@@ -64,13 +62,7 @@ def chat_with_memory():
         messages.append({"role": "user", "content": user_input})
 
         # Send the full conversation so far
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-
-        # Get assistant's reply
-        reply = response.choices[0].message.content
+        reply = llm_client.complete(messages)
         print(f"AI: {reply}\n")
 
         # Add assistant message to memory
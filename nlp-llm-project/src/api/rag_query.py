@@ -1,10 +1,74 @@
-# src/api/rag_query.py (pseudocode)
-from openai import OpenAI   # hypothetical
-from chromadb import Client
-def answer_query(query):
-    # 1. embed query -> retrieve docs
-    docs = vector_db.query(query, top_k=5)
-    context = "\n\n".join([d["text"] for d in docs])
-    prompt = f"You are an assistant. Use the following context to answer the question.\n\nContext:\n{context}\n\nQuestion:\n{query}\n\nAnswer:"
-    resp = openai.chat.completions.create(model="gpt-4o-mini", messages=[{"role":"user","content":prompt}])
-    return resp.choices[0].message.content
+# src/api/rag_query.py
+import sys
+import json
+
+import llm_client
+from models.templates import RAG_SYSTEM_PROMPT, RAG_USER_TEMPLATE
+from retrieval import RAG_CONTEXT_TOKENS, get_retriever, timed
+from semantic_cache import SemanticCache
+
+answer_cache = SemanticCache("rag")
+
+
+def build_messages(query, context):
+    return [
+        {"role": "system", "content": RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": RAG_USER_TEMPLATE.format(context=context, question=query)},
+    ]
+
+
+def answer_partition(top_k, budget):
+    """Answers are only reusable for the same model, retrieval settings and corpus version."""
+    index = get_retriever().index
+    return json.dumps([llm_client.LLM_MODEL, top_k, budget, index.count, index.live_count])
+
+
+def run_query(query, top_k=5, budget=RAG_CONTEXT_TOKENS, no_cache=False):
+    """Answer a question from the indexed corpus; returns the answer, its sources and stage timings (ms)."""
+    timings = {}
+    partition = answer_partition(top_k, budget)
+    if no_cache:
+        answer_cache.record_rejection(query, partition)
+    else:
+        with timed(timings, "cache"):
+            hit = answer_cache.get(query, partition)
+        if hit is not None:
+            result, similarity = hit
+            return {**result, "cached": similarity, "timings": {stage: round(ms, 2) for stage, ms in timings.items()}}
+
+    with timed(timings, "total"):
+        context, hits = get_retriever().build_context(query, k=top_k, budget=budget, timings=timings)
+        with timed(timings, "llm"):
+            answer = llm_client.complete(build_messages(query, context))
+    result = {
+        "answer": answer,
+        "sources": [{"doc_id": h["doc_id"], "source": h["source"], "score": h["score"]} for h in hits],
+    }
+    answer_cache.set(query, partition, result)
+    return {**result, "cached": None, "timings": {stage: round(ms, 2) for stage, ms in timings.items()}}
+
+
+def answer_query(query, top_k=5):
+    return run_query(query, top_k)["answer"]
+
+
+def index_files(paths):
+    """Add text files to the index, one document per file."""
+    docs = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            docs.append((path, f.read()))
+    return get_retriever().add_documents(docs, source="file")
+
+
+if __name__ == "__main__":
+    # python -m api.rag_query index notes/*.txt   (whole folders: python ingest.py <dir>)
+    # python -m api.rag_query ask "What is photosynthesis?"
+    if len(sys.argv) > 2 and sys.argv[1] == "index":
+        print(f"Indexed {index_files(sys.argv[2:])} chunks")
+    elif len(sys.argv) > 2 and sys.argv[1] == "ask":
+        result = run_query(" ".join(sys.argv[2:]))
+        print(result["answer"])
+        print(json.dumps({k: result[k] for k in ("sources", "cached", "timings")}, indent=2))
+    else:
+        print("Usage: python -m api.rag_query index <files...> | ask <question>")
@@ -1,17 +1,14 @@
-from openai import OpenAI
+import llm_client
 
-client = OpenAI()
-
-def chat(prompt, model="gpt-4o-mini"):
+def chat(prompt, model=None):
     """Send a prompt to the GPT model and return its response."""
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
+    return llm_client.complete(
+        [
             {"role": "system", "content": "You are a helpful AI assistant."},
             {"role": "user", "content": prompt}
-        ]
+        ],
+        model=model,
     )
-    return response.choices[0].message.content
 
 # Example usage
 if __name__ == "__main__":
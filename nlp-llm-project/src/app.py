@@ -1,31 +1,52 @@
 import os
 import json
+import math
+import asyncio
 import random
 import socket
 import time
 import threading
-import webbrowser
 from datetime import datetime
 from typing import List, Optional
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
-from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel, validator
-from openai import OpenAI
-import requests
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
-
-client = OpenAI() 
-templates = Jinja2Templates(directory="templates")
+from urllib.parse import quote
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError, validator
+import llm_client
+import metrics
+import profiling
+import prewarm
+from quiz_cache import QuizCache, make_key
+from single_flight import SingleFlight
+import quiz_parser
+from quiz_parser import IncrementalArrayParser, PARSE_ERROR_ANSWER
+from conversation_store import get_store as get_conversation_store
+from context_window import PromptTokenStats, fit_messages
+from rate_limit import AsyncTokenBucket
+from pdf_export import PDFRenderer, RenderQueueFull, pdf_key
+from quiz_store import QuizStore
+from question_bank import QuestionBank
+from semantic_cache import SemanticCache
+
+_templates = None
+
+def get_templates():
+    """Jinja2 is only needed for the UI page, so it is loaded on first visit."""
+    global _templates
+    if _templates is None:
+        from fastapi.templating import Jinja2Templates
+
+        _templates = Jinja2Templates(directory="templates")
+    return _templates
 
 app = FastAPI(
     title="Educational Quiz API",
     description="Generates structured educational quizzes with multiple difficulty levels",
     version="1.0"
 )
+app.add_middleware(metrics.MetricsMiddleware)
+profile_store = profiling.ProfileStore()
+app.add_middleware(profiling.ProfilingMiddleware, store=profile_store)
 
 @app.get("/", response_class=HTMLResponse)
 async def index_redirect():
@@ -35,7 +56,7 @@ async def index_redirect():
 @app.get("/ui", response_class=HTMLResponse)
 async def serve_ui(request: Request):
     """Serve main quiz page."""
-    return templates.TemplateResponse("index.html", {"request": request})
+    return get_templates().TemplateResponse(request, "index.html")
 
 @app.get("/health")
 async def health():
@@ -45,9 +66,10 @@ async def health():
 
 CONVO_DIR = "conversations"
 os.makedirs(CONVO_DIR, exist_ok=True)
+conversation_store = get_conversation_store()
 
-def conversation_file(session_id: str) -> str:
-    return os.path.join(CONVO_DIR, f"{session_id}.json")
+def new_session_id() -> str:
+    return datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
 
 def load_conversation(session_id: Optional[str] = None):
     """Load or create a new LLM conversation."""
@@ -61,21 +83,16 @@ def load_conversation(session_id: Optional[str] = None):
     }
 
     if not session_id:
-        session_id = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
-        return session_id, [base_system_msg]
-
-    path = conversation_file(session_id)
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            messages = json.load(f)
-    else:
+        return new_session_id(), [base_system_msg]
+
+    messages = conversation_store.load(session_id)
+    if not messages:
         messages = [base_system_msg]
     return session_id, messages
 
-def save_conversation(session_id: str, messages: List[dict]):
-    path = conversation_file(session_id)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(messages, f, indent=2, ensure_ascii=False)
+async def save_conversation(session_id: str, messages: List[dict]):
+    """Append the messages added this turn (earlier history is never rewritten) in a worker thread."""
+    await asyncio.to_thread(conversation_store.extend, session_id, messages)
 
 ALLOWED_DIFFICULTIES = {"easy", "medium", "hard"}
 FORBIDDEN_WORDS = ["gambling", "politics", "violence", "porn", "drugs"]
@@ -85,6 +102,7 @@ class QuizRequest(BaseModel):
     difficulties: Optional[List[str]] = ["medium"]
     hide_answers: Optional[bool] = False
     session_id: Optional[str] = None
+    no_cache: Optional[bool] = False
 
     @validator("topic")
     def topic_must_be_safe(cls, v):
@@ -114,42 +132,36 @@ class QuizResponse(BaseModel):
     topic: str
     quiz: List[QuizQuestion]
     session_id: str
+    quiz_id: Optional[str] = None
+
+def quiz_response_format() -> Optional[dict]:
+    return quiz_parser.QUIZ_RESPONSE_FORMAT if QUIZ_JSON_SCHEMA else None
 
-def query_llm(messages: List[dict]) -> str:
-    """Call the OpenAI API safely and return raw text."""
+async def query_llm(messages: List[dict]) -> str:
+    """Call the LLM backend without blocking the event loop and return raw text.
+
+    If the backend stays rate limited or down after llm_client's retries the
+    caller gets a 503 with Retry-After instead of a 500.
+    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-        return response.choices[0].message.content
+        return await llm_client.chat_completion(messages, response_format=quiz_response_format())
+    except llm_client.LLMUnavailable as e:
+        print("Error: LLM unavailable:", e)
+        raise HTTPException(status_code=503, detail="LLM temporarily unavailable, retry later",
+                            headers={"Retry-After": str(math.ceil(e.retry_after or 1))})
     except Exception as e:
         return f"Error: {e}"
 
+# Ask for schema-constrained JSON output (set QUIZ_JSON_SCHEMA=0 for models without it).
+QUIZ_JSON_SCHEMA = os.getenv("QUIZ_JSON_SCHEMA", "1") == "1"
+
 def parse_quiz_json(quiz_str: str) -> List[QuizQuestion]:
     """Parse LLM quiz JSON output into structured questions."""
-    try:
-        quiz_str = quiz_str.strip().removeprefix("```json").removesuffix("```").strip()
-        data = json.loads(quiz_str)
-        if not isinstance(data, list):
-            raise ValueError("Expected a list of questions")
-        questions = []
-        for q in data:
-            difficulty = q.get("difficulty", "medium")
-            questions.append(
-                QuizQuestion(
-                    question=q["question"],
-                    type=q["type"],
-                    options=q.get("options"),
-                    answer=q["answer"],
-                    difficulty=difficulty,
-                    show_answer=q.get("show_answer", True)
-                )
-            )
-        return questions
-    except Exception as e:
-        print("JSON parse failed:", e)
-        return [QuizQuestion(question=quiz_str, type="short-answer", answer="(Error parsing quiz)", difficulty="medium")]
+    return quiz_parser.parse_quiz_json(quiz_str, QuizQuestion)
+
+def build_question(q: dict) -> QuizQuestion:
+    """Validate one raw question object from the LLM."""
+    return quiz_parser.build_question(q, QuizQuestion)
 
 def shuffle_multiple_choice(questions: List[QuizQuestion]) -> List[QuizQuestion]:
     for q in questions:
@@ -159,21 +171,79 @@ def shuffle_multiple_choice(questions: List[QuizQuestion]) -> List[QuizQuestion]
             random.shuffle(q.options)
     return questions
 
-@app.post("/quiz")
-async def generate_quiz(req: QuizRequest):
-    """Generate an educational quiz."""
-    session_id, messages = load_conversation(req.session_id)
+# Bump when the quiz prompt changes so old cache entries stop matching.
+PROMPT_VERSION = "quiz-v2"
+quiz_cache = QuizCache()
+quiz_flights = SingleFlight()
+quiz_store = QuizStore()
+question_bank = QuestionBank()
+semantic_quiz_cache = SemanticCache("quiz")
+
+prompt_stats = PromptTokenStats()
+
+def fit_context(messages: List[dict]):
+    """Trim session history to the prompt-token budget; returns (prompt, prompt_tokens)."""
+    prompt, prompt_tokens = fit_messages(messages)
+    prompt_stats.record(prompt_tokens, trimmed=len(prompt) != len(messages))
+    return prompt, prompt_tokens
 
-    messages.append({
+def quiz_prompt(req: QuizRequest) -> dict:
+    return {
         "role": "user",
         "content": (
             f"Create a JSON quiz about '{req.topic}' "
             f"with {', '.join(req.difficulties)} difficulty questions. "
             "Each question must include question, type, options (if applicable), answer, and difficulty."
         )
-    })
+    }
 
-    raw_output = query_llm(messages)
+def quiz_cache_key(req: QuizRequest) -> str:
+    return make_key(req.topic, req.difficulties, llm_client.LLM_MODEL, PROMPT_VERSION)
+
+def quiz_partition(req: QuizRequest) -> str:
+    """What must match exactly for a semantic cache hit: difficulty set, model and prompt version."""
+    return json.dumps([sorted({d.lower() for d in req.difficulties}), llm_client.LLM_MODEL, PROMPT_VERSION])
+
+async def cached_quiz(req: QuizRequest, key: str) -> Optional[List[dict]]:
+    """Exact cache first, then the semantic cache (a near hit is copied into the exact cache)."""
+    if req.no_cache:
+        quiz_cache.record_bypass()
+        semantic_quiz_cache.record_rejection(req.topic, quiz_partition(req))
+        return None
+    with metrics.span("cache_lookup"):
+        cached = quiz_cache.get(key)
+        if cached is None:
+            hit = await asyncio.to_thread(semantic_quiz_cache.get, req.topic, quiz_partition(req))
+            if hit is not None:
+                cached = hit[0]
+                quiz_cache.set(key, cached)
+    return cached
+
+async def cache_quiz(req: QuizRequest, key: str, questions: List[dict]):
+    with metrics.span("cache_store"):
+        quiz_cache.set(key, questions)
+        await asyncio.to_thread(semantic_quiz_cache.set, req.topic, quiz_partition(req), questions)
+    with metrics.span("bank_store"):
+        await asyncio.to_thread(question_bank.add, req.topic, questions, llm_client.LLM_MODEL, PROMPT_VERSION)
+
+async def bank_quiz(req: QuizRequest) -> Optional[List[dict]]:
+    """A quiz assembled from stored questions, when the bank has enough fresh ones for the request."""
+    if req.no_cache or not question_bank.serve:
+        return None
+    with metrics.span("question_bank"):
+        return await asyncio.to_thread(question_bank.assemble, req.topic, req.difficulties, PROMPT_VERSION)
+
+async def ready_quiz(req: QuizRequest, key: str) -> Optional[List[dict]]:
+    """A quiz that needs no LLM call (quiz cache, then question bank); counts the request for pre-generation."""
+    cached = await cached_quiz(req, key)
+    if cached is None:
+        cached = await bank_quiz(req)
+    prewarmer.record_request(req.topic, req.difficulties, cached is not None)
+    return cached
+
+async def _generate_quiz_questions(req: QuizRequest, key: str, messages: List[dict]) -> List[QuizQuestion]:
+    with metrics.span("query_llm"):
+        raw_output = await query_llm(messages)
 
     if raw_output.startswith("Error:"):
         print(raw_output)
@@ -181,47 +251,356 @@ async def generate_quiz(req: QuizRequest):
 
     print("Raw LLM output:\n", raw_output[:300])  # show partial for debugging
 
-    questions = parse_quiz_json(raw_output)
-    questions = shuffle_multiple_choice(questions)
-    save_conversation(session_id, messages)
+    with metrics.span("parse_quiz_json"):
+        questions = parse_quiz_json(raw_output)
+    if not (len(questions) == 1 and questions[0].answer == PARSE_ERROR_ANSWER):
+        await cache_quiz(req, key, [q.model_dump() for q in questions])
+    return questions
 
-    return QuizResponse(topic=req.topic, quiz=questions, session_id=session_id)
+async def get_quiz_questions(req: QuizRequest, messages: List[dict]) -> List[QuizQuestion]:
+    """Return parsed questions for a request, from the quiz cache or question bank when possible.
+
+    Concurrent misses for the same key share one LLM call (the first caller's
+    messages are sent); every caller gets its own copy to shuffle.
+    """
+    key = quiz_cache_key(req)
+    cached = await ready_quiz(req, key)
+    if cached is not None:
+        return [QuizQuestion(**q) for q in cached]
+
+    questions = await quiz_flights.do(key, lambda: _generate_quiz_questions(req, key, messages))
+    return [q.model_copy(deep=True) for q in questions]
+
+def quiz_is_warm(topic: str, difficulties: List[str]) -> bool:
+    """Is a quiz cached for the combination with at least half its TTL left (so it outlasts the next peak)?"""
+    stored = quiz_cache.stored_at(make_key(topic, difficulties, llm_client.LLM_MODEL, PROMPT_VERSION))
+    return stored is not None and (quiz_cache.ttl <= 0 or time.time() - stored < quiz_cache.ttl / 2)
+
+async def prewarm_quiz(topic: str, difficulties: List[str]):
+    """Generate and store one quiz the way a sessionless /quiz cache miss would."""
+    req = QuizRequest(topic=topic, difficulties=difficulties)
+    key = quiz_cache_key(req)
+    _, messages = load_conversation()
+    messages.append(quiz_prompt(req))
+    with metrics.track("prewarm"):
+        await quiz_flights.do(key, lambda: _generate_quiz_questions(req, key, messages))
+
+prewarmer = prewarm.Prewarmer(conversation_store.user_messages, quiz_is_warm, prewarm_quiz)
+
+async def run_quiz(req: QuizRequest):
+    """One quiz turn: load session, call the LLM (or cache), save. Returns (response, prompt_tokens)."""
+    session_id = req.session_id or new_session_id()
+    async with conversation_store.lock(session_id):
+        with metrics.span("load_conversation"):
+            session_id, messages = load_conversation(session_id)
+        messages.append(quiz_prompt(req))
+        with metrics.span("fit_context"):
+            prompt, prompt_tokens = fit_context(messages)
+
+        questions = await get_quiz_questions(req, prompt)
+        with metrics.span("shuffle_multiple_choice"):
+            questions = shuffle_multiple_choice(questions)
+        with metrics.span("save_conversation"):
+            await save_conversation(session_id, messages)
+
+    with metrics.span("save_quiz"):
+        quiz_id = await asyncio.to_thread(quiz_store.save, req.topic, [q.model_dump() for q in questions],
+                                          req.hide_answers, session_id)
+    return QuizResponse(topic=req.topic, quiz=questions, session_id=session_id, quiz_id=quiz_id), prompt_tokens
 
-def generate_quiz_pdf(topic: str, questions: List[QuizQuestion], hide_answers: bool = False) -> str:
-    """Generate and save a quiz PDF."""
-    os.makedirs("exports", exist_ok=True)
-    filename = f"quiz_{topic.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    filepath = os.path.join("exports", filename)
+@app.post("/quiz")
+async def generate_quiz(req: QuizRequest, response: Response):
+    """Generate an educational quiz."""
+    with metrics.track("quiz"):
+        result, prompt_tokens = await run_quiz(req)
+    response.headers["X-Prompt-Tokens"] = str(prompt_tokens)
+    return result
+
+async def stream_quiz_questions(messages: List[dict], cached: Optional[List[dict]] = None):
+    """Yield validated questions as soon as each object in the LLM stream closes."""
+    if cached is not None:
+        for q in cached:
+            yield QuizQuestion(**q)
+        return
 
-    doc = SimpleDocTemplate(filepath, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = [
-        Paragraph(f"<b>Quiz Topic:</b> {topic.title()}", styles["Title"]),
-        Spacer(1, 0.3 * inch)
-    ]
+    parser = IncrementalArrayParser()
+    deltas, emitted = [], 0
+    async for delta in llm_client.stream_chat_completion(messages, response_format=quiz_response_format()):
+        deltas.append(delta)
+        for obj in parser.feed(delta):
+            try:
+                yield build_question(obj)
+                emitted += 1
+            except Exception as e:
+                print("Skipping invalid streamed question:", e)
+    if emitted:
+        return
 
-    for i, q in enumerate(questions, 1):
-        story.append(Paragraph(f"<b>{i}. {q.question}</b>", styles["Normal"]))
-        if q.type == "multiple-choice" and q.options:
-            story.append(ListFlowable([ListItem(Paragraph(opt, styles["Normal"])) for opt in q.options]))
-        if not hide_answers:
-            story.append(Paragraph(f"<i>Answer:</i> {q.answer}", styles["Italic"]))
-        story.append(Spacer(1, 0.2 * inch))
+    # nothing came out incrementally (e.g. bracketed prose before the array): parse the whole reply
+    with metrics.span("parse_quiz_json"):
+        questions = parse_quiz_json("".join(deltas))
+    if len(questions) == 1 and questions[0].answer == PARSE_ERROR_ANSWER:
+        raise quiz_parser.QuizParseError("No questions in streamed model output")
+    for q in questions:
+        yield q
+
+def ndjson_line(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+@app.post("/quiz/stream")
+async def generate_quiz_stream(req: QuizRequest):
+    """Generate a quiz and stream questions as NDJSON events while the LLM is still writing.
+
+    Events: start (session id), question (one per question), then done or error.
+    """
+    session_id = req.session_id or new_session_id()
+    key = quiz_cache_key(req)
+    cached = await ready_quiz(req, key)
+
+    async def events():
+        yield ndjson_line({"event": "start", "topic": req.topic, "session_id": session_id})
+        with metrics.track("quiz_stream"):
+            async with conversation_store.lock(session_id):
+                with metrics.span("load_conversation"):
+                    _, messages = load_conversation(session_id)
+                messages.append(quiz_prompt(req))
+                with metrics.span("fit_context"):
+                    prompt, prompt_tokens = fit_context(messages)
+                generated, shown = [], []
+                try:
+                    with metrics.span("stream_questions"):
+                        async for q in stream_quiz_questions(prompt, cached):
+                            generated.append(q.model_dump())
+                            shuffle_multiple_choice([q])
+                            shown.append(q.model_dump())
+                            yield ndjson_line({"event": "question", "index": len(shown) - 1, "question": shown[-1]})
+                except quiz_parser.QuizParseError as e:
+                    print("Error: quiz stream failed:", e)
+                    yield ndjson_line({"event": "error", "detail": "Could not parse a quiz from the model output"})
+                    return
+                except Exception as e:
+                    print("Error: quiz stream failed:", e)
+                    yield ndjson_line({"event": "error", "detail": "OpenAI API error"})
+                    return
+
+                if cached is None and generated:
+                    await cache_quiz(req, key, generated)
+                with metrics.span("save_conversation"):
+                    await save_conversation(session_id, messages)
+            with metrics.span("save_quiz"):
+                quiz_id = (await asyncio.to_thread(quiz_store.save, req.topic, shown, req.hide_answers, session_id)
+                           if shown else None)
+        yield ndjson_line({"event": "done", "count": len(shown), "session_id": session_id,
+                           "quiz_id": quiz_id, "prompt_tokens": prompt_tokens})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_RATE_LIMIT = float(os.getenv("BATCH_RATE_LIMIT", "0"))  # quizzes started per second, 0 = unlimited
+batch_rate_limiter = AsyncTokenBucket(BATCH_RATE_LIMIT)
+
+class QuizBatchRequest(BaseModel):
+    items: List[dict]
+    concurrency: Optional[int] = None
+
+    @validator("items")
+    def items_within_limit(cls, v):
+        if not v:
+            raise ValueError("Batch must contain at least one item")
+        if len(v) > BATCH_MAX_ITEMS:
+            raise ValueError(f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+        return v
+
+    @validator("concurrency")
+    def concurrency_positive(cls, v):
+        if v is not None and v < 1:
+            raise ValueError("Concurrency must be at least 1")
+        return v
+
+@app.post("/quiz/batch")
+async def generate_quiz_batch(batch: QuizBatchRequest):
+    """Generate many quizzes concurrently and stream each result as NDJSON when it finishes.
+
+    Items are QuizRequest bodies; an invalid or failed item produces an
+    error event for its index without stopping the rest of the batch.
+    """
+    concurrency = min(batch.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int, item: dict) -> dict:
+        try:
+            req = QuizRequest(**item)
+        except ValidationError as e:
+            return {"event": "error", "index": index, "detail": e.errors(include_url=False, include_context=False)}
+        async with semaphore:
+            await batch_rate_limiter.acquire()
+            try:
+                with metrics.track("quiz_batch"):
+                    result, prompt_tokens = await run_quiz(req)
+            except HTTPException as e:
+                return {"event": "error", "index": index, "topic": req.topic, "detail": e.detail}
+            except Exception as e:
+                print(f"Error: batch item {index} failed:", e)
+                return {"event": "error", "index": index, "topic": req.topic, "detail": "Quiz generation failed"}
+        return {"event": "result", "index": index, "prompt_tokens": prompt_tokens, **result.model_dump()}
+
+    async def events():
+        tasks = [asyncio.create_task(run_item(i, item)) for i, item in enumerate(batch.items)]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event = await next_done
+                failed += event["event"] == "error"
+                yield ndjson_line(event)
+        finally:
+            for task in tasks:
+                task.cancel()
+        yield ndjson_line({"event": "done", "count": len(tasks), "failed": failed})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Quiz cache, semantic cache, question bank, pre-generation, request coalescing, prompt-size, PDF reuse, parse-failure and LLM client counters."""
+    return {**quiz_cache.stats(), **semantic_quiz_cache.stats(), **question_bank.stats(), **prewarmer.stats(),
+            **quiz_flights.stats(), **prompt_stats.stats(), **pdf_renderer.stats(), **quiz_parser.parse_stats.stats(),
+            **llm_client.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition: request/stage latency histograms, in-flight gauges, token counters and the /cache/stats counters."""
+    return PlainTextResponse(metrics.render(await cache_stats()), media_type="text/plain; version=0.0.4")
+
+def require_admin(request: Request):
+    """Admin endpoints answer only to X-Admin-Token: <PROFILE_TOKEN>, and not at all without a token configured."""
+    if not profiling.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.check_token(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request, endpoint: Optional[str] = None):
+    """Stored request profiles, newest first."""
+    require_admin(request)
+    return {"profiles": await asyncio.to_thread(profile_store.list, endpoint)}
+
+@app.get("/admin/profiles/summary")
+async def profile_summary(request: Request, endpoint: Optional[str] = None, limit: int = 20,
+                          format: str = profiling.PROFILE_FORMAT):
+    """Top functions by cumulative time across stored profiles (optionally of one endpoint)."""
+    require_admin(request)
+    return await asyncio.to_thread(profile_store.summary, endpoint, limit, format)
+
+@app.get("/admin/profiles/{name}")
+async def download_profile(name: str, request: Request):
+    """One profile file (collapsed stacks or pstats)."""
+    require_admin(request)
+    if not profile_store.valid_name(name):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(profile_store.path(name), filename=name, media_type="application/octet-stream")
+
+pdf_renderer = PDFRenderer()
+
+PDF_CHUNK_SIZE = 64 * 1024
+
+async def generate_quiz_pdf(topic: str, questions: List[QuizQuestion], hide_answers: bool = False):
+    """Render (or reuse) a quiz PDF off the event loop; returns a RenderedPDF."""
+    try:
+        return await pdf_renderer.render(topic, [q.model_dump() for q in questions], hide_answers)
+    except RenderQueueFull:
+        raise HTTPException(status_code=503, detail="PDF renderer busy, please retry")
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+def content_disposition(filename: str) -> str:
+    """Attachment header with an ASCII filename= fallback and the exact name as RFC 5987 filename*=."""
+    fallback = "".join(c if " " <= c <= "~" and c not in '"\\' else "_" for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+async def pdf_response(request: Request, topic: str, questions: List[QuizQuestion],
+                       hide_answers: bool = False, headers: Optional[dict] = None) -> Response:
+    """Stream a quiz PDF from memory, or 304 if the client already has this exact PDF."""
+    etag = f'"{pdf_key(topic, [q.model_dump() for q in questions], hide_answers)[:32]}"'
+    headers = {**(headers or {}), "ETag": etag}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    with metrics.span("render_pdf"):
+        pdf = await generate_quiz_pdf(topic, questions, hide_answers=hide_answers)
+    headers["Content-Length"] = str(len(pdf.data))
+    headers["Content-Disposition"] = content_disposition(pdf.filename)
+    view = memoryview(pdf.data)
+    chunks = (bytes(view[i:i + PDF_CHUNK_SIZE]) for i in range(0, len(view), PDF_CHUNK_SIZE))
+    return StreamingResponse(chunks, media_type="application/pdf", headers=headers)
+
+@app.post("/generate_pdf")
+async def generate_pdf_endpoint(req: QuizRequest, request: Request):
+    """Generate a quiz and return downloadable PDF."""
+    with metrics.track("generate_pdf"):
+        session_id = req.session_id or new_session_id()
+        async with conversation_store.lock(session_id):
+            with metrics.span("load_conversation"):
+                session_id, messages = load_conversation(session_id)
+            messages.append({"role": "user", "content": f"Create a quiz about {req.topic}."})
+            with metrics.span("fit_context"):
+                prompt, prompt_tokens = fit_context(messages)
+            with metrics.span("query_llm"):
+                raw_output = await query_llm(prompt)
+            with metrics.span("parse_quiz_json"):
+                questions = parse_quiz_json(raw_output)
+            with metrics.span("shuffle_multiple_choice"):
+                questions = shuffle_multiple_choice(questions)
+            with metrics.span("save_conversation"):
+                await save_conversation(session_id, messages)
+        return await pdf_response(request, req.topic, questions, hide_answers=req.hide_answers,
+                                  headers={"X-Prompt-Tokens": str(prompt_tokens)})
+
+def stored_quiz(quiz_id: str) -> dict:
+    quiz = quiz_store.get(quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return quiz
+
+# Declared before /quiz/{quiz_id} so ".pdf" isn't swallowed into the id.
+@app.get("/quiz/{quiz_id}.pdf")
+async def export_quiz_pdf(quiz_id: str, request: Request, hide_answers: Optional[bool] = None):
+    """PDF of a stored quiz, exactly as shown to the user; no LLM call."""
+    quiz = stored_quiz(quiz_id)
+    if hide_answers is None:
+        hide_answers = quiz["hide_answers"]
+    questions = [QuizQuestion(**q) for q in quiz["questions"]]
+    return await pdf_response(request, quiz["topic"], questions, hide_answers=hide_answers)
+
+@app.get("/quiz/{quiz_id}", response_model=QuizResponse)
+async def get_quiz(quiz_id: str):
+    """Fetch a previously generated quiz by id."""
+    quiz = stored_quiz(quiz_id)
+    return QuizResponse(topic=quiz["topic"], quiz=quiz["questions"], session_id=quiz["session_id"] or "",
+                        quiz_id=quiz_id)
 
-    doc.build(story)
-    return filepath
+@app.on_event("startup")
+async def load_semantic_cache():
+    """Load the embedding model for the semantic cache off the request path; lookups miss until it is ready."""
+    semantic_quiz_cache.load_in_background()
 
-@app.post("/generate_pdf", response_class=FileResponse)
-async def generate_pdf_endpoint(req: QuizRequest):
-    """Generate a quiz and return downloadable PDF."""
-    session_id, messages = load_conversation(req.session_id)
-    messages.append({"role": "user", "content": f"Create a quiz about {req.topic}."})
-    raw_output = query_llm(messages)
-    questions = parse_quiz_json(raw_output)
-    questions = shuffle_multiple_choice(questions)
-    save_conversation(session_id, messages)
-    pdf_path = generate_quiz_pdf(req.topic, questions, hide_answers=req.hide_answers)
-    return FileResponse(pdf_path, filename=os.path.basename(pdf_path), media_type="application/pdf")
+@app.on_event("startup")
+async def start_prewarm():
+    """Start pre-generating popular quizzes in the background (PREWARM=1)."""
+    if prewarm.PREWARM:
+        prewarmer.start()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    """Stop pre-generation, release pooled LLM connections and the PDF worker pool."""
+    await prewarmer.stop()
+    await llm_client.aclose()
+    pdf_renderer.shutdown()
 
 # -----------------------------------------------------
 # AUTO OPEN UI (DEV MODE ONLY)
@@ -234,6 +613,9 @@ def open_ui():
         print("Skipping auto-browser launch (production mode).")
         return
 
+    import webbrowser
+    import urllib.request
+
     def _open_browser():
         try:
             ip = socket.gethostbyname(socket.gethostname())
@@ -246,8 +628,9 @@ def open_ui():
         print(f"Waiting for FastAPI to start at {health_url} ...")
         for _ in range(20):
             try:
-                r = requests.get(health_url, timeout=0.5)
-                if r.status_code == 200:
+                with urllib.request.urlopen(health_url, timeout=0.5) as r:
+                    ready = r.status == 200
+                if ready:
                     print(f"Server is ready at {url}")
                     break
             except:
@@ -260,4 +643,4 @@ def open_ui():
         except:
             webbrowser.open(url)
 
-    threading.Thread(target=_open_browser).start()
+    threading.Thread(target=_open_browser, daemon=True).start()
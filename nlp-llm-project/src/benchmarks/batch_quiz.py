@@ -0,0 +1,46 @@
+# src/benchmarks/batch_quiz.py
+"""Wall time of POST /quiz/batch versus fan-out concurrency.
+
+Run from src/:  python -m benchmarks.batch_quiz [--topics 64] [--latency 0.3]
+
+Every item bypasses the quiz cache so each one costs a (stub) model call.
+"""
+import json
+import time
+import asyncio
+import argparse
+
+from benchmarks.stub_llm import StubLLMServer, use_stub
+
+
+async def main(args, stub):
+    import httpx
+    import app
+
+    transport = httpx.ASGITransport(app=app.app)
+    items = [{"topic": f"topic {i}", "difficulties": ["medium"], "no_cache": True} for i in range(args.topics)]
+    items.append({"topic": "   "})  # invalid on purpose: reported per item, batch still succeeds
+
+    print(f"topics={args.topics} stub latency={args.latency}s (server cap BATCH_CONCURRENCY={app.BATCH_CONCURRENCY})")
+    print(f"{'concurrency':>11} {'wall s':>8} {'quizzes/s':>10} {'errors':>7} {'upstream':>9}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        for level in args.levels:
+            calls_before = stub.calls
+            start = time.perf_counter()
+            r = await client.post("/quiz/batch", json={"items": items, "concurrency": level})
+            wall = time.perf_counter() - start
+            events = [json.loads(line) for line in r.text.splitlines() if line]
+            errors = sum(e["event"] == "error" for e in events)
+            print(f"{level:>11} {wall:>8.2f} {args.topics / wall:>10.1f} {errors:>7} {stub.calls - calls_before:>9}")
+    await app.llm_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topics", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    with StubLLMServer(latency=args.latency) as stub:
+        use_stub(stub)
+        asyncio.run(main(args, stub))
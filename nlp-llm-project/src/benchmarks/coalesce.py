@@ -0,0 +1,45 @@
+# src/benchmarks/coalesce.py
+"""Identical concurrent /quiz requests sharing one upstream call.
+
+Run from src/:  python -m benchmarks.coalesce [--clients 30] [--latency 0.5]
+
+Fires N identical requests at once against a slow local stub and reports
+the wall time, how many completion requests the stub saw and how many
+clients were coalesced onto another's call. The single-call guarantee
+itself is tested in tests/test_app.py.
+"""
+import time
+import asyncio
+import argparse
+
+from benchmarks.stub_llm import StubLLMServer, use_stub
+
+
+async def main(args, stub):
+    import httpx
+    import app
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        body = {"topic": "respiration", "difficulties": ["easy", "medium"]}
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.post("/quiz", json=body) for _ in range(args.clients)))
+        wall = time.perf_counter() - start
+        stats = (await client.get("/cache/stats")).json()
+    await app.llm_client.aclose()
+
+    assert all(r.status_code == 200 for r in responses)
+    session_ids = {r.json()["session_id"] for r in responses}
+    print(f"clients={args.clients} wall={wall:.2f}s upstream_calls={stub.calls} "
+          f"originated={stats['originated_calls']} coalesced={stats['coalesced_calls']} "
+          f"distinct_sessions={len(session_ids)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    with StubLLMServer(latency=args.latency) as stub:
+        use_stub(stub)
+        asyncio.run(main(args, stub))
@@ -0,0 +1,122 @@
+# src/benchmarks/cold_start.py
+"""Cold-start time of the API: importing app, and launch to first healthy response.
+
+Run from src/:  python -m benchmarks.cold_start [--runs 5]
+
+Each run is a fresh interpreter in a scratch directory. Reports the median
+`import app` time from -X importtime with the slowest top-level imports,
+and the median time from spawning uvicorn to a 200 from /health, and
+asserts both stay under their targets. That the modules deferred to first
+use (ReportLab, Jinja2, the OpenAI SDK, NumPy, requests, webbrowser) stay
+out of start-up, and that /ui renders once Jinja2 loads, is tested in
+tests/test_cold_start.py and tests/test_app.py.
+"""
+import os
+import sys
+import time
+import socket
+import tempfile
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+from benchmarks.stub_llm import SRC_DIR
+
+IMPORT_TARGET_MS = 600.0
+HEALTHY_TARGET_MS = 1200.0
+DEFERRED = ["reportlab", "jinja2", "openai", "numpy", "requests", "webbrowser"]
+
+
+def scratch_env() -> dict:
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, APP_ENV="benchmark", OPENAI_API_KEY="stub-key", PYTHONDONTWRITEBYTECODE="1")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def scratch_dir() -> str:
+    path = tempfile.mkdtemp(prefix="quiz-cold-")
+    os.symlink(os.path.join(SRC_DIR, "templates"), os.path.join(path, "templates"))
+    return path
+
+
+def import_run(cwd: str):
+    """(total ms, {top-level module: cumulative ms}, deferred modules that got imported)."""
+    code = ("import sys, app; "
+            f"print(','.join(m for m in {DEFERRED!r} if m in sys.modules))")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=scratch_env(),
+                          capture_output=True, text=True, check=True)
+    top, children, total = {}, {}, None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:  # children are printed before their parent
+            children[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == "app":
+                total, top = int(cumulative) / 1000, children
+            children = {}
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total, top, loaded
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def healthy_run(cwd: str) -> float:
+    """Milliseconds from spawning uvicorn until /health answers 200."""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+                            cwd=cwd, env=scratch_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            assert proc.poll() is None, "uvicorn exited during start-up"
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                    if r.status == 200:
+                        elapsed = (time.perf_counter() - start) * 1000
+                        break
+            except OSError:
+                time.sleep(0.005)
+            assert time.perf_counter() - start < 30, "no healthy response within 30s"
+        return elapsed
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(args):
+    cwd = scratch_dir()
+    import_ms, healthy_ms, slowest, loaded = [], [], {}, set()
+    for _ in range(args.runs):
+        total, top, deferred_loaded = import_run(cwd)
+        loaded.update(deferred_loaded)
+        import_ms.append(total)
+        for name, ms in top.items():
+            slowest.setdefault(name, []).append(ms)
+        healthy_ms.append(healthy_run(cwd))
+
+    print("slowest imports of app (median ms):")
+    medians = sorted(((statistics.median(v), k) for k, v in slowest.items()), reverse=True)
+    for ms, name in medians[:8]:
+        print(f"  {name:24s} {ms:7.1f}")
+    import_median, healthy_median = statistics.median(import_ms), statistics.median(healthy_ms)
+    print(f"import app: {import_median:.0f}ms median (target {IMPORT_TARGET_MS:.0f}ms)")
+    print(f"first healthy response: {healthy_median:.0f}ms median (target {HEALTHY_TARGET_MS:.0f}ms)")
+    print(f"deferred modules imported at start-up: {', '.join(sorted(loaded)) or 'none'}")
+    assert import_median < IMPORT_TARGET_MS, f"import app took {import_median:.0f}ms"
+    assert healthy_median < HEALTHY_TARGET_MS, f"first healthy response took {healthy_median:.0f}ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
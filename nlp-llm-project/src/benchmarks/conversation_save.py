@@ -0,0 +1,50 @@
+# src/benchmarks/conversation_save.py
+"""Per-turn save cost as a session grows: legacy JSON files vs. SQLite log.
+
+Run from src/:  python -m benchmarks.conversation_save [--turns 5000]
+
+Each turn appends one message and saves, the way /quiz does. The JSON store
+rewrites the whole history every time, so its cost grows with the session;
+the SQLite store only inserts the new row.
+"""
+import os
+import time
+import tempfile
+import argparse
+
+from conversation_store import JSONFileConversationStore, SQLiteConversationStore
+
+
+def run(store, turns: int, checkpoints):
+    messages = [{"role": "system", "content": "You are a helpful AI assistant that ONLY generates educational quizzes."}]
+    results = {}
+    window = []
+    for turn in range(1, turns + 1):
+        messages.append({"role": "user", "content": f"Create a JSON quiz about 'topic {turn}' with medium difficulty questions."})
+        start = time.perf_counter()
+        store.extend("bench-session", messages)
+        window.append(time.perf_counter() - start)
+        if turn in checkpoints:
+            results[turn] = sum(window[-50:]) / len(window[-50:])
+    return results
+
+
+def main(args):
+    checkpoints = [c for c in (10, 100, 500, 1000, 2000, 5000, 10000) if c <= args.turns]
+    tmp = tempfile.mkdtemp(prefix="convo-bench-")
+    stores = {
+        "json": JSONFileConversationStore(os.path.join(tmp, "json")),
+        "sqlite": SQLiteConversationStore(os.path.join(tmp, "conversations.db")),
+    }
+    results = {name: run(store, args.turns, checkpoints) for name, store in stores.items()}
+
+    print("mean save cost per turn (last 50 turns), microseconds")
+    print(f"{'messages':>9} {'json':>10} {'sqlite':>10}")
+    for c in checkpoints:
+        print(f"{c:>9} {results['json'][c] * 1e6:>10.0f} {results['sqlite'][c] * 1e6:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=5000)
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+# src/benchmarks/ingest.py
+"""Ingestion throughput and peak memory as the corpus grows.
+
+Run from src/:  python -m benchmarks.ingest [--mb 10 40]
+
+Each size runs ingest.py in a fresh process (so peak RSS is per run) with the
+hashing embedder, then re-runs it to show an unchanged corpus is skipped.
+Peak memory should stay flat across sizes: only the batches in flight are
+held, never the corpus.
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.stub_llm import SRC_DIR
+
+WORDS = ("retrieval index vector embedding token chunk corpus query answer model "
+         "frequency inverse document term score rank fusion latency memory batch").split()
+
+
+def make_corpus(root, megabytes, rng, file_kb=256):
+    os.makedirs(root, exist_ok=True)
+    for i in range(megabytes * 1024 // file_kb):
+        sentences = []
+        size = 0
+        while size < file_kb * 1024:
+            sentence = " ".join(rng.choices(WORDS, k=rng.randint(8, 20))) + "."
+            sentences.append(sentence)
+            size += len(sentence) + 1
+        with open(os.path.join(root, f"doc{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(" ".join(sentences))
+
+
+def run(root, index, workers):
+    env = dict(os.environ, EMBEDDING_BACKEND="hashing")
+    out = subprocess.run([sys.executable, os.path.join(SRC_DIR, "ingest.py"), root, "--index", index,
+                          "--workers", str(workers)], env=env, capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def main(args):
+    rng = random.Random(0)
+    for mb in args.mb:
+        work = tempfile.mkdtemp(prefix="ingest-bench-")
+        corpus = os.path.join(work, "corpus")
+        make_corpus(corpus, mb, rng)
+        index = os.path.join(work, "index")
+        print(f"corpus={mb}MB")
+        print(f"  first run: {run(corpus, index, args.workers)}")
+        print(f"  re-run:    {run(corpus, index, args.workers)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, nargs="+", default=[10, 40])
+    parser.add_argument("--workers", type=int, default=2)
+    main(parser.parse_args())
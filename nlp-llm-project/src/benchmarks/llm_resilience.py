@@ -0,0 +1,124 @@
+# src/benchmarks/llm_resilience.py
+"""Checks llm_client's retry, Retry-After, circuit breaker, rate limit and hedging
+against the local stub server, and prints what each policy costs or saves.
+
+Run from src/:  python -m benchmarks.llm_resilience
+
+Every section asserts its expected behaviour, so a non-zero exit means a
+regression.
+"""
+import os
+import sys
+import time
+import asyncio
+import statistics
+
+from benchmarks.stub_llm import StubLLMServer, SRC_DIR
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def fresh_client(stub, **kwargs):
+    import llm_client
+    from circuit_breaker import CircuitBreaker
+    from llm_providers import OpenAIProvider
+
+    breaker = kwargs.pop("breaker", CircuitBreaker(3, 0.5))
+    return llm_client.LLMClient(OpenAIProvider(base_url=stub.base_url, api_key="stub-key"), breaker=breaker, **kwargs)
+
+
+async def check_retry_after(stub):
+    stub.failures.extend([(429, 1), (503, None)])
+    client = fresh_client(stub, max_retries=3)
+    start = time.perf_counter()
+    await client.chat_completion(MESSAGES)
+    elapsed = time.perf_counter() - start
+    assert client.retries == 2 and client.rate_limited == 1, client.stats()
+    assert elapsed >= 1.0, f"Retry-After: 1 not honoured ({elapsed:.2f}s)"
+    print(f"429 (Retry-After: 1) then 503 -> success after {client.attempts} attempts in {elapsed:.2f}s")
+
+
+async def check_give_up(stub):
+    import llm_client
+
+    stub.failures.extend([(429, 0)] * 3)
+    client = fresh_client(stub, max_retries=2)
+    try:
+        await client.chat_completion(MESSAGES)
+        raise AssertionError("expected LLMUnavailable")
+    except llm_client.LLMUnavailable as e:
+        print(f"persistent 429 -> LLMUnavailable after {client.attempts} attempts (retry_after={e.retry_after})")
+    stub.failures.clear()
+
+
+async def check_breaker(stub):
+    import llm_client
+
+    stub.failures.extend([(500, None)] * 3)
+    client = fresh_client(stub, max_retries=0)
+    for _ in range(3):
+        try:
+            await client.chat_completion(MESSAGES)
+        except llm_client.LLMUnavailable:
+            pass
+    calls = stub.calls
+    start = time.perf_counter()
+    try:
+        await client.chat_completion(MESSAGES)
+        raise AssertionError("expected the open circuit to refuse the call")
+    except llm_client.LLMUnavailable as e:
+        assert "circuit open" in str(e)
+    assert stub.calls == calls, "open circuit still reached the backend"
+    print(f"3 consecutive 500s -> circuit {client.breaker.state}, next call refused in "
+          f"{(time.perf_counter() - start) * 1000:.2f}ms without reaching the backend")
+    await asyncio.sleep(0.6)
+    await client.chat_completion(MESSAGES)
+    assert client.breaker.state == "closed"
+    print("after reset timeout -> half-open trial succeeded, circuit closed")
+
+
+async def check_rate_limit(stub):
+    client = fresh_client(stub, rate=20, burst=1)
+    start = time.perf_counter()
+    await asyncio.gather(*(client.chat_completion(MESSAGES) for _ in range(21)))
+    elapsed = time.perf_counter() - start
+    assert elapsed >= 0.95, f"21 calls at 20/s finished in {elapsed:.2f}s"
+    print(f"21 calls with LLM_RATE_LIMIT=20 (burst 1) took {elapsed:.2f}s")
+
+
+async def latencies(client, n):
+    out = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await client.chat_completion(MESSAGES)
+        out.append(time.perf_counter() - start)
+    return sorted(out)
+
+
+async def check_hedging(stub):
+    stub.latency, stub.slow_every, stub.slow_latency = 0.02, 10, 0.5
+    plain = await latencies(fresh_client(stub), 100)
+    hedged_client = fresh_client(stub, hedge_delay="0.06")
+    hedged = await latencies(hedged_client, 100)
+    stub.slow_every = 0
+    p99 = lambda xs: xs[int(0.99 * len(xs)) - 1]
+    print(f"slow tail (1 in 10 takes 500ms): p50/p99 plain {statistics.median(plain) * 1000:.0f}/{p99(plain) * 1000:.0f}ms, "
+          f"hedged@60ms {statistics.median(hedged) * 1000:.0f}/{p99(hedged) * 1000:.0f}ms "
+          f"({hedged_client.hedges} hedges, {hedged_client.hedge_wins} won)")
+    assert p99(hedged) < p99(plain) / 2, "hedging did not cut the tail"
+
+
+async def main():
+    with StubLLMServer(latency=0.01, content="pong") as stub:
+        await check_retry_after(stub)
+        await check_give_up(stub)
+        await check_breaker(stub)
+        await check_rate_limit(stub)
+        await check_hedging(stub)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, SRC_DIR)
+    os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+# src/benchmarks/load_llm.py
+"""Load test for POST /quiz against a local stub model.
+
+Run from src/:  python -m benchmarks.load_llm [--latency 0.2] [--requests 64]
+
+With a non-blocking LLM call the throughput grows roughly linearly with the
+number of concurrent clients (up to LLM_MAX_CONCURRENCY), and /health stays
+fast while completions are pending.
+"""
+import time
+import asyncio
+import argparse
+
+from benchmarks.stub_llm import StubLLMServer, use_stub
+
+
+async def run_level(client, concurrency: int, total: int) -> float:
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            r = await client.post("/quiz", json={"topic": "tf-idf", "difficulties": ["easy"]})
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def health_latency(client) -> float:
+    start = time.perf_counter()
+    await client.get("/health")
+    return time.perf_counter() - start
+
+
+async def main(args):
+    import httpx
+    import app
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"backend={app.llm_client.LLM_BACKEND} stub latency={args.latency}s requests/level={args.requests}")
+        print(f"{'concurrency':>11} {'wall s':>8} {'req/s':>8} {'/health ms':>11}")
+        for level in args.levels:
+            load = asyncio.create_task(run_level(client, level, args.requests))
+            await asyncio.sleep(args.latency / 2)
+            health = await health_latency(client)
+            wall = await load
+            print(f"{level:>11} {wall:>8.2f} {args.requests / wall:>8.1f} {health * 1000:>11.1f}")
+    await app.llm_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    with StubLLMServer(latency=args.latency) as stub:
+        use_stub(stub)
+        asyncio.run(main(args))
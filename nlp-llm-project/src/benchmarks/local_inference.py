@@ -0,0 +1,105 @@
+# src/benchmarks/local_inference.py
+"""Local CPU inference: continuous batching vs one request at a time.
+
+Run from src/:  python -m benchmarks.local_inference [--model HuggingFaceTB/SmolLM2-135M-Instruct]
+                [--adapter outputs/lora-adapted] [--requests 16] [--max-new-tokens 64] [--quantize none]
+
+The baseline runs model.generate() for each request in turn (what a naive
+local backend does). The batched run sends the same requests concurrently,
+arriving a few ms apart, through LocalProvider's BatchEngine. Reported:
+generated tokens/s, per-request latency p50/p95 and peak RSS.
+Needs torch + transformers (and peft for --adapter).
+"""
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.stub_llm import SRC_DIR
+
+PROMPTS = ["photosynthesis", "the French Revolution", "TF-IDF", "neural networks", "plate tectonics",
+           "the water cycle", "binary search", "supply and demand"]
+
+
+def messages_for(i):
+    topic = PROMPTS[i % len(PROMPTS)]
+    return [{"role": "system", "content": "You generate educational quizzes as JSON."},
+            {"role": "user", "content": f"Create a JSON quiz about '{topic}' with medium difficulty questions."}]
+
+
+def peak_rss_mb():
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def p95(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+def report(label, latencies, tokens, wall):
+    print(f"{label:>22} {tokens / wall:>9.1f} {statistics.median(latencies) * 1000:>9.0f} "
+          f"{p95(latencies) * 1000:>9.0f} {wall:>7.1f} {peak_rss_mb():>8.0f}")
+
+
+def baseline(model, tokenizer, args):
+    import torch
+    from local_llm import format_prompt
+
+    latencies, tokens = [], 0
+    start = time.perf_counter()
+    for i in range(args.requests):
+        ids = torch.tensor([format_prompt(tokenizer, messages_for(i))])
+        t0 = time.perf_counter()
+        with torch.inference_mode():
+            out = model.generate(ids, max_new_tokens=args.max_new_tokens, do_sample=False,
+                                 pad_token_id=tokenizer.pad_token_id)
+        latencies.append(time.perf_counter() - t0 + (t0 - start))  # includes time queued behind earlier requests
+        tokens += out.shape[1] - ids.shape[1]
+    report("sequential generate()", latencies, tokens, time.perf_counter() - start)
+
+
+async def batched(model, tokenizer, args):
+    from local_llm import BatchEngine, LocalProvider
+
+    engine = BatchEngine(model, tokenizer, max_batch=args.max_batch, temperature=0)
+    provider = LocalProvider(max_new_tokens=args.max_new_tokens, engine=engine)
+    start = time.perf_counter()
+
+    async def one(i):
+        await asyncio.sleep(i * args.arrival_ms / 1000)
+        t0 = time.perf_counter()
+        await provider.complete(messages_for(i), "local", timeout=600)
+        return time.perf_counter() - t0
+
+    latencies = await asyncio.gather(*(one(i) for i in range(args.requests)))
+    wall = time.perf_counter() - start
+    report(f"continuous batch={args.max_batch}", latencies, engine.generated_tokens, wall)
+    print(f"{'':>22} mean batch {engine.stats()['local_mean_batch']:.1f} over {engine.steps} decode steps")
+    engine.stop()
+
+
+def main(args):
+    sys.path.insert(0, SRC_DIR)
+    from local_llm import load_model
+
+    model, tokenizer = load_model("", args.adapter, args.model, quantize=args.quantize)
+    print(f"model={args.model or 'adapter base'} adapter={args.adapter or '-'} quantize={args.quantize} "
+          f"requests={args.requests} max_new_tokens={args.max_new_tokens}")
+    print(f"{'mode':>22} {'tok/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'wall s':>7} {'rss MB':>8}")
+    baseline(model, tokenizer, args)
+    asyncio.run(batched(model, tokenizer, args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="HuggingFaceTB/SmolLM2-135M-Instruct")
+    parser.add_argument("--adapter", default="")
+    parser.add_argument("--quantize", default="none", choices=["int8", "none"])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--arrival-ms", type=float, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+# src/benchmarks/metrics_overhead.py
+"""Cost of metrics.span on the hot path, and an end-to-end /metrics check.
+
+Run from src/:  python -m benchmarks.metrics_overhead [--spans 200000]
+
+Asserts that one span (enter, exit, histogram observe) stays under
+MAX_SPAN_US microseconds, then drives /quiz, /quiz/stream and /generate_pdf
+against the stub server and checks that /metrics reports every stage, the
+in-flight gauges and the token counters in valid Prometheus text.
+"""
+import re
+import time
+import asyncio
+import argparse
+
+from benchmarks.stub_llm import StubLLMServer, use_stub
+
+MAX_SPAN_US = 5.0
+STAGES = ["load_conversation", "fit_context", "cache_lookup", "query_llm", "parse_quiz_json",
+          "shuffle_multiple_choice", "save_conversation", "save_quiz"]
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="[^"]*",?)*\})? \S+$')
+
+
+def span_cost(n: int) -> float:
+    """Microseconds per span beyond an empty loop."""
+    import metrics
+
+    def empty():
+        for _ in range(n):
+            pass
+
+    def spans():
+        with metrics.track("bench"):
+            for _ in range(n):
+                with metrics.span("bench"):
+                    pass
+
+    best = []
+    for fn in (empty, spans):
+        runs = []
+        for _ in range(3):
+            start = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - start)
+        best.append(min(runs))
+    return (best[1] - best[0]) / n * 1e6
+
+
+async def drive_app():
+    import httpx
+    import app
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+        for i in range(3):
+            r = await client.post("/quiz", json={"topic": f"metrics {i}", "difficulties": ["easy"]})
+            assert r.status_code == 200, r.text
+        r = await client.post("/quiz/stream", json={"topic": "metrics stream", "difficulties": ["hard"]})
+        assert r.status_code == 200 and '"done"' in r.text, r.text
+        r = await client.post("/generate_pdf", json={"topic": "metrics pdf", "difficulties": ["medium"]})
+        assert r.status_code == 200, r.text
+        start = time.perf_counter()
+        r = await client.get("/metrics")
+        render_ms = (time.perf_counter() - start) * 1000
+    return r, render_ms
+
+
+def check_metrics(r, render_ms):
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain"), r.headers
+    text = r.text
+    for line in text.splitlines():
+        assert line.startswith("#") or SAMPLE_LINE.match(line), f"bad exposition line: {line}"
+    for stage in STAGES:
+        assert f'quiz_stage_seconds_count{{endpoint="quiz",stage="{stage}"}} 3' in text, f"missing stage {stage}"
+    for endpoint in ("quiz_stream", "generate_pdf"):
+        assert f'quiz_stage_seconds_count{{endpoint="{endpoint}",stage="total"}} 1' in text, endpoint
+    assert 'quiz_stage_seconds_count{endpoint="generate_pdf",stage="render_pdf"} 1' in text
+    assert 'quiz_requests_in_flight{endpoint="quiz"} 0' in text
+    assert 'quiz_http_requests_total{route="/quiz",method="POST",status="200"} 3' in text
+    # 4 completions plus one stream, 50 prompt / 100 completion tokens each from the stub
+    assert 'quiz_llm_tokens_total{provider="openai",kind="prompt"} 250' in text, "token usage not counted"
+    assert 'quiz_llm_tokens_total{provider="openai",kind="completion"} 500' in text
+    series = sum(1 for line in text.splitlines() if not line.startswith("#"))
+    print(f"/metrics: {series} series, {len(text)} bytes, rendered in {render_ms:.2f}ms; all stages present")
+
+
+def main(args):
+    cost = span_cost(args.spans)
+    print(f"span overhead: {cost:.2f}us per span (limit {MAX_SPAN_US}us)")
+    assert cost < MAX_SPAN_US, f"span overhead {cost:.2f}us exceeds {MAX_SPAN_US}us"
+
+    with StubLLMServer(latency=0.01) as stub:
+        use_stub(stub)
+        check_metrics(*asyncio.run(drive_app()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=int, default=200000)
+    main(parser.parse_args())
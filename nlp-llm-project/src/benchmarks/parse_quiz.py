@@ -0,0 +1,82 @@
+# src/benchmarks/parse_quiz.py
+"""Fallback rate and parse time: legacy parse_quiz_json versus quiz_parser.
+
+Run from src/:  python -m benchmarks.parse_quiz [--size 2000]
+
+The corpus mimics what chat models actually return: clean arrays, code
+fences, chatty preambles, trailing commas, single quotes, Python literals,
+structured-output objects and completions cut off mid-object.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from benchmarks.stub_llm import SAMPLE_QUIZ, SRC_DIR
+
+
+def legacy_parse(quiz_str, model):
+    """parse_quiz_json as it was before quiz_parser.py (fence strip + json.loads)."""
+    try:
+        quiz_str = quiz_str.strip().removeprefix("```json").removesuffix("```").strip()
+        data = json.loads(quiz_str)
+        if not isinstance(data, list):
+            raise ValueError("Expected a list of questions")
+        return [model(question=q["question"], type=q["type"], options=q.get("options"), answer=q["answer"],
+                      difficulty=q.get("difficulty", "medium"), show_answer=q.get("show_answer", True))
+                for q in data]
+    except Exception:
+        return [model(question=quiz_str, type="short-answer", answer="(Error parsing quiz)", difficulty="medium")]
+
+
+def make_quiz(rng):
+    return [dict(rng.choice(SAMPLE_QUIZ), question=f"Question {i}?") for i in range(rng.randint(3, 10))]
+
+
+def python_repr(quiz):
+    return repr([dict(q, show_answer=True) for q in quiz])
+
+
+VARIANTS = {
+    "clean": lambda q: json.dumps(q),
+    "fenced": lambda q: "```json\n" + json.dumps(q, indent=2) + "\n```",
+    "preamble": lambda q: "Sure! Here is your quiz:\n\n" + json.dumps(q, indent=2) + "\n\nGood luck!",
+    "trailing_comma": lambda q: json.dumps(q, indent=2).replace('"\n  }', '",\n  }').replace("}\n]", "},\n]"),
+    "single_quotes": python_repr,
+    "schema_object": lambda q: json.dumps({"questions": q}),
+    "truncated": lambda q: json.dumps(q)[: int(len(json.dumps(q)) * 0.8)],
+}
+
+
+def main(args):
+    sys.path.insert(0, SRC_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="parse-bench-"))
+    import quiz_parser
+    from app import QuizQuestion
+
+    rng = random.Random(0)
+    corpus = [(name, VARIANTS[name](make_quiz(rng)))
+              for name in rng.choices(list(VARIANTS), k=args.size)]
+
+    print(f"corpus={args.size} outputs")
+    print(f"{'parser':>8} {'fallbacks':>10} {'rate':>7} {'us/quiz':>8}")
+    for label, parse in [("legacy", legacy_parse), ("new", quiz_parser.parse_quiz_json)]:
+        failures = {}
+        start = time.perf_counter()
+        for name, text in corpus:
+            questions = parse(text, QuizQuestion)
+            if questions[0].answer == quiz_parser.PARSE_ERROR_ANSWER:
+                failures[name] = failures.get(name, 0) + 1
+        elapsed = time.perf_counter() - start
+        total = sum(failures.values())
+        print(f"{label:>8} {total:>10} {total / len(corpus):>7.1%} {elapsed / len(corpus) * 1e6:>8.0f}"
+              f"   {failures}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+# src/benchmarks/pdf_render.py
+"""Concurrent PDF renders: inline on the event loop versus the process pool.
+
+Run from src/:  python -m benchmarks.pdf_render [--requests 32] [--questions 40]
+
+Reports wall time and the worst event-loop stall seen by a 10 ms ticker
+(i.e. how long /health would have waited). The pool is run twice: the
+second pass hits the content-hash reuse path.
+"""
+import os
+import time
+import asyncio
+import argparse
+
+from pdf_export import PDFRenderer, render_pdf_bytes
+
+
+def make_quiz(n_questions: int, seed: int):
+    return [{
+        "question": f"Question {i} of quiz {seed}: explain term weighting in information retrieval.",
+        "type": "multiple-choice",
+        "options": [f"Option {c} for {i}" for c in "ABCD"],
+        "answer": f"Option A for {i}",
+    } for i in range(n_questions)]
+
+
+async def ticker(stop: asyncio.Event, stalls: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stalls.append(time.perf_counter() - start - 0.01)
+
+
+async def measure(render_one, quizzes):
+    stop, stalls = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, stalls))
+    start = time.perf_counter()
+    await asyncio.gather(*(render_one(i, q) for i, q in enumerate(quizzes)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await tick
+    return wall, max(stalls, default=0.0)
+
+
+async def main(args):
+    quizzes = [make_quiz(args.questions, i) for i in range(args.requests)]
+
+    async def inline(i, quiz):
+        render_pdf_bytes("tf-idf", quiz, False)
+
+    renderer = PDFRenderer(workers=args.workers)
+
+    async def pooled(i, quiz):
+        await renderer.render("tf-idf", quiz, False)
+
+    print(f"requests={args.requests} questions/quiz={args.questions} workers={args.workers}")
+    print(f"{'mode':>12} {'wall s':>8} {'max loop stall ms':>18}")
+    for name, fn in [("inline", inline), ("pool", pooled), ("pool reuse", pooled)]:
+        wall, stall = await measure(fn, quizzes)
+        print(f"{name:>12} {wall:>8.2f} {stall * 1000:>18.1f}")
+    renderer.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    asyncio.run(main(parser.parse_args()))
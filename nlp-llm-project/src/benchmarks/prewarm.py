@@ -0,0 +1,124 @@
+# src/benchmarks/prewarm.py
+"""Pre-generation off-peak, then a class-start burst.
+
+Run from src/:  python -m benchmarks.prewarm [--topics 200] [--history 600] [--peak 200]
+
+Writes a Zipf-shaped request history straight into the conversation store,
+then runs one Prewarmer round against the stub server while foreground
+traffic starts out busy, checking that the round waits for quiet, keeps to
+the call budget and concurrency, and generates only the popular
+combinations. A concurrent burst drawn from the same distribution then hits
+/quiz; reports peak coverage (requests answered from pre-generated results),
+latency of covered versus uncovered requests, and checks that a second round
+finds everything warm.
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.stub_llm import StubLLMServer, use_stub
+
+CALLS_PER_HOUR = 36000  # 10 per second, so the budget is visible in a short run
+CONCURRENCY = 3
+
+
+def zipf_topics(n: int, k: int, rng: random.Random) -> list:
+    weights = [1 / (i + 1) for i in range(n)]
+    return rng.choices(range(n), weights=weights, k=k)
+
+
+def combo(i: int) -> tuple:
+    return f"Topic {i} Photosynthesis", ["easy", "hard"] if i % 3 == 0 else ["medium"]
+
+
+async def drive(stub, args):
+    import httpx
+    import app
+    from quiz_cache import normalize_topic
+
+    rng = random.Random(0)
+    for n, i in enumerate(zipf_topics(args.topics, args.history, rng)):
+        topic, difficulties = combo(i)
+        prompt = app.quiz_prompt(app.QuizRequest(topic=topic, difficulties=difficulties))
+        app.conversation_store.append(f"history-{n}", [prompt])
+
+    prewarmer = app.prewarmer
+    prewarmer.poll = 0.05
+    generate, in_flight, peak_in_flight = prewarmer.generate, [0], [0]
+
+    async def watched(topic, difficulties):
+        assert not prewarmer.traffic.busy(), "generation started while foreground traffic was busy"
+        in_flight[0] += 1
+        peak_in_flight[0] = max(peak_in_flight[0], in_flight[0])
+        try:
+            await generate(topic, difficulties)
+        finally:
+            in_flight[0] -= 1
+
+    prewarmer.generate = watched
+    for _ in range(20):
+        prewarmer.traffic.record()  # a busy spell just before the round
+    start = time.perf_counter()
+    generated = await prewarmer.run_once()
+    round_s = time.perf_counter() - start
+    stats = prewarmer.stats()
+    assert stats["prewarm_pauses"] >= 1 and stats["prewarm_paused_seconds"] > 0, stats
+    assert peak_in_flight[0] <= CONCURRENCY, f"{peak_in_flight[0]} generations in flight"
+    min_round_s = (generated - 1) / (CALLS_PER_HOUR / 3600) + stats["prewarm_paused_seconds"]
+    assert round_s >= min_round_s * 0.9, f"round took {round_s:.2f}s, budget allows no less than {min_round_s:.2f}s"
+    assert stub.calls == generated and 0 < generated <= prewarmer.top_n, (stub.calls, generated)
+    print(f"round: {generated} combinations pre-generated in {round_s:.2f}s "
+          f"(paused {stats['prewarm_paused_seconds']:.2f}s, peak {peak_in_flight[0]} in flight)")
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def one(i):
+            topic, difficulties = combo(i)
+            warm = (normalize_topic(topic), tuple(sorted(difficulties))) in prewarmer.prewarmed
+            t = time.perf_counter()
+            r = await client.post("/quiz", json={"topic": topic, "difficulties": difficulties})
+            assert r.status_code == 200, r.text
+            return warm, (time.perf_counter() - t) * 1000
+
+        for _ in range(20):
+            prewarmer.traffic.record()  # class starts: the burst counts as peak from its first request
+        calls = stub.calls
+        results = await asyncio.gather(*(one(i) for i in zipf_topics(args.topics, args.peak, rng)))
+        r = await client.get("/metrics")
+
+    stats = prewarmer.stats()
+    warm_ms = [ms for warm, ms in results if warm]
+    cold_ms = [ms for warm, ms in results if not warm]
+    assert stats["prewarm_peak_requests"] == args.peak, stats
+    assert stats["prewarm_peak_covered"] == len(warm_ms), (stats, len(warm_ms))
+    assert f"quiz_prewarm_peak_coverage {stats['prewarm_peak_coverage']!r}" in r.text, "coverage not exported"
+    print(f"peak: {args.peak} requests, coverage {stats['prewarm_peak_coverage']:.0%}, "
+          f"{stub.calls - calls} model calls; median latency covered "
+          f"{statistics.median(warm_ms):.1f}ms vs not {statistics.median(cold_ms) if cold_ms else 0:.1f}ms")
+
+    again = await prewarmer.run_once()
+    assert again == 0 and prewarmer.stats()["prewarm_already_warm"] >= generated, prewarmer.stats()
+    print(f"second round: nothing to do, {prewarmer.stats()['prewarm_already_warm']} combinations already warm")
+
+
+def main(args):
+    os.environ["PREWARM_CALLS_PER_HOUR"] = str(CALLS_PER_HOUR)
+    os.environ["PREWARM_CONCURRENCY"] = str(CONCURRENCY)
+    os.environ["PREWARM_WINDOW"] = "1"
+    os.environ["PREWARM_QUIET_RPS"] = "5"
+    os.environ["QUESTION_BANK_SERVE"] = "0"  # coverage from the quiz cache alone
+    with StubLLMServer(latency=args.llm_latency) as stub:
+        use_stub(stub)
+        asyncio.run(drive(stub, args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--history", type=int, default=600)
+    parser.add_argument("--peak", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    main(parser.parse_args())
@@ -0,0 +1,122 @@
+# src/benchmarks/profiling_check.py
+"""End-to-end check of request profiling, and what it costs.
+
+Run from src/:  python -m benchmarks.profiling_check [--requests 20]
+
+Against the stub server, forces profiles of /quiz and /generate_pdf with the
+X-Profile header in both formats, then checks that /admin/profiles lists
+them, refuses wrong tokens, serves the files, summarises them (with the
+ReportLab layout visible under /generate_pdf) and rotates old profiles out.
+Finally compares /quiz latency unprofiled and profiled.
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.stub_llm import StubLLMServer, use_stub
+
+TOKEN = "bench-profile-token"
+ADMIN = {"x-admin-token": TOKEN}
+FORCE = {"x-profile": TOKEN}
+
+
+def find_middleware(asgi, cls):
+    while asgi is not None and not isinstance(asgi, cls):
+        asgi = getattr(asgi, "app", None)
+    assert asgi is not None, f"{cls.__name__} not in the middleware stack"
+    return asgi
+
+
+async def latency(client, n: int, headers=None) -> float:
+    """Median /quiz latency in ms over n uncached requests."""
+    runs = []
+    for i in range(n):
+        start = time.perf_counter()
+        r = await client.post("/quiz", json={"topic": f"latency {time.time_ns()} {i}"}, headers=headers)
+        runs.append((time.perf_counter() - start) * 1000)
+        assert r.status_code == 200, r.text
+    return statistics.median(runs)
+
+
+async def check_format(client, middleware, fmt: str):
+    middleware.format = fmt
+    r = await client.post("/quiz", json={"topic": f"profiled quiz {fmt}"}, headers=FORCE)
+    assert r.status_code == 200, r.text
+    quiz_profile = r.headers["x-profile-id"]
+    r = await client.post("/generate_pdf", json={"topic": f"profiled pdf {fmt}"}, headers=FORCE)
+    assert r.status_code == 200 and r.content.startswith(b"%PDF"), r.text
+    pdf_profile = r.headers["x-profile-id"]
+    assert quiz_profile.startswith("quiz-") and pdf_profile.startswith("generate_pdf-"), (quiz_profile, pdf_profile)
+
+    r = await client.get("/admin/profiles", params={"endpoint": "generate_pdf"}, headers=ADMIN)
+    assert r.status_code == 200, r.text
+    entry = r.json()["profiles"][0]
+    assert entry["name"] == pdf_profile and entry["format"] == fmt and entry["status"] == 200, entry
+
+    r = await client.get(f"/admin/profiles/{quiz_profile}", headers=ADMIN)
+    assert r.status_code == 200 and r.content, r.status_code
+    if fmt == "collapsed":
+        assert all(line.rpartition(" ")[2].isdigit() for line in r.text.splitlines()), "bad collapsed line"
+
+    r = await client.get("/admin/profiles/summary", params={"endpoint": "generate_pdf", "format": fmt, "limit": 200},
+                         headers=ADMIN)
+    assert r.status_code == 200, r.text
+    summary = r.json()
+    functions = [row["function"] for row in summary["top"]]
+    assert any(f.startswith("render_pdf_bytes ") for f in functions), f"{fmt}: PDF render missing from profile"
+    reportlab = [f for f in functions if "doctemplate.py" in f or "flowables.py" in f or "paragraph.py" in f]
+    assert reportlab, f"{fmt}: no ReportLab frames in profile"
+    print(f"{fmt}: /generate_pdf profile {entry['bytes']} bytes in {entry['duration_ms']}ms, "
+          f"{len(reportlab)} ReportLab functions in the top {len(functions)}")
+
+
+async def drive(args):
+    import httpx
+    import app
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+        r = await client.post("/quiz", json={"topic": "warm up"})
+        assert r.status_code == 200 and "x-profile-id" not in r.headers, r.headers
+        middleware = find_middleware(app.app.middleware_stack, app.profiling.ProfilingMiddleware)
+
+        r = await client.get("/admin/profiles", headers={"x-admin-token": "wrong"})
+        assert r.status_code == 403, r.status_code
+        r = await client.post("/quiz", json={"topic": "wrong token"}, headers={"x-profile": "wrong"})
+        assert r.status_code == 200 and "x-profile-id" not in r.headers, r.headers
+        r = await client.get("/admin/profiles/..%2Fapp.py", headers=ADMIN)
+        assert r.status_code == 404, r.status_code
+
+        for fmt in ("collapsed", "pstats"):
+            await check_format(client, middleware, fmt)
+
+        app.profile_store.max_files = 3
+        for i in range(3):
+            await client.post("/quiz", json={"topic": f"rotate {i}"}, headers=FORCE)
+            await asyncio.sleep(0.002)  # distinct millisecond names
+        names = sorted(n for n in os.listdir(app.profile_store.directory) if not n.endswith(".json"))
+        assert len(names) == 3 and all(n.startswith("quiz-") for n in names), names
+        print(f"rotation: {len(names)} profiles kept of 7 written")
+
+        base = await latency(client, args.requests)
+        costs = {}
+        for fmt in ("collapsed", "pstats"):
+            middleware.format = fmt
+            costs[fmt] = await latency(client, args.requests, FORCE)
+    print(f"/quiz median latency: {base:.1f}ms unprofiled, "
+          + ", ".join(f"{ms:.1f}ms profiled ({fmt})" for fmt, ms in costs.items()))
+
+
+def main(args):
+    os.environ["PROFILE_TOKEN"] = TOKEN
+    with StubLLMServer(latency=0.01) as stub:
+        use_stub(stub)
+        asyncio.run(drive(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    main(parser.parse_args())
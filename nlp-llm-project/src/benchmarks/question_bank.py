@@ -0,0 +1,136 @@
+# src/benchmarks/question_bank.py
+"""Quizzes assembled from the question bank versus generated by the model.
+
+Run from src/:  python -m benchmarks.question_bank [--llm-latency 1.0] [--bank-size 20000]
+
+Seeds the bank through /quiz (no_cache) with distinct generations from the
+stub server, then checks that a request for the same topic in another
+spelling is served from the bank without an LLM call, in milliseconds, with
+the per-difficulty quota, no repeated question and questions drawn from
+several generations; that the cooldown sends the next request to the model;
+that with the cooldown off consecutive quizzes rotate through the bank; and
+that /metrics reports the bank-served fraction. Finally times assemble()
+against a bank of --bank-size questions.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.stub_llm import StubLLMServer, use_stub
+
+TOPIC = "gradient descent"
+GENERATIONS = 4
+
+
+def generation(g: int, topic: str = TOPIC) -> str:
+    """Two easy and two hard questions, numbered by generation."""
+    return json.dumps([
+        {"question": f"[{g}-{i}] What is step {i} of {topic}?", "type": "multiple-choice",
+         "options": [f"option {i}a", f"option {i}b", f"option {i}c"], "answer": f"option {i}a",
+         "difficulty": "easy" if i < 2 else "hard"}
+        for i in range(4)
+    ])
+
+
+def generations_of(quiz: list) -> set:
+    return {q["question"].split("]")[0].split("-")[0].lstrip("[") for q in quiz}
+
+
+async def timed_quiz(client, body: dict):
+    start = time.perf_counter()
+    r = await client.post("/quiz", json=body)
+    assert r.status_code == 200, r.text
+    return r.json()["quiz"], (time.perf_counter() - start) * 1000
+
+
+async def drive(stub, args):
+    import httpx
+    import app
+
+    bank = app.question_bank
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        llm_ms = []
+        for g in range(GENERATIONS):
+            stub.content = generation(g)
+            _, ms = await timed_quiz(client, {"topic": TOPIC, "difficulties": ["medium"], "no_cache": True})
+            llm_ms.append(ms)
+        await timed_quiz(client, {"topic": TOPIC, "difficulties": ["medium"], "no_cache": True})  # repeat of the last
+        stats = bank.stats()
+        assert stats["bank_questions"] == 4 * GENERATIONS and stats["bank_duplicates"] == 4, stats
+
+        calls = stub.calls
+        quiz, bank_ms = await timed_quiz(client, {"topic": "The Gradient-Descent", "difficulties": ["easy", "hard"]})
+        assert stub.calls == calls, "bank-served quiz called the model"
+        assert len(quiz) == bank.quiz_size, quiz
+        difficulties = [q["difficulty"] for q in quiz]
+        assert difficulties.count("easy") == 3 and difficulties.count("hard") == 2, difficulties
+        assert len({q["question"] for q in quiz}) == len(quiz), "repeated question"
+        assert len(generations_of(quiz)) >= GENERATIONS, f"drew from generations {generations_of(quiz)} only"
+        print(f"LLM quiz {statistics.median(llm_ms):.0f}ms, bank quiz {bank_ms:.1f}ms "
+              f"({len(generations_of(quiz))} generations mixed)")
+        assert bank_ms < 100, f"bank-served quiz took {bank_ms:.1f}ms"
+
+        _, ms = await timed_quiz(client, {"topic": "gradient descent?", "difficulties": ["easy", "hard"]})
+        assert stub.calls == calls + 1, "cooled-down questions were served again"
+        _, ms = await timed_quiz(client, {"topic": "gradient boosting", "difficulties": ["easy", "hard"]})
+        assert stub.calls == calls + 2, "different topic served from the bank"
+
+        bank.cooldown = 0
+        previous = None
+        for i in range(4):
+            quiz, _ = await timed_quiz(client, {"topic": f"gradient descent {'!' * (i + 1)}",
+                                                "difficulties": ["easy", "hard"]})
+            texts = {q["question"] for q in quiz}
+            if previous is not None:
+                assert len(texts & previous) <= 1, f"consecutive quizzes overlap: {texts & previous}"
+            previous = texts
+        assert stub.calls == calls + 2, "rotation called the model"
+
+        r = await client.get("/metrics")
+        stats = bank.stats()
+        assert f"quiz_bank_served_fraction {stats['bank_served_fraction']!r}" in r.text, "bank fraction not exported"
+        print(f"bank: {stats['bank_questions']} questions, served {stats['bank_served']}/"
+              f"{stats['bank_served'] + stats['bank_misses']} lookups "
+              f"(quiz_bank_served_fraction {stats['bank_served_fraction']:.2f})")
+
+    reopened = app.QuestionBank(bank._path)
+    assert reopened.stats()["bank_questions"] == stats["bank_questions"], "bank did not persist"
+
+
+def scale(args):
+    from question_bank import QuestionBank
+
+    bank = QuestionBank("scale_bank.db", cooldown=0)
+    topics = max(1, args.bank_size // 20)
+    start = time.perf_counter()
+    for t in range(topics):
+        for g in range(5):
+            bank.add(f"topic {t} part {t % 7}", json.loads(generation(g, f"topic {t}")), prompt_version="v")
+    fill_s = time.perf_counter() - start
+    runs = []
+    for i in range(200):
+        start = time.perf_counter()
+        quiz = bank.assemble(f"Topic {i % topics} Part {i % topics % 7}", ["easy", "hard"], "v")
+        runs.append((time.perf_counter() - start) * 1000)
+        assert quiz is not None and len(quiz) == bank.quiz_size
+    print(f"assemble() over {bank.stats()['bank_questions']} questions: median {statistics.median(runs):.2f}ms, "
+          f"p99 {sorted(runs)[int(len(runs) * 0.99) - 1]:.2f}ms (filled in {fill_s:.1f}s)")
+
+
+def main(args):
+    os.environ.setdefault("QUESTION_BANK_COOLDOWN", "300")
+    with StubLLMServer(latency=args.llm_latency) as stub:
+        use_stub(stub)
+        asyncio.run(drive(stub, args))
+    scale(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--bank-size", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,43 @@
+# src/benchmarks/quiz_eval.py
+"""Throughput of the batch quiz evaluation (eval/evaluate.py).
+
+Run from src/:  python -m benchmarks.quiz_eval [--quizzes 100000] [--workers 1 4]
+
+Scores the same synthetic quizzes with each worker count and reports
+quizzes/s, the time spent parsing and hashing in workers versus the
+MinHash/LSH dedup and metric reductions in the parent, and peak RSS.
+"""
+import sys
+import time
+import argparse
+import resource
+
+from benchmarks.stub_llm import SRC_DIR
+
+
+def main(args):
+    sys.path.insert(0, SRC_DIR)
+    from eval.evaluate import build_report, score_all, synthetic_quizzes
+
+    records = list(synthetic_quizzes(args.quizzes))
+    print(f"quizzes={args.quizzes} batch_size={args.batch_size}")
+    print(f"{'workers':>7} {'quiz/s':>9} {'score s':>8} {'dedup s':>8} {'total s':>8} {'rss MB':>7}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        parts = score_all(records, workers=workers, batch_size=args.batch_size)
+        score_s = time.perf_counter() - start
+        report, timings = build_report(parts)
+        total = time.perf_counter() - start
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{workers:>7} {report['quizzes'] / total:>9.0f} {score_s:>8.2f} {timings['dedup_seconds']:>8.2f} "
+              f"{total:>8.2f} {rss:>7.0f}")
+    print(f"questions={report['questions']} duplicate_rate={report['duplicate_rate']:.3f} "
+          f"schema_validity_rate={report['schema_validity_rate']:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quizzes", type=int, default=100000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--batch-size", type=int, default=2000)
+    main(parser.parse_args())
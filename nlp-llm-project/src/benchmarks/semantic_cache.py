@@ -0,0 +1,107 @@
+# src/benchmarks/semantic_cache.py
+"""Upstream calls saved by the semantic cache on a replayed topic log.
+
+Run from src/:  python -m benchmarks.semantic_cache [--log topics.jsonl] [--requests 2000]
+
+The log is one {"topic": ..., "difficulties": [...], "label": ...} per line;
+"label" groups topics that mean the same thing and is only used to count
+false hits (a hit whose cached entry has a different label). Without --log a
+built-in log of paraphrased topics is replayed, including near-miss pairs
+(linear vs logistic regression) that should NOT share answers.
+
+Each request goes exact cache -> semantic cache -> upstream, as in app.py.
+Set EMBEDDING_BACKEND to pick the embedder (hashing only matches shared words;
+transformers also matches paraphrases like "WW2" / "second world war").
+"""
+import sys
+import json
+import random
+import argparse
+
+from benchmarks.stub_llm import SRC_DIR
+
+TOPICS = {
+    "tfidf": ["TF-IDF", "tf idf basics", "tf-idf", "TF IDF quiz", "term frequency inverse document frequency",
+              "term frequency inverse document frequency quiz"],
+    "photosynthesis": ["photosynthesis", "Photosynthesis basics", "how photosynthesis works",
+                       "photosynthesis in plants"],
+    "french_revolution": ["French Revolution", "the french revolution", "French Revolution 1789",
+                          "causes of the French Revolution"],
+    "ww2": ["World War II", "world war 2", "WW2", "second world war", "World War II history"],
+    "neural_networks": ["neural networks", "intro to neural networks", "neural network basics",
+                        "artificial neural networks"],
+    "linear_regression": ["linear regression", "Linear Regression basics", "simple linear regression"],
+    "logistic_regression": ["logistic regression", "Logistic Regression basics", "binary logistic regression"],
+    "python_decorators": ["python decorators", "decorators in Python", "Python decorator functions"],
+    "python_generators": ["python generators", "generators in Python", "Python generator functions"],
+}
+DIFFICULTY_SETS = [["medium"], ["easy", "medium"], ["hard"]]
+
+
+def builtin_log(rng, n):
+    labels = list(TOPICS)
+    weights = [1 / (rank + 1) for rank in range(len(labels))]  # Zipf-like popularity
+    log = []
+    for _ in range(n):
+        label = rng.choices(labels, weights)[0]
+        log.append({"topic": rng.choice(TOPICS[label]), "difficulties": rng.choice(DIFFICULTY_SETS[:2]),
+                    "label": label})
+    return log
+
+
+def replay(log, threshold, embedder):
+    from quiz_cache import make_key
+    from semantic_cache import SemanticCache
+
+    exact = {}
+    semantic = SemanticCache("bench", threshold=threshold, db_path="", embedder=embedder, enabled=threshold <= 1)
+    upstream = near_hits = false_hits = 0
+    for item in log:
+        partition = json.dumps(sorted(item["difficulties"]))
+        key = make_key(item["topic"], item["difficulties"], "stub", "bench")
+        if key in exact:
+            continue
+        hit = semantic.get(item["topic"], partition)
+        if hit is not None:
+            near_hits += 1
+            if item.get("label") is not None and hit[0] != item["label"]:
+                false_hits += 1
+            exact[key] = hit[0]
+            continue
+        upstream += 1  # a real LLM call; its "answer" is the topic's label
+        exact[key] = item.get("label")
+        semantic.set(item["topic"], partition, item.get("label"))
+    return upstream, near_hits, false_hits
+
+
+def main(args):
+    sys.path.insert(0, SRC_DIR)
+    from embeddings import get_embedder
+
+    if args.log:
+        with open(args.log, "r", encoding="utf-8") as f:
+            log = [json.loads(line) for line in f if line.strip()]
+    else:
+        log = builtin_log(random.Random(0), args.requests)
+    embedder = get_embedder()
+    labelled = all("label" in item for item in log)
+
+    print(f"requests={len(log)} embedder={embedder.name}")
+    print(f"{'cache':>18} {'upstream':>9} {'saved':>7} {'vs exact':>9} {'near_hits':>10} {'false_hits':>11}")
+    no_cache = len(log)
+    print(f"{'none':>18} {no_cache:>9} {0:>7.1%} {'-':>9} {'-':>10} {'-':>11}")
+    exact, _, _ = replay(log, 2.0, embedder)  # threshold > 1: exact cache only
+    print(f"{'exact':>18} {exact:>9} {1 - exact / no_cache:>7.1%} {0:>9.1%} {'-':>10} {'-':>11}")
+    for threshold in args.thresholds:
+        upstream, near, false = replay(log, threshold, embedder)
+        false_text = f"{false:>11}" if labelled else f"{'n/a':>11}"
+        print(f"{f'semantic@{threshold:.2f}':>18} {upstream:>9} {1 - upstream / no_cache:>7.1%} "
+              f"{1 - upstream / exact:>9.1%} {near:>10} {false_text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", default=None)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.95, 0.9, 0.85, 0.8, 0.7])
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+# src/benchmarks/stream_quiz.py
+"""Time-to-first-question: POST /quiz versus POST /quiz/stream.
+
+Run from src/:  python -m benchmarks.stream_quiz [--latency 2.0] [--questions 10] [--runs 3]
+
+The stub spreads its latency evenly over the token stream, so the streaming
+endpoint should deliver its first question after roughly latency/questions.
+"""
+import json
+import time
+import argparse
+
+from benchmarks.stub_llm import SAMPLE_QUIZ, AppServer, StubLLMServer, use_stub
+
+
+def time_blocking(client, body):
+    start = time.perf_counter()
+    r = client.post("/quiz", json=body)
+    r.raise_for_status()
+    total = time.perf_counter() - start
+    return total, total
+
+
+def time_streaming(client, body):
+    start = time.perf_counter()
+    first = None
+    with client.stream("POST", "/quiz/stream", json=body) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "question" and first is None:
+                first = time.perf_counter() - start
+            elif event["event"] == "error":
+                raise RuntimeError(event["detail"])
+    return first, time.perf_counter() - start
+
+
+def main(args):
+    import httpx
+    import app
+
+    body = {"topic": "tf-idf", "difficulties": ["easy", "medium"], "no_cache": True}
+    with AppServer(app.app) as server, httpx.Client(base_url=server.base_url, timeout=60) as client:
+        print(f"stub latency={args.latency}s questions={args.questions} runs={args.runs}")
+        print(f"{'endpoint':>14} {'first q ms':>11} {'total ms':>9}")
+        for name, fn in [("/quiz", time_blocking), ("/quiz/stream", time_streaming)]:
+            samples = [fn(client, body) for _ in range(args.runs)]
+            first = sum(s[0] for s in samples) / len(samples)
+            total = sum(s[1] for s in samples) / len(samples)
+            print(f"{name:>14} {first * 1000:>11.0f} {total * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    quiz = [SAMPLE_QUIZ[i % len(SAMPLE_QUIZ)] for i in range(args.questions)]
+    with StubLLMServer(latency=args.latency, content=json.dumps(quiz)) as stub:
+        use_stub(stub)
+        main(args)
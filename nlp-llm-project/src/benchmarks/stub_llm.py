@@ -0,0 +1,207 @@
+# src/benchmarks/stub_llm.py
+"""Local OpenAI-compatible stub server used by the benchmarks.
+
+Answers POST /v1/chat/completions after a fixed delay with a small quiz, so
+the API can be load tested without a real model or API key. Requests with
+"stream": true get server-sent chunks spread evenly over the same delay.
+Faults can be scripted: queue (status, retry_after) pairs on `failures` to
+fail the next requests, or set `slow_every`/`slow_latency` for a slow tail.
+"""
+import os
+import sys
+import socket
+import json
+import time
+import tempfile
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_QUIZ = [
+    {
+        "question": "What does TF-IDF stand for?",
+        "type": "multiple-choice",
+        "options": ["Term Frequency-Inverse Document Frequency", "Total Frequency", "Text Feature Index"],
+        "answer": "Term Frequency-Inverse Document Frequency",
+        "difficulty": "easy",
+    },
+    {
+        "question": "Why does IDF down-weight common words?",
+        "type": "short-answer",
+        "answer": "Because they appear in many documents and carry little information.",
+        "difficulty": "medium",
+    },
+]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)  # cancelled (e.g. hedged) requests hang up early
+
+
+class StubLLMServer:
+    """Threaded HTTP server that mimics the chat completions endpoint."""
+
+    def __init__(self, latency: float = 0.2, content: str = None, chunk_chars: int = 16):
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.content = content if content is not None else json.dumps(SAMPLE_QUIZ)
+        self.calls = 0
+        self.failures = deque()  # (status, retry_after seconds or None) for upcoming requests
+        self.slow_every = 0  # every n-th request takes slow_latency instead of latency
+        self.slow_latency = 0.0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # headers and body go out in separate writes; don't let Nagle + delayed ACK add ~40ms
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.calls += 1
+                    call = server.calls
+                    failure = server.failures.popleft() if server.failures else None
+                if failure is not None:
+                    self._fail(*failure)
+                elif body.get("stream"):
+                    self._stream(body)
+                else:
+                    slow = server.slow_every and call % server.slow_every == 0
+                    self._complete(body, server.slow_latency if slow else server.latency)
+
+            def _fail(self, status, retry_after):
+                payload = json.dumps({"error": {"message": f"stub failure {status}", "type": "stub"}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _complete(self, body, latency):
+                time.sleep(latency)
+                payload = json.dumps({
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": server.content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 50, "completion_tokens": 100, "total_tokens": 150},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = [server.content[i:i + server.chunk_chars]
+                          for i in range(0, len(server.content), server.chunk_chars)]
+                delay = server.latency / max(len(pieces), 1)
+                for piece in pieces:
+                    time.sleep(delay)
+                    self._send_event({
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "stub"),
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                    })
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self._send_event({
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "stub"),
+                        "choices": [],
+                        "usage": {"prompt_tokens": 50, "completion_tokens": 100, "total_tokens": 150},
+                    })
+                self._send_chunk(b"data: [DONE]\n\n")
+                self._send_chunk(b"")
+
+            def _send_event(self, event):
+                self._send_chunk(f"data: {json.dumps(event)}\n\n".encode())
+
+            def _send_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        self.httpd = _Server(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class AppServer:
+    """Run a FastAPI app under uvicorn in a background thread.
+
+    httpx's ASGI transport buffers whole responses, so streaming benchmarks
+    need a real socket.
+    """
+
+    def __init__(self, app):
+        import uvicorn
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+        sock.close()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self._thread.join()
+
+
+def use_stub(stub: StubLLMServer):
+    """Point the OpenAI SDK at the stub and run the app from a scratch directory.
+
+    Must be called before importing app so no files land in src/.
+    """
+    os.environ["OPENAI_BASE_URL"] = stub.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+    os.environ["APP_ENV"] = "benchmark"
+    os.environ.setdefault("SEMANTIC_CACHE", "0")  # no embedding-model download; exact cache only
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="quiz-bench-"))
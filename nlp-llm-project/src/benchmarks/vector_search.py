@@ -0,0 +1,74 @@
+# src/benchmarks/vector_search.py
+"""Query latency and recall@k of the vector index: exact vs IVF, float32 vs float16.
+
+Run from src/:  python -m benchmarks.vector_search [--rows 200000] [--dim 384]
+
+Recall is measured against exact float32 search over the same vectors.
+The corpus is clustered random data, which is closer to real embeddings
+than uniform noise (uniform noise is the worst case for IVF).
+"""
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks.stub_llm import SRC_DIR
+
+
+def make_corpus(rng, rows, dim, clusters=256):
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 1.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall(found, truth):
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def timed(index, queries, k, **kwargs):
+    index.search(queries[:1], k=k, **kwargs)  # warm the page cache / memmap
+    start = time.perf_counter()
+    ids = np.vstack([index.search(q[None, :], k=k, **kwargs)[1] for q in queries])
+    return (time.perf_counter() - start) / len(queries) * 1000, ids
+
+
+def main(args):
+    sys.path.insert(0, SRC_DIR)
+    from vector_index import VectorIndex
+
+    rng = np.random.default_rng(0)
+    vectors = make_corpus(rng, args.rows, args.dim)
+    queries = vectors[rng.choice(args.rows, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    meta = [{"doc_id": str(i), "text": ""} for i in range(args.rows)]
+
+    print(f"rows={args.rows} dim={args.dim} queries={args.queries} k={args.k}")
+    print(f"{'mode':>22} {'ms/query':>9} {'recall@k':>9}")
+    truth = None
+    for dtype in ("float32", "float16"):
+        index = VectorIndex(tempfile.mkdtemp(prefix="vec-bench-"), dim=args.dim, dtype=dtype)
+        index.add(vectors, meta)
+        ms, ids = timed(index, queries, args.k, mode="exact")
+        truth = ids if truth is None else truth
+        print(f"{'exact ' + dtype:>22} {ms:>9.2f} {recall(ids, truth):>9.3f}")
+
+        start = time.perf_counter()
+        index.build_ivf()
+        build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            ms, ids = timed(index, queries, args.k, mode="ivf", nprobe=nprobe)
+            print(f"{f'ivf {dtype} nprobe={nprobe}':>22} {ms:>9.2f} {recall(ids, truth):>9.3f}")
+        print(f"{'':>22} ivf build {build:.1f}s, {len(index._ivf[0])} lists")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 32, 64])
+    main(parser.parse_args())
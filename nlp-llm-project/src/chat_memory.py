@@ -1,74 +1,71 @@
-import os
-import json
 from datetime import datetime
-from openai import OpenAI
+import llm_client
+from conversation_store import get_store
+from context_window import fit_messages
 
-client = OpenAI()
+store = get_store()
 
-CONVO_DIR = "conversations"
-os.makedirs(CONVO_DIR, exist_ok=True)
+def new_chat_id():
+    return f"chat_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')}"
 
-def save_conversation(messages, filename=None):
-    """Save conversation to JSON file."""
-    if not filename:
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')
-        filename = os.path.join(CONVO_DIR, f"chat_{timestamp}.json")
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(messages, f, indent=2, ensure_ascii=False)
-    print(f"Conversation saved to {filename}")
+def new_chat():
+    return new_chat_id(), [{"role": "system", "content": "You are a friendly and helpful AI assistant."}]
+
+def save_conversation(session_id, messages):
+    """Append unsaved messages of the conversation to the store."""
+    store.extend(session_id, messages)
+    print(f"Conversation saved as {session_id}")
 
 def list_conversations():
-    """Return list of saved conversation files."""
-    files = [f for f in os.listdir(CONVO_DIR) if f.endswith(".json")]
-    if not files:
+    """Return list of saved conversation ids."""
+    sessions = store.list_sessions()
+    if not sessions:
         print("No saved conversations found.")
         return []
     print("Saved conversations:")
-    for i, file in enumerate(files, 1):
-        print(f"{i}. {file}")
-    return files
+    for i, session_id in enumerate(sessions, 1):
+        print(f"{i}. {session_id}")
+    return sessions
 
 def load_conversation():
-    """Load a conversation from file or start new."""
-    files = list_conversations()
-    if not files:
-        return [{"role": "system", "content": "You are a friendly and helpful AI assistant."}]
+    """Load a conversation from the store or start new."""
+    sessions = list_conversations()
+    if not sessions:
+        return new_chat()
     
     choice = input("Enter number to load, or Enter for new chat: ").strip()
     if not choice:
-        return [{"role": "system", "content": "You are a friendly and helpful AI assistant."}]
+        return new_chat()
     
     try:
         idx = int(choice) - 1
-        if idx < 0 or idx >= len(files):
+        if idx < 0 or idx >= len(sessions):
             raise IndexError
-        filename = os.path.join(CONVO_DIR, files[idx])
-        with open(filename, "r", encoding="utf-8") as f:
-            messages = json.load(f)
-        print(f"Loaded conversation: {files[idx]}")
-        return messages
+        messages = store.load(sessions[idx])
+        print(f"Loaded conversation: {sessions[idx]}")
+        return sessions[idx], messages
     except (ValueError, IndexError):
         print("Invalid choice. Starting new chat.")
-        return [{"role": "system", "content": "You are a friendly and helpful AI assistant."}]
+        return new_chat()
 
 def chat_with_memory():
     """Main chat loop with save/load functionality."""
-    messages = load_conversation()
+    session_id, messages = load_conversation()
     print("\nChat started! Type '/save', '/exit', '/reset', or '/list' anytime.\n")
     
     while True:
         user_input = input("You: ").strip()
         
         if user_input.lower() in {"/exit", "exit", "quit"}:
-            save_conversation(messages)
+            save_conversation(session_id, messages)
             print("Goodbye!")
             break
         elif user_input.lower() == "/save":
-            save_conversation(messages)
+            save_conversation(session_id, messages)
             continue
         elif user_input.lower() == "/reset":
             print("Conversation reset.")
-            messages = [{"role": "system", "content": "You are a friendly and helpful AI assistant."}]
+            session_id, messages = new_chat()
             continue
         elif user_input.lower() == "/list":
             list_conversations()
@@ -77,18 +74,15 @@ def chat_with_memory():
         # Append user message
         messages.append({"role": "user", "content": user_input})
         
-        # Call OpenAI API
+        # Call the model with history trimmed to the token budget
+        prompt, prompt_tokens = fit_messages(messages)
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages
-            )
-            reply = response.choices[0].message.content
+            reply = llm_client.complete(prompt)
         except Exception as e:
             reply = f"Error: {e}"
         
         # Print and store AI response
-        print(f"AI: {reply}\n")
+        print(f"AI: {reply}  [{prompt_tokens} prompt tokens]\n")
         messages.append({"role": "assistant", "content": reply})
 
 if __name__ == "__main__":
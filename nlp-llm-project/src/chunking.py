@@ -0,0 +1,35 @@
+# src/chunking.py
+import re
+from bisect import bisect_right
+from typing import List
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+def chunk_text(text: str, max_words: int = 200, overlap: int = 40) -> List[str]:
+    """Split text into chunks of at most max_words words.
+
+    Chunks end on a sentence boundary when one falls in the second half of
+    the window, otherwise they are cut mid-sentence. Consecutive chunks share
+    `overlap` words so an answer that straddles a boundary is still
+    retrievable.
+    """
+    words: List[str] = []
+    boundaries: List[int] = []
+    for sentence in _SENTENCE_RE.split(text):
+        words.extend(sentence.split())
+        boundaries.append(len(words))
+
+    chunks = []
+    start, n = 0, len(words)
+    while start < n:
+        end = min(start + max_words, n)
+        if end < n:
+            b = bisect_right(boundaries, end) - 1
+            if b >= 0 and boundaries[b] > start + max_words // 2:
+                end = boundaries[b]
+        chunks.append(" ".join(words[start:end]))
+        if end >= n:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
@@ -0,0 +1,156 @@
+# src/context_window.py
+import os
+import re
+import threading
+from typing import Callable, List, Optional, Tuple
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_STRATEGY = os.getenv("CONTEXT_STRATEGY", "summarize").lower()  # "summarize" or "sliding"
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300"))
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", "")  # optional HF tokenizer.json
+
+# Chat format overhead per message and for priming the reply (OpenAI cookbook numbers).
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 2
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_encode: Optional[Callable[[str], int]] = None
+
+
+def _load_tokenizer() -> Callable[[str], int]:
+    """Pick the most accurate local token counter available.
+
+    1. A tokenizer.json shipped with the deployment (TOKENIZER_PATH, via `tokenizers`)
+    2. tiktoken's o200k_base (gpt-4o family) if installed
+    3. A regex estimate: words and punctuation, long words counted as ~4 chars/token
+    """
+    if TOKENIZER_PATH:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        pass
+
+    def estimate(text: str) -> int:
+        return sum(1 + (len(piece) - 1) // 4 for piece in _WORD_RE.findall(text))
+
+    return estimate
+
+
+def count_tokens(text: str) -> int:
+    global _encode
+    if _encode is None:
+        _encode = _load_tokenizer()
+    return _encode(text)
+
+
+def message_tokens(message: dict) -> int:
+    return TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "")
+
+
+def count_message_tokens(messages: List[dict]) -> int:
+    return TOKENS_PER_REPLY + sum(message_tokens(m) for m in messages)
+
+
+def summarize_turns(messages: List[dict], budget: int) -> Optional[dict]:
+    """Extractive summary of dropped turns: the first line of each, newest kept first.
+
+    Runs locally so trimming never costs an extra LLM call.
+    """
+    header = "Summary of earlier conversation (older turns omitted):"
+    lines = []
+    used = message_tokens({"content": header})
+    for m in reversed(messages):
+        first_line = (m.get("content") or "").strip().split("\n", 1)[0][:200]
+        if not first_line:
+            continue
+        line = f"- {m['role']}: {first_line}"
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    if not lines:
+        return None
+    return {"role": "system", "content": "\n".join([header] + lines[::-1])}
+
+
+def fit_messages(
+    messages: List[dict],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    strategy: str = CONTEXT_STRATEGY,
+    summary_tokens: int = CONTEXT_SUMMARY_TOKENS,
+) -> Tuple[List[dict], int]:
+    """Trim a conversation to fit a prompt-token budget.
+
+    Leading system messages and the latest message are always kept; the
+    most recent other turns are added while they fit (sliding window). With
+    the "summarize" strategy the turns that fell out of the window are
+    folded into one short system note. Returns (messages, prompt_tokens).
+    """
+    total = count_message_tokens(messages)
+    if total <= budget or len(messages) <= 1:
+        return messages, total
+
+    n_pinned = 0
+    while n_pinned < len(messages) - 1 and messages[n_pinned]["role"] == "system":
+        n_pinned += 1
+    pinned = messages[:n_pinned]
+    history = messages[n_pinned:-1]
+    latest = messages[-1]
+
+    used = TOKENS_PER_REPLY + sum(message_tokens(m) for m in pinned) + message_tokens(latest)
+    reserve = summary_tokens if strategy == "summarize" else 0
+    kept = []
+    for m in reversed(history):
+        cost = message_tokens(m)
+        if used + cost + reserve > budget:
+            break
+        kept.append(m)
+        used += cost
+    kept.reverse()
+
+    dropped = history[:len(history) - len(kept)]
+    summary = None
+    if strategy == "summarize" and dropped:
+        summary = summarize_turns(dropped, min(summary_tokens, max(budget - used, 0)))
+        if summary is not None:
+            used += message_tokens(summary)
+
+    fitted = pinned + ([summary] if summary else []) + kept + [latest]
+    return fitted, used
+
+
+class PromptTokenStats:
+    """Running prompt-size counters so prompt inflation shows up in monitoring."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.trimmed_requests = 0
+
+    def record(self, tokens: int, trimmed: bool):
+        with self._lock:
+            self.requests += 1
+            self.total_tokens += tokens
+            self.max_tokens = max(self.max_tokens, tokens)
+            self.trimmed_requests += int(trimmed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "prompt_requests": self.requests,
+                "prompt_tokens_total": self.total_tokens,
+                "prompt_tokens_mean": self.total_tokens / self.requests if self.requests else 0.0,
+                "prompt_tokens_max": self.max_tokens,
+                "prompt_trimmed_requests": self.trimmed_requests,
+                "prompt_token_budget": CONTEXT_TOKEN_BUDGET,
+            }
@@ -0,0 +1,225 @@
+# src/conversation_store.py
+import os
+import glob
+import json
+import time
+import sqlite3
+import asyncio
+import argparse
+import threading
+import weakref
+from typing import List
+
+CONVO_DIR = "conversations"
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "sqlite").lower()  # "sqlite" or "json"
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", os.path.join(CONVO_DIR, "conversations.db"))
+
+
+class ConversationStore:
+    """Message history per session id.
+
+    Backends only have to implement load/count/append/list_sessions; extend()
+    builds the "save what the caller has that we don't" operation on top.
+    """
+
+    def __init__(self):
+        self._async_locks = weakref.WeakValueDictionary()
+        self._thread_locks = weakref.WeakValueDictionary()
+        self._guard = threading.Lock()
+
+    def load(self, session_id: str) -> List[dict]:
+        raise NotImplementedError
+
+    def count(self, session_id: str) -> int:
+        raise NotImplementedError
+
+    def append(self, session_id: str, messages: List[dict]):
+        raise NotImplementedError
+
+    def list_sessions(self) -> List[str]:
+        raise NotImplementedError
+
+    def exists(self, session_id: str) -> bool:
+        return self.count(session_id) > 0
+
+    def user_messages(self, since: float = 0.0) -> List[str]:
+        """Content of every user message saved since `since` (backends without timestamps ignore it)."""
+        return [m.get("content") or "" for session_id in self.list_sessions()
+                for m in self.load(session_id) if m.get("role") == "user"]
+
+    def extend(self, session_id: str, messages: List[dict]):
+        """Store only the messages past what is already saved for the session."""
+        with self._thread_lock(session_id):
+            stored = self.count(session_id)
+            if len(messages) > stored:
+                self.append(session_id, messages[stored:])
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Per-session lock for request handlers doing load -> LLM -> save."""
+        with self._guard:
+            lock = self._async_locks.get(session_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._async_locks[session_id] = lock
+            return lock
+
+    def _thread_lock(self, session_id: str) -> threading.Lock:
+        with self._guard:
+            lock = self._thread_locks.get(session_id)
+            if lock is None:
+                lock = _Lock()
+                self._thread_locks[session_id] = lock
+            return lock
+
+
+class _Lock:
+    """threading.Lock wrapper (the builtin can't be weakly referenced)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Append-only message log in SQLite (WAL), indexed by (session_id, seq)."""
+
+    def __init__(self, path: str = CONVERSATION_DB):
+        super().__init__()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db_lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+        )
+
+    def load(self, session_id: str) -> List[dict]:
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, session_id: str) -> int:
+        with self._db_lock:
+            (seq,) = self._db.execute(
+                "SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return 0 if seq is None else seq + 1
+
+    def append(self, session_id: str, messages: List[dict]):
+        if not messages:
+            return
+        now = time.time()
+        with self._db_lock:
+            # IMMEDIATE takes the write lock up front, so the seq read below
+            # can't race another process appending to the same session.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                (seq,) = self._db.execute(
+                    "SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                start = 0 if seq is None else seq + 1
+                self._db.executemany(
+                    "INSERT INTO messages (session_id, seq, message, created_at) VALUES (?, ?, ?, ?)",
+                    [(session_id, start + i, json.dumps(m, ensure_ascii=False), now)
+                     for i, m in enumerate(messages)],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def list_sessions(self) -> List[str]:
+        with self._db_lock:
+            rows = self._db.execute("SELECT DISTINCT session_id FROM messages ORDER BY session_id").fetchall()
+        return [row[0] for row in rows]
+
+    def user_messages(self, since: float = 0.0) -> List[str]:
+        with self._db_lock:
+            rows = self._db.execute("SELECT message FROM messages WHERE created_at >= ?", (since,)).fetchall()
+        messages = (json.loads(row[0]) for row in rows)
+        return [m.get("content") or "" for m in messages if m.get("role") == "user"]
+
+
+class JSONFileConversationStore(ConversationStore):
+    """Legacy layout: one indented JSON file per session, rewritten on every append."""
+
+    def __init__(self, directory: str = CONVO_DIR):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def load(self, session_id: str) -> List[dict]:
+        path = self._path(session_id)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def count(self, session_id: str) -> int:
+        return len(self.load(session_id))
+
+    def append(self, session_id: str, messages: List[dict]):
+        if not messages:
+            return
+        history = self.load(session_id) + list(messages)
+        with open(self._path(session_id), "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2, ensure_ascii=False)
+
+    def list_sessions(self) -> List[str]:
+        return sorted(f[:-len(".json")] for f in os.listdir(self.directory) if f.endswith(".json"))
+
+
+def get_store(backend: str = CONVERSATION_BACKEND) -> ConversationStore:
+    if backend == "json":
+        return JSONFileConversationStore(CONVO_DIR)
+    if backend == "sqlite":
+        return SQLiteConversationStore(CONVERSATION_DB)
+    raise ValueError(f"Unknown conversation backend '{backend}'. Use 'sqlite' or 'json'.")
+
+
+def migrate_json_dir(directory: str, store: ConversationStore) -> int:
+    """Import legacy <session_id>.json files; sessions already in the store are skipped."""
+    imported = 0
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        session_id = os.path.splitext(os.path.basename(path))[0]
+        if store.exists(session_id):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                messages = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        if isinstance(messages, list) and messages:
+            store.append(session_id, messages)
+            imported += 1
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversation store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="import legacy conversations/*.json files")
+    migrate.add_argument("--dir", default=CONVO_DIR)
+    migrate.add_argument("--db", default=CONVERSATION_DB)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        count = migrate_json_dir(args.dir, SQLiteConversationStore(args.db))
+        print(f"Imported {count} conversations into {args.db}")
@@ -0,0 +1,131 @@
+# src/embeddings.py
+import os
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "transformers").lower()  # transformers | onnx | hashing
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "")  # holds model.onnx + tokenizer.json
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_MAX_LENGTH = int(os.getenv("EMBEDDING_MAX_LENGTH", "256"))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def _mean_pool(hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    mask = mask[..., None].astype(np.float32)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class Embedder:
+    """Turns texts into L2-normalized float32 vectors, in batches."""
+
+    dim: int
+    name: str
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        batches = [self._embed_batch(texts[i:i + self.batch_size])
+                   for i in range(0, len(texts), self.batch_size)]
+        if not batches:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _normalize(np.vstack(batches))
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TransformersEmbedder(Embedder):
+    """Mean-pooled sentence embeddings from a Hugging Face encoder on CPU."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_length: int = EMBEDDING_MAX_LENGTH):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.dim = self.model.config.hidden_size
+        self.name = model_name
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                 return_tensors="pt")
+        with self._torch.inference_mode():
+            hidden = self.model(**encoded).last_hidden_state
+        return _mean_pool(hidden.numpy(), encoded["attention_mask"].numpy())
+
+
+class ONNXEmbedder(Embedder):
+    """Same pooling as TransformersEmbedder, but run through ONNX Runtime (no torch needed)."""
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_DIR, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_length: int = EMBEDDING_MAX_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.session = ort.InferenceSession(os.path.join(model_dir, "model.onnx"),
+                                            providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+        self.dim = self.session.get_outputs()[0].shape[-1]
+        self.name = model_dir
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feed)[0]
+        return _mean_pool(hidden, mask)
+
+
+class HashingEmbedder(Embedder):
+    """Signed feature hashing of words. No model download; used for tests and benchmarks."""
+
+    def __init__(self, dim: int = 384, batch_size: int = 256):
+        self.dim = dim
+        self.batch_size = batch_size
+        self.name = f"hashing-{dim}"
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN_RE.findall(text.lower()):
+                h = zlib.crc32(token.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return out
+
+
+_embedder = None
+
+
+def get_embedder() -> Embedder:
+    """Process-wide embedder chosen by EMBEDDING_BACKEND (loaded on first use)."""
+    global _embedder
+    if _embedder is None:
+        if EMBEDDING_BACKEND == "onnx":
+            _embedder = ONNXEmbedder()
+        elif EMBEDDING_BACKEND == "hashing":
+            _embedder = HashingEmbedder()
+        elif EMBEDDING_BACKEND == "transformers":
+            _embedder = TransformersEmbedder()
+        else:
+            raise ValueError(f"Unknown embedding backend '{EMBEDDING_BACKEND}'")
+    return _embedder
@@ -1,7 +1,400 @@
-from sklearn.metrics import f1_score, accuracy_score
+# src/eval/evaluate.py
+"""Batch quality evaluation for generated quizzes.
+
+Scores every quiz in the quiz store, the quizzes of stored conversations
+(quiz store rows joined on session id, since conversations keep only the
+prompt) or a JSONL dump and writes one JSON report: schema-validity rate,
+answer-in-options rate, near-duplicate questions (MinHash over word bigrams with LSH banding), the
+difficulty and type distributions, and how closely question difficulty follows
+the requested one. Worker processes parse and hash batches of quizzes into
+per-question NumPy columns; every metric is then a reduction over those
+columns, so a nightly run over 100k+ quizzes takes seconds.
+
+Run from src/:
+    python -m eval.evaluate --quiz-db quizzes.db --out report.json
+    python -m eval.evaluate --conversations
+    python -m eval.evaluate --jsonl quizzes.jsonl --workers 8
+    python -m eval.evaluate --synthetic 100000        # timing run on generated quizzes
+
+quizzes.jsonl has one {"topic", "questions": [...] or "raw": "<model output>", "difficulties": [...]}
+per line. Quizzes given as raw model output go through the app's parser, so
+unparseable ones count as parse failures.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import random
+import sqlite3
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import quiz_parser
+
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", str(os.cpu_count() or 1)))
+EVAL_BATCH_SIZE = int(os.getenv("EVAL_BATCH_SIZE", "2000"))  # quizzes per worker task
+EVAL_DUP_THRESHOLD = float(os.getenv("EVAL_DUP_THRESHOLD", "0.8"))  # estimated Jaccard of question bigrams
+NUM_PERM = 64
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows each; bucket matches are then checked against the threshold
+
+DIFFICULTIES = ["easy", "medium", "hard"]  # code 3 = anything else
+TYPES = ["multiple-choice", "true-false", "short-answer"]  # code 3 = anything else
+OTHER = 3
+
+_ITEM_SCHEMA = quiz_parser.QUIZ_RESPONSE_FORMAT["json_schema"]["schema"]["properties"]["questions"]["items"]
+_DIFFICULTY_ENUM = set(_ITEM_SCHEMA["properties"]["difficulty"]["enum"])
+_REQUESTED_RE = re.compile(r"with (.+?) difficulty questions")
+_TOPIC_RE = re.compile(r"^Create a JSON quiz about '(.+)' with ")  # app.quiz_prompt
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SINGLE_BIT = np.array([OTHER, 0, 1, OTHER, 2, OTHER, OTHER, OTHER], dtype=np.int8)  # mask -> code if one bit
+
+# Multiply-shift hash family: ((a * x + b) mod 2^64) >> 32, a odd. Fixed seed so workers agree.
+_rng = np.random.default_rng(20240501)
+_PERM_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
 
 
 def evaluate_classification(preds, labels):
-    acc = accuracy_score(labels, preds)
-    f1 = f1_score(labels, preds, average="macro")
-    return {"accuracy": acc, "f1": f1}
+    """Accuracy and macro F1 over every class seen in either array."""
+    preds, labels = np.asarray(preds), np.asarray(labels)
+    if len(labels) == 0:
+        return {"accuracy": 0.0, "f1": 0.0}
+    classes, codes = np.unique(np.concatenate([labels, preds]), return_inverse=True)
+    y, p = codes[:len(labels)], codes[len(labels):]
+    k = len(classes)
+    confusion = np.bincount(y * k + p, minlength=k * k).reshape(k, k)
+    tp = np.diag(confusion).astype(float)
+    support = confusion.sum(axis=0) + confusion.sum(axis=1)  # predicted + actual = 2tp + fp + fn
+    f1 = np.divide(2 * tp, support, out=np.zeros(k), where=support > 0)
+    return {"accuracy": float(tp.sum() / len(labels)), "f1": float(f1.mean())}
+
+
+def requested_difficulties(prompt: str) -> Optional[List[str]]:
+    """Difficulties named in an app quiz prompt ("... with easy, hard difficulty questions ...")."""
+    match = _REQUESTED_RE.search(prompt or "")
+    return [d.strip().lower() for d in match.group(1).split(",")] if match else None
+
+
+def schema_valid(q) -> bool:
+    """Would the API accept the item, with difficulty in the schema's enum and options on multiple-choice?"""
+    if not isinstance(q, dict):
+        return False
+    q = quiz_parser.normalize_question(q)
+    if not (isinstance(q.get("question"), str) and q["question"].strip()):
+        return False
+    if not isinstance(q.get("type"), str) or not isinstance(q.get("answer"), str):
+        return False
+    options = q.get("options")
+    if options is not None and not isinstance(options, list):
+        return False
+    if q["type"] == "multiple-choice" and len(options or []) < 2:
+        return False
+    return str(q["difficulty"]).lower() in _DIFFICULTY_ENUM
+
+
+def _code(value, names: List[str]) -> int:
+    value = str(value).strip().lower() if value is not None else ""
+    return names.index(value) if value in names else OTHER
+
+
+def _difficulty_mask(difficulties: Optional[List[str]]) -> int:
+    return sum(1 << DIFFICULTIES.index(d) for d in set(difficulties or []) if d in DIFFICULTIES)
+
+
+def minhash(token_hashes: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """(questions, NUM_PERM) uint32 MinHash signatures of word bigrams.
+
+    token_hashes holds every question's word hashes back to back, offsets the
+    start of each question (every question has at least one token). Each token
+    is paired with the next one in its question, the last with 0, so a
+    question's shingles stay contiguous and align with its tokens.
+    """
+    nxt = np.zeros_like(token_hashes)
+    nxt[:-1] = token_hashes[1:]
+    nxt[np.append(offsets[1:], len(token_hashes)) - 1] = 0
+    shingles = token_hashes * _MIX + nxt
+    values = (shingles[:, None] * _PERM_A + _PERM_B) >> np.uint64(32)
+    return np.minimum.reduceat(values, offsets, axis=0).astype(np.uint32)
+
+
+def score_batch(records: List[dict]) -> Dict[str, np.ndarray]:
+    """Parse a batch of quizzes into per-question columns (plus per-quiz parse failures)."""
+    start = time.perf_counter()
+    parse_failed = np.zeros(len(records), dtype=bool)
+    quiz, valid, difficulty, qtype, in_options, requested = [], [], [], [], [], []
+    tokens, offsets = [], []
+    for i, record in enumerate(records):
+        items = record.get("questions")
+        if items is None:
+            try:
+                items, _ = quiz_parser.load_quiz_items(record.get("raw") or "")
+            except quiz_parser.QuizParseError:
+                parse_failed[i] = True
+                continue
+        mask = _difficulty_mask(record.get("difficulties"))
+        for q in items:
+            ok = schema_valid(q)
+            q = q if isinstance(q, dict) else {}
+            options = q.get("options") if isinstance(q.get("options"), list) else []
+            answer = str(q.get("answer", "")).strip().lower()
+            quiz.append(i)
+            valid.append(ok)
+            difficulty.append(_code(q.get("difficulty"), DIFFICULTIES))
+            qtype.append(_code(q.get("type"), TYPES))
+            in_options.append(answer in {str(o).strip().lower() for o in options})
+            requested.append(mask)
+            offsets.append(len(tokens))
+            words = _WORD_RE.findall(str(q.get("question", "")).lower())
+            tokens.extend(zlib.crc32(w.encode("utf-8")) for w in words)
+            if not words:
+                tokens.append(0)
+
+    offsets = np.array(offsets, dtype=np.int64)
+    signatures = (minhash(np.array(tokens, dtype=np.uint64), offsets) if len(offsets)
+                  else np.zeros((0, NUM_PERM), dtype=np.uint32))
+    return {
+        "quizzes": len(records),
+        "parse_failed": parse_failed,
+        "quiz": np.array(quiz, dtype=np.int64),
+        "valid": np.array(valid, dtype=bool),
+        "difficulty": np.array(difficulty, dtype=np.int8),
+        "type": np.array(qtype, dtype=np.int8),
+        "answer_in_options": np.array(in_options, dtype=bool),
+        "requested": np.array(requested, dtype=np.int8),
+        "signature": signatures,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def near_duplicates(signatures: np.ndarray, groups: Optional[np.ndarray] = None,
+                    threshold: float = EVAL_DUP_THRESHOLD) -> np.ndarray:
+    """True for each row whose signature matches an earlier row's in some LSH band at >= threshold.
+
+    Each row is only compared with the first row of its bucket, which keeps a
+    question asked ten thousand times linear instead of quadratic. With groups,
+    rows only match inside the same group (e.g. the same quiz).
+    """
+    n = len(signatures)
+    dup = np.zeros(n, dtype=bool)
+    if n == 0:
+        return dup
+    rows = NUM_PERM // BANDS
+    bands = signatures.reshape(n, BANDS, rows).astype(np.uint64)
+    keys = np.zeros((n, BANDS), dtype=np.uint64)
+    for r in range(rows):
+        keys = keys * _MIX + bands[:, :, r]
+    if groups is not None:
+        keys ^= (groups.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F))[:, None]
+    order = np.arange(n)
+    for b in range(BANDS):
+        _, first, inverse = np.unique(keys[:, b], return_index=True, return_inverse=True)
+        rep = first[inverse]
+        candidates = np.flatnonzero((rep != order) & ~dup)
+        if len(candidates):
+            similarity = (signatures[candidates] == signatures[rep[candidates]]).mean(axis=1)
+            dup[candidates[similarity >= threshold]] = True
+    return dup
+
+
+def _batches(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def score_all(records: Iterable[dict], workers: int = EVAL_WORKERS,
+              batch_size: int = EVAL_BATCH_SIZE) -> List[Dict[str, np.ndarray]]:
+    """score_batch over all records, on up to `workers` processes with a bounded number of batches in flight."""
+    if workers <= 1:
+        return [score_batch(batch) for batch in _batches(records, batch_size)]
+    results, pending = [], deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in _batches(records, batch_size):
+            pending.append(pool.submit(score_batch, batch))
+            if len(pending) >= 2 * workers:
+                results.append(pending.popleft().result())
+        results.extend(f.result() for f in pending)
+    return results
+
+
+def _rate(flags: np.ndarray) -> float:
+    return float(flags.mean()) if len(flags) else 0.0
+
+
+def _distribution(codes: np.ndarray, names: List[str]) -> dict:
+    counts = np.bincount(codes, minlength=len(names) + 1) if len(codes) else np.zeros(len(names) + 1, int)
+    return {name: {"count": int(c), "share": float(c / max(len(codes), 1))}
+            for name, c in zip(names + ["other"], counts)}
+
+
+def build_report(parts: List[Dict[str, np.ndarray]]) -> Tuple[dict, dict]:
+    """(metrics, timings) over the per-batch columns from score_batch."""
+    timings = {"worker_seconds": sum(p["seconds"] for p in parts)}
+    offsets = np.cumsum([0] + [p["quizzes"] for p in parts])
+    cols = {key: np.concatenate([p[key] for p in parts]) if parts else np.zeros(0)
+            for key in ("parse_failed", "valid", "difficulty", "type", "answer_in_options", "requested")}
+    quiz = np.concatenate([p["quiz"] + off for p, off in zip(parts, offsets)]) if parts else np.zeros(0, np.int64)
+    signatures = (np.concatenate([p["signature"] for p in parts]) if parts
+                  else np.zeros((0, NUM_PERM), dtype=np.uint32))
+    n_quizzes, n_questions = int(offsets[-1]), len(quiz)
+
+    start = time.perf_counter()
+    dup_corpus = near_duplicates(signatures)
+    dup_in_quiz = near_duplicates(signatures, groups=quiz)
+    timings["dedup_seconds"] = time.perf_counter() - start
+
+    per_quiz = np.bincount(quiz, minlength=n_quizzes)[~cols["parse_failed"].astype(bool)] if n_quizzes else quiz
+    mc = cols["type"] == 0
+    requested = cols["requested"].astype(np.int64)
+    asked = requested > 0
+    single = asked & ((requested & (requested - 1)) == 0)
+    follows = ((1 << cols["difficulty"].astype(np.int64)) & requested) != 0
+    difficulty_labels = _SINGLE_BIT[requested[single]]
+
+    report = {
+        "quizzes": n_quizzes,
+        "questions": n_questions,
+        "parse_failure_rate": _rate(cols["parse_failed"].astype(bool)),
+        "questions_per_quiz": {"mean": float(per_quiz.mean()) if len(per_quiz) else 0.0,
+                               "p50": float(np.percentile(per_quiz, 50)) if len(per_quiz) else 0.0,
+                               "p95": float(np.percentile(per_quiz, 95)) if len(per_quiz) else 0.0},
+        "schema_validity_rate": _rate(cols["valid"].astype(bool)),
+        "answer_in_options_rate": _rate(cols["answer_in_options"][mc].astype(bool)),
+        "multiple_choice_questions": int(mc.sum()),
+        "duplicate_rate": _rate(dup_corpus),
+        "duplicate_within_quiz_rate": _rate(dup_in_quiz),
+        "quizzes_with_duplicates": int(len(np.unique(quiz[dup_in_quiz]))),
+        "difficulty_distribution": _distribution(cols["difficulty"].astype(np.int64), DIFFICULTIES),
+        "type_distribution": _distribution(cols["type"].astype(np.int64), TYPES),
+        "difficulty_adherence_rate": _rate(follows[asked]),
+        "difficulty_classification": dict(
+            evaluate_classification(cols["difficulty"][single], difficulty_labels), support=int(single.sum())),
+    }
+    return report, timings
+
+
+def iter_quiz_store(path: str) -> Iterator[dict]:
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for topic, questions in db.execute("SELECT topic, questions FROM quizzes ORDER BY created_at"):
+            yield {"topic": topic, "questions": json.loads(questions)}
+    finally:
+        db.close()
+
+
+def iter_conversations(store, quiz_db: str) -> Iterator[dict]:
+    """App quizzes from stored sessions, with the difficulties each session's prompt asked for.
+
+    The app keeps only the user prompt of a quiz turn, not the model's reply,
+    so the questions are the quiz store rows saved under the session's id. Each
+    row takes the difficulties of the session's earliest unmatched quiz prompt
+    for its topic (None if there is none). Sessions with no quiz in the quiz
+    store, such as CLI chats, are not scored.
+    """
+    prompts: Dict[str, Dict[str, deque]] = {}
+    db = sqlite3.connect(f"file:{quiz_db}?mode=ro", uri=True)
+    try:
+        rows = db.execute("SELECT session_id, topic, questions FROM quizzes "
+                          "WHERE session_id IS NOT NULL ORDER BY created_at")
+        for session_id, topic, questions in rows:
+            if session_id not in prompts:
+                asked = prompts[session_id] = {}
+                for message in store.load(session_id):
+                    if message.get("role") != "user":
+                        continue
+                    content = message.get("content") or ""
+                    match, difficulties = _TOPIC_RE.search(content), requested_difficulties(content)
+                    if match and difficulties is not None:
+                        asked.setdefault(match.group(1), deque()).append(difficulties)
+            pending = prompts[session_id].get(topic)
+            yield {"topic": topic, "questions": json.loads(questions),
+                   "difficulties": pending.popleft() if pending else None}
+    finally:
+        db.close()
+
+
+def iter_jsonl(path: str) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def synthetic_quizzes(n: int, seed: int = 0) -> Iterator[dict]:
+    """Quizzes with a known mix of defects: bad items, answers missing from options, repeats, off-difficulty."""
+    rng = random.Random(seed)
+    words = ("cell energy light water plant molecule enzyme carbon oxygen membrane protein gene "
+             "force mass velocity atom charge river climate empire treaty market").split()
+    pool = [" ".join(rng.choices(words, k=8)) + "?" for _ in range(2000)]
+    for _ in range(n):
+        difficulty = rng.choice(DIFFICULTIES)
+        questions = []
+        for _ in range(rng.randint(3, 8)):
+            text = rng.choice(pool) if rng.random() < 0.1 else " ".join(rng.choices(words, k=rng.randint(6, 14))) + "?"
+            qtype = rng.choice(TYPES)
+            options = [rng.choice(words) for _ in range(4)] if qtype == "multiple-choice" else None
+            answer = options[0] if options and rng.random() < 0.9 else rng.choice(words)
+            q = {"question": text, "type": qtype, "options": options, "answer": answer,
+                 "difficulty": difficulty if rng.random() < 0.8 else rng.choice(DIFFICULTIES)}
+            if rng.random() < 0.05:
+                del q[rng.choice(["question", "answer", "type"])]
+            questions.append(q)
+        if rng.random() < 0.02:
+            questions.append(dict(questions[0]))
+        yield {"topic": rng.choice(words), "questions": questions, "difficulties": [difficulty]}
+
+
+def main(args):
+    if args.synthetic:
+        source, records = f"synthetic:{args.synthetic}", synthetic_quizzes(args.synthetic)
+    elif args.jsonl:
+        source, records = args.jsonl, iter_jsonl(args.jsonl)
+    elif args.conversations:
+        from conversation_store import get_store
+
+        source, records = "conversations", iter_conversations(get_store(), args.quiz_db)
+    else:
+        source, records = args.quiz_db, iter_quiz_store(args.quiz_db)
+
+    start = time.perf_counter()
+    parts = score_all(records, workers=args.workers, batch_size=args.batch_size)
+    score_seconds = time.perf_counter() - start
+    report, timings = build_report(parts)
+    total = time.perf_counter() - start
+    report["source"] = source
+    report["timings"] = dict(timings, score_seconds=score_seconds, total_seconds=total,
+                             quizzes_per_sec=report["quizzes"] / max(total, 1e-9), workers=args.workers)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"{report['quizzes']} quizzes / {report['questions']} questions in {total:.1f}s -> {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    from quiz_store import QUIZ_STORE_DB
+
+    parser = argparse.ArgumentParser(description="Score generated quizzes in bulk")
+    parser.add_argument("--quiz-db", default=QUIZ_STORE_DB)
+    parser.add_argument("--conversations", action="store_true",
+                        help="score the --quiz-db quizzes of stored sessions against the difficulties they asked for")
+    parser.add_argument("--jsonl", default=None)
+    parser.add_argument("--synthetic", type=int, default=0, help="score N generated quizzes instead")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=EVAL_BATCH_SIZE)
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    main(parser.parse_args())
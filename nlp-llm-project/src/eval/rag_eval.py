@@ -0,0 +1,97 @@
+# src/eval/rag_eval.py
+"""Offline retrieval eval: recall@k, MRR and per-stage latency for each retrieval mode.
+
+Run from src/:
+    python -m eval.rag_eval --index rag_index --queries queries.jsonl [--k 5] [--rerank]
+    python -m eval.rag_eval            # synthetic corpus with the hashing embedder
+
+queries.jsonl has one {"query": ..., "relevant": [doc_id, ...]} per line.
+Latency is in ms. "pack" is the dedup + token-budget packing step.
+"""
+import json
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+from retrieval import RAG_CONTEXT_TOKENS, Retriever, pack_context, timed
+
+FILLER = ("the system uses a method to compute results from data and the model then returns an "
+          "output that is stored for later use by other parts of the pipeline").split()
+
+
+def synthetic_corpus(rng, n_docs=400):
+    """Docs that share generic filler and differ by a few rare technical terms."""
+    docs, queries = [], []
+    for i in range(n_docs):
+        term = f"term{i:04d}x"
+        topic = rng.choice(["index", "gradient", "token", "cache", "kernel", "schema"])
+        body = []
+        for _ in range(rng.randint(4, 8)):
+            sentence = rng.choices(FILLER, k=rng.randint(10, 18))
+            sentence.insert(rng.randrange(len(sentence)), rng.choice([term, topic]))
+            body.append(" ".join(sentence) + ".")
+        docs.append((f"doc{i}", " ".join(body)))
+        queries.append({"query": f"how does {term} {topic} work", "relevant": [f"doc{i}"]})
+    return docs, queries
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def evaluate(retriever, queries, k, modes):
+    rows = []
+    for mode, rerank in modes:
+        recalls, rr, stage_ms = [], [], {}
+        for item in queries:
+            timings = {}
+            with timed(timings, "total"):
+                hits = retriever.search(item["query"], k=k, mode=mode, rerank=rerank, timings=timings)
+                with timed(timings, "pack"):
+                    pack_context(hits, RAG_CONTEXT_TOKENS)
+            for stage, ms in timings.items():
+                stage_ms.setdefault(stage, []).append(ms)
+            found = [h["doc_id"] for h in hits]
+            relevant = set(item["relevant"])
+            recalls.append(len(relevant & set(found)) / len(relevant))
+            rank = next((i for i, d in enumerate(found) if d in relevant), None)
+            rr.append(0.0 if rank is None else 1.0 / (rank + 1))
+        rows.append((mode + ("+rerank" if rerank else ""), np.mean(recalls), np.mean(rr), stage_ms))
+    return rows
+
+
+def main(args):
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+        retriever = Retriever(args.index)
+    else:
+        from embeddings import HashingEmbedder
+
+        docs, queries = synthetic_corpus(random.Random(0))
+        retriever = Retriever(tempfile.mkdtemp(prefix="rag-eval-"), embedder=HashingEmbedder())
+        retriever.add_documents(docs, source="synthetic")
+
+    modes = [("dense", False), ("sparse", False), ("hybrid", False)]
+    if args.rerank:
+        modes.append(("hybrid", True))
+    print(f"queries={len(queries)} k={args.k} chunks={retriever.index.live_count}")
+    for name, recall, mrr, stage_ms in evaluate(retriever, queries, args.k, modes):
+        stages = "  ".join(f"{stage}={np.mean(ms):.2f}/{percentile(ms, 95):.2f}" for stage, ms in stage_ms.items())
+        print(f"{name:>14} recall@{args.k}={recall:.3f} mrr={mrr:.3f}  ms mean/p95: {stages}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index", default=None)
+    parser.add_argument("--queries", default=None)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank", action="store_true")
+    args = parser.parse_args()
+    if args.queries and not args.index:
+        from vector_index import RAG_INDEX_DIR
+
+        args.index = RAG_INDEX_DIR
+    main(args)
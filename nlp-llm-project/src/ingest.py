@@ -0,0 +1,268 @@
+# src/ingest.py
+"""Incremental RAG corpus ingestion.
+
+Files stream through scan -> change detection -> parse -> chunk -> batch ->
+embed (worker pool) -> index write as a chain of generators, so memory is
+bounded by the batch size and the number of batches in flight, not by the
+corpus. A content-hash manifest (manifest.db next to the index) makes
+re-runs process only new or changed files and tombstone removed ones.
+
+    python ingest.py <corpus_dir> [--index rag_index] [--workers 4]
+"""
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import fnmatch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Iterator, List, Optional, Tuple
+
+from chunking import chunk_text
+from retrieval import RAG_CHUNK_OVERLAP, RAG_CHUNK_WORDS, Retriever
+from vector_index import RAG_INDEX_DIR
+
+INGEST_PATTERNS = os.getenv("INGEST_PATTERNS", "*.txt,*.md,*.html,*.htm").split(",")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))  # chunks per embedding call
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+HASH_BLOCK = 1 << 20
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Manifest:
+    """path -> (sha256, size, mtime) of every ingested file, in SQLite."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "doc_id TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER, mtime REAL, chunks INTEGER, run INTEGER)"
+        )
+        self._db.commit()
+
+    def lookup(self, doc_id: str) -> Optional[Tuple[str, int, float]]:
+        return self._db.execute("SELECT sha256, size, mtime FROM files WHERE doc_id = ?", (doc_id,)).fetchone()
+
+    def mark_seen(self, doc_id: str, run: int):
+        self._db.execute("UPDATE files SET run = ? WHERE doc_id = ?", (run, doc_id))
+
+    def touch(self, doc_id: str, size: int, mtime: float, run: int):
+        self._db.execute("UPDATE files SET size = ?, mtime = ?, run = ? WHERE doc_id = ?", (size, mtime, run, doc_id))
+
+    def record(self, doc_id: str, sha256: str, size: int, mtime: float, chunks: int, run: int):
+        self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                         (doc_id, sha256, size, mtime, chunks, run))
+
+    def unseen(self, run: int) -> List[str]:
+        return [r[0] for r in self._db.execute("SELECT doc_id FROM files WHERE run != ?", (run,))]
+
+    def forget(self, doc_ids: List[str]):
+        self._db.executemany("DELETE FROM files WHERE doc_id = ?", [(d,) for d in doc_ids])
+
+    def commit(self):
+        self._db.commit()
+
+
+@dataclass
+class Document:
+    doc_id: str
+    path: str
+    sha256: str
+    size: int
+    mtime: float
+
+
+@dataclass
+class IngestStats:
+    scanned: int = 0
+    unchanged: int = 0
+    ingested: int = 0
+    deleted: int = 0
+    chunks: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def report(self) -> str:
+        rate = self.chunks / self.seconds if self.seconds else 0.0
+        return (f"scanned={self.scanned} unchanged={self.unchanged} ingested={self.ingested} "
+                f"deleted={self.deleted} chunks={self.chunks} ({rate:.0f} chunks/s, "
+                f"{self.bytes / max(self.seconds, 1e-9) / 1e6:.1f} MB/s) peak_rss={peak_rss_mb():.0f}MB")
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def parse_file(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if path.lower().endswith((".html", ".htm")):
+        extractor = _TextExtractor()
+        extractor.feed(text)
+        text = "\n\n".join(p.strip() for p in extractor.parts if p.strip())
+    return text
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan(root: str, patterns: List[str] = INGEST_PATTERNS) -> Iterator[Tuple[str, str]]:
+    """Yield (doc_id, path) for matching files; doc_id is the path relative to root."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if any(fnmatch.fnmatch(name, p) for p in patterns):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+def changed(files: Iterator[Tuple[str, str]], manifest: Manifest, run: int,
+            stats: IngestStats) -> Iterator[Document]:
+    """Drop files whose content is already indexed. Size+mtime matching skips hashing."""
+    for doc_id, path in files:
+        stats.scanned += 1
+        st = os.stat(path)
+        known = manifest.lookup(doc_id)
+        if known and known[1] == st.st_size and known[2] == st.st_mtime:
+            manifest.mark_seen(doc_id, run)
+            stats.unchanged += 1
+            continue
+        sha = file_sha256(path)
+        if known and known[0] == sha:
+            manifest.touch(doc_id, st.st_size, st.st_mtime, run)
+            stats.unchanged += 1
+            continue
+        yield Document(doc_id, path, sha, st.st_size, st.st_mtime)
+
+
+def chunked(docs: Iterator[Document], max_words: int = RAG_CHUNK_WORDS,
+            overlap: int = RAG_CHUNK_OVERLAP) -> Iterator[Tuple[Document, str, bool]]:
+    """Yield (doc, chunk, is_last_chunk_of_doc); empty documents yield a single empty marker."""
+    for doc in docs:
+        chunks = chunk_text(parse_file(doc.path), max_words, overlap)
+        if not chunks:
+            yield doc, "", True
+        for i, chunk in enumerate(chunks):
+            yield doc, chunk, i == len(chunks) - 1
+
+
+def batched(items: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embedded(batches: Iterator[list], embedder, workers: int) -> Iterator[tuple]:
+    """Embed batches on a thread pool (torch/onnxruntime release the GIL), keeping input order.
+
+    At most 2 * workers batches are in flight, which is what bounds memory.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            texts = [chunk for _, chunk, _ in batch if chunk]
+            pending.append((batch, pool.submit(embedder.embed, texts)))
+            if len(pending) >= 2 * workers:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+
+def ingest(root: str, retriever: Retriever, manifest: Manifest, workers: int = INGEST_WORKERS,
+           batch_size: int = INGEST_BATCH_SIZE, patterns: List[str] = INGEST_PATTERNS) -> IngestStats:
+    stats = IngestStats()
+    run = int(time.time() * 1000)
+    start = time.perf_counter()
+    started = set()  # doc_ids whose old chunks were already tombstoned this run
+    counts = {}
+
+    docs = changed(scan(root, patterns), manifest, run, stats)
+    for batch, vectors in embedded(batched(chunked(docs), batch_size), retriever.embedder, workers):
+        for doc, _, _ in batch:
+            if doc.doc_id not in started:
+                # Changed or half-written documents: drop whatever chunks they had before
+                retriever.delete_documents([doc.doc_id])
+                started.add(doc.doc_id)
+        rows = [(doc, chunk) for doc, chunk, _ in batch if chunk]
+        if rows:
+            retriever.add_chunks(vectors, [{"doc_id": doc.doc_id, "text": chunk, "source": doc.path} for doc, chunk in rows])
+        for doc, chunk, last in batch:
+            if chunk:
+                counts[doc.doc_id] = counts.get(doc.doc_id, 0) + 1
+            if last:
+                n = counts.pop(doc.doc_id, 0)
+                manifest.record(doc.doc_id, doc.sha256, doc.size, doc.mtime, n, run)
+                started.discard(doc.doc_id)
+                stats.ingested += 1
+                stats.chunks += n
+                stats.bytes += doc.size
+        manifest.commit()
+
+    removed = manifest.unseen(run)
+    if removed:
+        retriever.delete_documents(removed)
+        manifest.forget(removed)
+        stats.deleted = len(removed)
+    manifest.commit()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest a document folder into the RAG index")
+    parser.add_argument("root")
+    parser.add_argument("--index", default=RAG_INDEX_DIR)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--compact", action="store_true", help="reclaim space from deleted chunks afterwards")
+    args = parser.parse_args()
+
+    retriever = Retriever(args.index)
+    stats = ingest(args.root, retriever, Manifest(os.path.join(args.index, "manifest.db")),
+                   workers=args.workers, batch_size=args.batch_size)
+    print(stats.report())
+    if args.compact:
+        print(f"Compacted {retriever.compact()} deleted chunks")
@@ -0,0 +1,334 @@
+# src/llm_client.py
+"""One shared way to call the chat model, for the app and every script.
+
+The call policy lives here; providers (llm_providers.py) only know how to
+talk to a backend. Per logical call:
+
+  circuit breaker -> client-side token bucket -> provider call (hedged) ->
+  on a retryable error, jittered exponential backoff (or the server's
+  Retry-After, if longer) and try again, up to LLM_MAX_RETRIES times.
+
+Async code awaits chat_completion / stream_chat_completion; sync scripts call
+complete(), which runs the same policy on a private event loop thread.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+import weakref
+from collections import deque
+from typing import AsyncIterator, List, Optional
+
+from circuit_breaker import CircuitBreaker
+from llm_providers import LLM_BACKEND, LLMError, Provider, create_provider
+from rate_limit import AsyncTokenBucket
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "0"))  # requests per second, 0 = unlimited
+LLM_RATE_BURST = float(os.getenv("LLM_RATE_BURST", "0")) or None
+LLM_HEDGE_DELAY = os.getenv("LLM_HEDGE_DELAY", "0").lower()  # 0 = off, seconds, or "p95"
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # 0 = no circuit breaker
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+HEDGE_MIN_SAMPLES = 20
+
+
+class LLMUnavailable(LLMError):
+    """The model could not be reached within the retry policy (or the circuit is open)."""
+
+    retryable = True
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, for adaptive hedging."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def count(self) -> int:
+        return len(self._samples)
+
+
+class LLMClient:
+    def __init__(self, provider: Provider, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES, rate: float = LLM_RATE_LIMIT, burst: Optional[float] = LLM_RATE_BURST,
+                 hedge_delay: str = LLM_HEDGE_DELAY, breaker: Optional[CircuitBreaker] = None):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.hedge_delay = hedge_delay
+        self.rate_limiter = AsyncTokenBucket(rate, burst)
+        self.breaker = breaker or CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+        self.latency = LatencyTracker()
+        self._semaphores = weakref.WeakKeyDictionary()  # event loop -> Semaphore
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, but never sooner than the server asked."""
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, LLM_BACKOFF_MAX * 3))
+        return delay
+
+    def _hedge_after(self) -> Optional[float]:
+        if self.hedge_delay in ("", "0", "off"):
+            return None
+        if self.hedge_delay == "p95":
+            if self.latency.count() < HEDGE_MIN_SAMPLES:
+                return None
+            return self.latency.percentile(0.95)
+        return float(self.hedge_delay)
+
+    def _check_breaker(self) -> bool:
+        """Raise if the circuit is open; returns whether this attempt is the half-open trial."""
+        trial = self.breaker.acquire()
+        if trial is None:
+            raise LLMUnavailable("circuit open: model backend is failing", retry_after=self.breaker.retry_after())
+        return trial
+
+    def _record_error(self, e: Exception):
+        self._count("failures")
+        if isinstance(e, LLMError) and e.status == 429:
+            self._count("rate_limited")
+        if isinstance(e, LLMError) and (e.status == 429 or not e.retryable):
+            self.breaker.record_success()  # the backend answered (busy, or rejected the request): it is up
+        else:
+            self.breaker.record_failure()
+
+    async def _call(self, messages, model, timeout, response_format) -> str:
+        self._count("attempts")
+        start = time.perf_counter()
+        try:
+            result = await self.provider.complete(messages, model, timeout, response_format)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record_error(e)
+            raise
+        self.latency.record(time.perf_counter() - start)
+        self.breaker.record_success()
+        return result
+
+    async def _hedged_call(self, messages, model, timeout, response_format) -> str:
+        """Send a second copy of a call that is slower than the hedge delay; first success wins."""
+        delay = self._hedge_after()
+        primary = asyncio.ensure_future(self._call(messages, model, timeout, response_format))
+        pending = {primary}
+        try:
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not self.rate_limiter.try_acquire():
+                return await primary
+            self._count("hedges")
+            hedge = asyncio.ensure_future(self._call(messages, model, timeout, response_format))
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _with_retries(self, attempt_fn):
+        for attempt in range(self.max_retries + 1):
+            trial = self._check_breaker()
+            try:
+                await self.rate_limiter.acquire()
+                return await attempt_fn()
+            except LLMError as e:
+                if not e.retryable:
+                    raise
+                if attempt == self.max_retries:
+                    raise LLMUnavailable(f"gave up after {attempt + 1} attempts: {e}",
+                                         status=e.status, retry_after=e.retry_after) from e
+                self._count("retries")
+                retry_after = e.retry_after
+            finally:
+                if trial:
+                    self.breaker.end_trial()
+            await asyncio.sleep(self.backoff(attempt, retry_after))
+
+    async def chat_completion(self, messages: List[dict], model: Optional[str] = None, timeout: Optional[float] = None,
+                              response_format: Optional[dict] = None) -> str:
+        model = model or LLM_MODEL
+        timeout = timeout or LLM_TIMEOUT
+        self._count("calls")
+        async with self._semaphore():
+            return await self._with_retries(lambda: self._hedged_call(messages, model, timeout, response_format))
+
+    async def stream_chat_completion(self, messages: List[dict], model: Optional[str] = None,
+                                     timeout: Optional[float] = None,
+                                     response_format: Optional[dict] = None) -> AsyncIterator[str]:
+        """Content deltas. Retries only until the first delta arrives; after that errors propagate."""
+        model = model or LLM_MODEL
+        timeout = timeout or LLM_TIMEOUT
+        self._count("calls")
+        async with self._semaphore():
+            for attempt in range(self.max_retries + 1):
+                trial = self._check_breaker()
+                started = False
+                try:
+                    await self.rate_limiter.acquire()
+                    self._count("attempts")
+                    async for delta in self.provider.stream(messages, model, timeout, response_format):
+                        started = True
+                        yield delta
+                    self.breaker.record_success()
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._record_error(e)
+                    if started or not isinstance(e, LLMError) or not e.retryable:
+                        raise
+                    if attempt == self.max_retries:
+                        raise LLMUnavailable(f"gave up after {attempt + 1} attempts: {e}",
+                                             status=e.status, retry_after=e.retry_after) from e
+                    self._count("retries")
+                    retry_after = e.retry_after
+                finally:
+                    if trial:
+                        self.breaker.end_trial()
+                await asyncio.sleep(self.backoff(attempt, retry_after))
+
+    def stats(self) -> dict:
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        return {
+            "llm_provider": self.provider.name,
+            "llm_calls": self.calls,
+            "llm_attempts": self.attempts,
+            "llm_retries": self.retries,
+            "llm_rate_limited": self.rate_limited,
+            "llm_failures": self.failures,
+            "llm_hedges": self.hedges,
+            "llm_hedge_wins": self.hedge_wins,
+            "llm_breaker_state": self.breaker.state,
+            "llm_breaker_opens": self.breaker.opens,
+            "llm_breaker_rejected": self.breaker.rejected,
+            "llm_latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "llm_latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> LLMClient:
+    """Process-wide client for the provider chosen by LLM_PROVIDER."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(create_provider(LLM_PROVIDER))
+    return _client
+
+
+def set_provider(provider: Provider) -> LLMClient:
+    """Swap in another provider (a local model or a test fake) with a fresh policy state."""
+    global _client
+    with _client_lock:
+        _client = LLMClient(provider)
+    return _client
+
+
+async def chat_completion(
+    messages: List[dict],
+    model: Optional[str] = None,
+    timeout: Optional[float] = None,
+    response_format: Optional[dict] = None,
+) -> str:
+    """Run one chat completion without blocking the event loop.
+
+    At most LLM_MAX_CONCURRENCY calls are in flight at once; the rest wait
+    for a slot. Set LLM_BACKEND=thread to run the sync OpenAI client in a
+    worker thread instead of using the async client. response_format is
+    passed through for structured (JSON schema) output.
+    """
+    return await get_client().chat_completion(messages, model, timeout, response_format)
+
+
+async def stream_chat_completion(
+    messages: List[dict],
+    model: Optional[str] = None,
+    timeout: Optional[float] = None,
+    response_format: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    """Yield the completion text as it arrives (content deltas only).
+
+    Holds a concurrency slot for the whole stream. The thread backend has no
+    streaming, so it yields the full completion as a single chunk.
+    """
+    async for delta in get_client().stream_chat_completion(messages, model, timeout, response_format):
+        yield delta
+
+
+def _loop() -> asyncio.AbstractEventLoop:
+    global _sync_loop
+    with _client_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="llm-client", daemon=True).start()
+    return _sync_loop
+
+
+def complete(messages: List[dict], model: Optional[str] = None, timeout: Optional[float] = None,
+             response_format: Optional[dict] = None) -> str:
+    """Blocking chat_completion for scripts and CLIs (same retries, limits and breaker)."""
+    future = asyncio.run_coroutine_threadsafe(chat_completion(messages, model, timeout, response_format), _loop())
+    return future.result()
+
+
+def stats() -> dict:
+    return get_client().stats()
+
+
+async def aclose():
+    """Close the pooled HTTP connections of this event loop (called on app shutdown)."""
+    if _client is not None:
+        await _client.provider.aclose()
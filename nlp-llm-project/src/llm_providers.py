@@ -0,0 +1,212 @@
+# src/llm_providers.py
+import os
+import time
+import asyncio
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import metrics
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "async").lower()  # "async" or "thread"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "1") == "1"  # ask for a final usage chunk on streams
+
+
+class LLMError(Exception):
+    """A failed model call. `retryable` errors may succeed if sent again later."""
+
+    retryable = False
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class LLMRateLimited(LLMError):
+    retryable = True
+
+
+class LLMTransientError(LLMError):
+    """Timeouts, dropped connections and 5xx responses."""
+
+    retryable = True
+
+
+class Provider:
+    """A chat model backend. Subclasses raise LLMError subclasses on failure."""
+
+    name = "base"
+
+    async def complete(self, messages: List[dict], model: str, timeout: float,
+                       response_format: Optional[dict] = None) -> str:
+        raise NotImplementedError
+
+    async def stream(self, messages: List[dict], model: str, timeout: float,
+                     response_format: Optional[dict] = None) -> AsyncIterator[str]:
+        """Content deltas; providers without streaming yield the whole completion once."""
+        yield await self.complete(messages, model, timeout, response_format)
+
+    async def aclose(self):
+        pass
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds from retry-after-ms / Retry-After (delta seconds or HTTP date)."""
+    if headers is None:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class OpenAIProvider(Provider):
+    """OpenAI-compatible HTTP API (OPENAI_BASE_URL points it at any compatible server).
+
+    The SDK's own retries are off; retry policy lives in llm_client. Async
+    clients are kept per event loop because their connection pool is bound
+    to the loop that opened it.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 backend: str = LLM_BACKEND, max_connections: int = LLM_MAX_CONNECTIONS):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.backend = backend
+        self.max_connections = max_connections
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        self._sync_client = None
+
+    def async_client(self):
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0,
+                                 http_client=DefaultAsyncHttpxClient(limits=limits))
+            self._async_clients[loop] = client
+        return client
+
+    def sync_client(self):
+        if self._sync_client is None:
+            from openai import OpenAI
+
+            self._sync_client = OpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0)
+        return self._sync_client
+
+    @staticmethod
+    def _options(response_format: Optional[dict]) -> dict:
+        return {"response_format": response_format} if response_format else {}
+
+    @classmethod
+    def _raise(cls, e: Exception):
+        translated = cls.translate(e)
+        if translated is e:
+            raise e
+        raise translated from e
+
+    @staticmethod
+    def translate(e: Exception) -> Exception:
+        import openai
+
+        if isinstance(e, openai.APITimeoutError):
+            return LLMTransientError(f"timeout: {e}")
+        if isinstance(e, openai.APIConnectionError):
+            return LLMTransientError(f"connection error: {e}")
+        if isinstance(e, openai.APIStatusError):
+            retry_after = parse_retry_after(e.response.headers)
+            if e.status_code == 429:
+                return LLMRateLimited(str(e), status=429, retry_after=retry_after)
+            if e.status_code >= 500 or e.status_code in (408, 409):
+                return LLMTransientError(str(e), status=e.status_code, retry_after=retry_after)
+            return LLMError(str(e), status=e.status_code)
+        return e
+
+    def _create_sync(self, messages, model, timeout, response_format):
+        response = self.sync_client().chat.completions.create(
+            model=model, messages=messages, timeout=timeout, **self._options(response_format)
+        )
+        self._record_usage(response.usage)
+        return response.choices[0].message.content
+
+    def _record_usage(self, usage):
+        if usage is not None:
+            metrics.record_usage(self.name, usage.prompt_tokens, usage.completion_tokens)
+
+    async def complete(self, messages, model, timeout, response_format=None) -> str:
+        try:
+            if self.backend == "thread":
+                return await asyncio.to_thread(self._create_sync, messages, model, timeout, response_format)
+            response = await self.async_client().chat.completions.create(
+                model=model, messages=messages, timeout=timeout, **self._options(response_format)
+            )
+            self._record_usage(response.usage)
+            return response.choices[0].message.content
+        except Exception as e:
+            self._raise(e)
+
+    async def stream(self, messages, model, timeout, response_format=None) -> AsyncIterator[str]:
+        if self.backend == "thread":
+            yield await self.complete(messages, model, timeout, response_format)
+            return
+        try:
+            options = self._options(response_format)
+            if LLM_STREAM_USAGE:
+                options["stream_options"] = {"include_usage": True}
+            stream = await self.async_client().chat.completions.create(
+                model=model, messages=messages, timeout=timeout, stream=True, **options
+            )
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    self._record_usage(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            self._raise(e)
+
+    async def aclose(self):
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+
+def _local_provider() -> Provider:
+    from local_llm import LocalProvider  # imports torch, so only when selected
+
+    return LocalProvider()
+
+
+PROVIDERS: Dict[str, Callable[[], Provider]] = {"openai": OpenAIProvider, "local": _local_provider}
+
+
+def register_provider(name: str, factory: Callable[[], Provider]):
+    """Make a provider selectable with LLM_PROVIDER=<name>."""
+    PROVIDERS[name] = factory
+
+
+def create_provider(name: str) -> Provider:
+    try:
+        factory = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM provider '{name}' (known: {', '.join(sorted(PROVIDERS))})")
+    return factory()
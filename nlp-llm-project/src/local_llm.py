@@ -0,0 +1,351 @@
+# src/local_llm.py
+"""Local CPU inference for the LoRA adapter trained by training/train.py.
+
+Select it with LLM_PROVIDER=local; query_llm and the streaming endpoint then
+go through LocalProvider instead of the remote API, with the same retry and
+concurrency policy from llm_client.
+
+Concurrent requests share forward passes through continuous batching: one
+engine thread owns the model, new prompts are prefilled as they arrive and
+then join the running decode batch at the next step, and finished sequences
+leave it immediately, so a short quiz never waits for a long one.
+
+LOCAL_QUANTIZE=int8 uses torch dynamic quantization, which picks one
+activation scale for the whole batch tensor. Greedy output then depends on
+which requests happen to share a decode step, so int8 is only the default
+with LOCAL_MAX_BATCH=1; setting it with batching trades that determinism
+for speed and memory.
+
+    python local_llm.py export --out outputs/lora-merged   # merge adapter into the base weights
+"""
+import os
+import json
+import time
+import queue
+import asyncio
+import argparse
+import threading
+from typing import AsyncIterator, List, Optional
+
+import metrics
+from llm_providers import LLMError, Provider
+
+LOCAL_ADAPTER_DIR = os.getenv("LOCAL_ADAPTER_DIR", "outputs/lora-adapted")
+LOCAL_BASE_MODEL = os.getenv("LOCAL_BASE_MODEL", "")  # default: base_model_name_or_path from the adapter config
+LOCAL_MODEL_DIR = os.getenv("LOCAL_MODEL_DIR", "")  # merged export; skips base + adapter loading
+LOCAL_MAX_BATCH = int(os.getenv("LOCAL_MAX_BATCH", "8"))
+# int8 (dynamic, Linear layers) or none; int8 is off by default when batching, see the module docstring
+LOCAL_QUANTIZE = os.getenv("LOCAL_QUANTIZE", "none" if LOCAL_MAX_BATCH > 1 else "int8").lower()
+LOCAL_MAX_NEW_TOKENS = int(os.getenv("LOCAL_MAX_NEW_TOKENS", "512"))
+LOCAL_TEMPERATURE = float(os.getenv("LOCAL_TEMPERATURE", "0"))  # 0 = greedy
+LOCAL_THREADS = int(os.getenv("LOCAL_THREADS", "0"))  # torch intra-op threads, 0 = torch default
+
+
+def _adapter_base(adapter_dir: str) -> str:
+    with open(os.path.join(adapter_dir, "adapter_config.json"), "r", encoding="utf-8") as f:
+        return json.load(f)["base_model_name_or_path"]
+
+
+def load_model(model_dir: str = LOCAL_MODEL_DIR, adapter_dir: str = LOCAL_ADAPTER_DIR,
+               base_model: str = LOCAL_BASE_MODEL, quantize: str = LOCAL_QUANTIZE):
+    """(model, tokenizer) on CPU in eval mode: a merged export, or base + adapter merged in memory."""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    if LOCAL_THREADS:
+        torch.set_num_threads(LOCAL_THREADS)
+    if model_dir:
+        model = AutoModelForCausalLM.from_pretrained(model_dir, torch_dtype=torch.float32)
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    else:
+        has_adapter = os.path.exists(os.path.join(adapter_dir, "adapter_config.json"))
+        base_model = base_model or (_adapter_base(adapter_dir) if has_adapter else "")
+        if not base_model:
+            raise ValueError(f"No adapter at {adapter_dir}; set LOCAL_BASE_MODEL or LOCAL_MODEL_DIR")
+        model = AutoModelForCausalLM.from_pretrained(base_model, torch_dtype=torch.float32)
+        tokenizer = AutoTokenizer.from_pretrained(base_model)
+        if has_adapter:
+            from peft import PeftModel
+
+            # Merging removes the per-layer LoRA matmuls from every forward pass
+            model = PeftModel.from_pretrained(model, adapter_dir).merge_and_unload()
+        else:
+            print(f"No LoRA adapter at {adapter_dir}; serving {base_model} as is")
+    model.eval()
+    if quantize == "int8":
+        if LOCAL_MAX_BATCH > 1:
+            print("Warning: int8 with LOCAL_MAX_BATCH > 1 makes greedy output depend on batch composition")
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    return model, tokenizer
+
+
+def export_merged(out_dir: str, adapter_dir: str = LOCAL_ADAPTER_DIR, base_model: str = LOCAL_BASE_MODEL,
+                  max_shard_size: str = "2GB"):
+    """Write base + adapter as one plain checkpoint (load it with LOCAL_MODEL_DIR), in max_shard_size files."""
+    model, tokenizer = load_model("", adapter_dir, base_model, quantize="none")
+    model.save_pretrained(out_dir, safe_serialization=True, max_shard_size=max_shard_size)
+    tokenizer.save_pretrained(out_dir)
+    return out_dir
+
+
+def _cache_layers(cache) -> list:
+    """[(keys, values), ...] per layer for any transformers cache flavour."""
+    if isinstance(cache, (tuple, list)):
+        return [(k, v) for k, v in cache]
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def _make_cache(layers: list):
+    from transformers import DynamicCache
+
+    cache = DynamicCache()
+    for i, (k, v) in enumerate(layers):
+        cache.update(k, v, i)
+    return cache
+
+
+class _Sequence:
+    def __init__(self, prompt_ids: List[int], max_new_tokens: int, loop: asyncio.AbstractEventLoop):
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.loop = loop
+        self.tokens: asyncio.Queue = asyncio.Queue()
+        self.generated: List[int] = []
+        self.layers = None  # per-layer (k, v) of shape [1, heads, length, dim]
+        self.length = 0  # positions held in the cache
+        self.cancelled = False
+
+    def emit(self, item):
+        self.loop.call_soon_threadsafe(self.tokens.put_nowait, item)
+
+
+class BatchEngine:
+    """Continuous-batching generation loop on a dedicated thread.
+
+    Each step decodes one token for every active sequence in a single
+    forward pass. Per-sequence KV caches are left-padded to the longest one
+    for the step (the attention mask hides the padding) and split back
+    afterwards, which is what lets sequences join and leave between steps.
+    """
+
+    def __init__(self, model, tokenizer, max_batch: int = LOCAL_MAX_BATCH, temperature: float = LOCAL_TEMPERATURE):
+        import torch
+
+        self._torch = torch
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch = max_batch
+        self.temperature = temperature
+        self.eos_ids = {tokenizer.eos_token_id} if tokenizer.eos_token_id is not None else set()
+        self._waiting: "queue.Queue[_Sequence]" = queue.Queue()
+        self._active: List[_Sequence] = []
+        self._stopped = False
+        self.steps = 0
+        self.batched_tokens = 0
+        self.generated_tokens = 0
+        self.prefill_tokens = 0
+        self._thread = threading.Thread(target=self._run, name="local-llm", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt_ids: List[int], max_new_tokens: int) -> _Sequence:
+        seq = _Sequence(prompt_ids, max_new_tokens, asyncio.get_running_loop())
+        self._waiting.put(seq)
+        return seq
+
+    def stop(self):
+        self._stopped = True
+        self._waiting.put(None)
+
+    def _sample(self, logits) -> "list[int]":
+        torch = self._torch
+        if self.temperature <= 0:
+            return logits.argmax(dim=-1).tolist()
+        probs = torch.softmax(logits / self.temperature, dim=-1)
+        return torch.multinomial(probs, 1).squeeze(-1).tolist()
+
+    def _admit(self):
+        block = not self._active
+        while len(self._active) < self.max_batch:
+            try:
+                seq = self._waiting.get(block=block)
+            except queue.Empty:
+                return
+            block = False
+            if seq is None:
+                return
+            if not seq.cancelled:
+                try:
+                    self._prefill(seq)
+                except Exception as e:
+                    print("Error: local prefill failed:", e)
+                    seq.emit(e)
+
+    def _prefill(self, seq: _Sequence):
+        torch = self._torch
+        ids = torch.tensor([seq.prompt_ids])
+        with torch.inference_mode():
+            out = self.model(input_ids=ids, use_cache=True)
+        seq.layers = _cache_layers(out.past_key_values)
+        seq.length = len(seq.prompt_ids)
+        self.prefill_tokens += seq.length
+        self._push(seq, self._sample(out.logits[:, -1, :])[0])
+        if not self._finished(seq):
+            self._active.append(seq)
+
+    def _push(self, seq: _Sequence, token: int):
+        seq.generated.append(token)
+        self.generated_tokens += 1
+        if token not in self.eos_ids:
+            seq.emit(token)
+
+    def _finished(self, seq: _Sequence) -> bool:
+        done = seq.cancelled or seq.generated[-1] in self.eos_ids or len(seq.generated) >= seq.max_new_tokens
+        if done:
+            seq.layers = None
+            seq.emit(None)
+        return done
+
+    def _decode_step(self):
+        torch = self._torch
+        batch = self._active
+        longest = max(seq.length for seq in batch)
+        n_layers = len(batch[0].layers)
+        layers = []
+        for layer in range(n_layers):
+            keys, values = [], []
+            for seq in batch:
+                k, v = seq.layers[layer]
+                pad = longest - seq.length
+                if pad:
+                    k = torch.nn.functional.pad(k, (0, 0, pad, 0))
+                    v = torch.nn.functional.pad(v, (0, 0, pad, 0))
+                keys.append(k)
+                values.append(v)
+            layers.append((torch.cat(keys), torch.cat(values)))
+        mask = torch.zeros(len(batch), longest + 1, dtype=torch.long)
+        for row, seq in enumerate(batch):
+            mask[row, longest - seq.length:] = 1
+        input_ids = torch.tensor([[seq.generated[-1]] for seq in batch])
+        positions = torch.tensor([[seq.length] for seq in batch])
+
+        with torch.inference_mode():
+            out = self.model(input_ids=input_ids, attention_mask=mask, position_ids=positions,
+                             past_key_values=_make_cache(layers), use_cache=True)
+        new_layers = _cache_layers(out.past_key_values)
+        tokens = self._sample(out.logits[:, -1, :])
+        self.steps += 1
+        self.batched_tokens += len(batch)
+
+        still_active = []
+        for row, seq in enumerate(batch):
+            start = longest - seq.length
+            seq.layers = [(k[row:row + 1, :, start:].clone(), v[row:row + 1, :, start:].clone())
+                          for k, v in new_layers]
+            seq.length += 1
+            self._push(seq, tokens[row])
+            if not self._finished(seq):
+                still_active.append(seq)
+        self._active = still_active
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                self._admit()
+                if self._active:
+                    self._decode_step()
+            except Exception as e:
+                print("Error: local inference step failed:", e)
+                for seq in self._active:
+                    seq.emit(e)
+                self._active = []
+
+    def stats(self) -> dict:
+        return {
+            "local_steps": self.steps,
+            "local_generated_tokens": self.generated_tokens,
+            "local_prefill_tokens": self.prefill_tokens,
+            "local_mean_batch": self.batched_tokens / self.steps if self.steps else 0.0,
+            "local_active": len(self._active),
+            "local_waiting": self._waiting.qsize(),
+        }
+
+
+def format_prompt(tokenizer, messages: List[dict]) -> List[int]:
+    if getattr(tokenizer, "chat_template", None):
+        return tokenizer.apply_chat_template(messages, add_generation_prompt=True)
+    text = "".join(f"{m['role'].capitalize()}: {m['content']}\n\n" for m in messages) + "Assistant:"
+    return tokenizer(text)["input_ids"]
+
+
+class LocalProvider(Provider):
+    """Provider backed by a local BatchEngine. response_format is not enforced;
+    quiz_parser already repairs and validates free-form JSON."""
+
+    name = "local"
+
+    def __init__(self, max_new_tokens: int = LOCAL_MAX_NEW_TOKENS, engine: Optional[BatchEngine] = None):
+        self.max_new_tokens = max_new_tokens
+        self._engine = engine
+        self._load_lock = threading.Lock()
+
+    def engine(self) -> BatchEngine:
+        with self._load_lock:
+            if self._engine is None:
+                model, tokenizer = load_model()
+                self._engine = BatchEngine(model, tokenizer)
+        return self._engine
+
+    async def stream(self, messages, model, timeout, response_format=None) -> AsyncIterator[str]:
+        engine = self._engine or await asyncio.to_thread(self.engine)
+        tokenizer = engine.tokenizer
+        seq = engine.submit(format_prompt(tokenizer, messages), self.max_new_tokens)
+        ids: List[int] = []
+        sent = ""
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMError(f"local generation exceeded {timeout}s")
+                try:
+                    item = await asyncio.wait_for(seq.tokens.get(), remaining)
+                except asyncio.TimeoutError:
+                    raise LLMError(f"local generation exceeded {timeout}s")
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise LLMError(f"local inference failed: {item}") from item
+                ids.append(item)
+                text = tokenizer.decode(ids, skip_special_tokens=True)
+                if text.endswith("�"):
+                    continue  # wait for the rest of a multi-byte character
+                if len(text) > len(sent):
+                    yield text[len(sent):]
+                    sent = text
+        finally:
+            seq.cancelled = True
+            metrics.record_usage(self.name, len(seq.prompt_ids), len(ids))
+
+    async def complete(self, messages, model, timeout, response_format=None) -> str:
+        return "".join([delta async for delta in self.stream(messages, model, timeout, response_format)])
+
+    def stats(self) -> dict:
+        return self._engine.stats() if self._engine is not None else {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local LoRA model utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="merge the LoRA adapter into the base model weights")
+    export.add_argument("--out", default="outputs/lora-merged")
+    export.add_argument("--adapter", default=LOCAL_ADAPTER_DIR)
+    export.add_argument("--base", default=LOCAL_BASE_MODEL)
+    export.add_argument("--max-shard-size", default="2GB", help="split weights into files of at most this size")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"Merged model written to {export_merged(args.out, args.adapter, args.base, args.max_shard_size)}")
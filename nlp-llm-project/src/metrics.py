@@ -0,0 +1,259 @@
+# src/metrics.py
+"""In-process metrics for the quiz API, rendered in Prometheus text format at /metrics.
+
+Counters, gauges and histograms are plain dicts keyed by label values under
+one lock each, which keeps a span to a couple of microseconds. Stage timings use
+
+    with metrics.span("query_llm"):
+        ...
+
+and land in quiz_stage_seconds{endpoint, stage}; the endpoint label comes
+from the enclosing metrics.track(endpoint) block, which also maintains the
+per-endpoint in-flight gauge. MetricsMiddleware times every HTTP request
+end to end, including streamed bodies.
+
+With METRICS_OTEL=1 every span is also exported as an OpenTelemetry span
+over OTLP (the standard OTEL_EXPORTER_OTLP_* variables configure the
+endpoint); if the SDK is not installed that part is skipped.
+"""
+import os
+import math
+import time
+import bisect
+import threading
+import contextvars
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_OTEL = os.getenv("METRICS_OTEL", "0") == "1"
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "quiz")
+
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_endpoint = contextvars.ContextVar("metrics_endpoint", default="other")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = f"{METRICS_PREFIX}_{name}" if METRICS_PREFIX else name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+        REGISTRY.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, *labels: str):
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+
+class Histogram(_Metric):
+    """Per-bucket counts (made cumulative when rendered), sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._values.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(counts), total, n)) for k, (counts, total, n) in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (math.inf,), counts):
+                cumulative += c
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route, method and status.",
+                        ("route", "method", "status"))
+HTTP_SECONDS = Histogram("http_request_seconds", "HTTP request latency, until the last body byte.", ("route", "method"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+IN_FLIGHT = Gauge("requests_in_flight", "Quiz/PDF generations in progress by endpoint.", ("endpoint",))
+STAGE_SECONDS = Histogram("stage_seconds", "Time per request stage.", ("endpoint", "stage"))
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the model backend.", ("provider", "kind"))
+
+_tracer = None
+if METRICS_OTEL:
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+        _provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "quiz-api")}))
+        _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(_provider)
+        _tracer = trace.get_tracer("quiz-api")
+    except ImportError as e:
+        print(f"Warning: METRICS_OTEL=1 but OpenTelemetry SDK/exporter is unavailable ({e}); spans stay local")
+
+
+class span:
+    """Time a block into quiz_stage_seconds{endpoint, stage} (and an OpenTelemetry span if enabled)."""
+
+    __slots__ = ("stage", "start", "_otel")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._otel = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self._otel = _tracer.start_as_current_span(self.stage, attributes={"endpoint": _endpoint.get()})
+            self._otel.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, _endpoint.get(), self.stage)
+        if self._otel is not None:
+            self._otel.__exit__(*exc)
+        return False
+
+
+class track:
+    """Mark the enclosed work as `endpoint`: in-flight gauge, plus a "total" stage span and the label for inner spans."""
+
+    __slots__ = ("endpoint", "_token", "_span")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self._token = _endpoint.set(self.endpoint)
+        IN_FLIGHT.inc(1, self.endpoint)
+        self._span = span("total")
+        self._span.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._span.__exit__(*exc)
+        IN_FLIGHT.dec(1, self.endpoint)
+        try:
+            _endpoint.reset(self._token)
+        except ValueError:  # streaming generator closed from another context (client went away)
+            pass
+        return False
+
+
+def record_usage(provider: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, provider, "prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, provider, "completion")
+
+
+def render(stats: Optional[Dict[str, float]] = None) -> str:
+    """Every registered metric, plus numeric entries of `stats` as <prefix>_<key> gauges."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for key, value in (stats or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+            name = f"{METRICS_PREFIX}_{key}" if METRICS_PREFIX else key
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request count, latency and in-flight gauge, labelled by route template (not raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - start, path, scope["method"])
+            HTTP_REQUESTS.inc(1, path, scope["method"], str(status[0]))
+            HTTP_IN_FLIGHT.dec()
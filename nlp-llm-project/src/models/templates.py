@@ -1,10 +1,11 @@
-System: You are a helpful assistant.
+# src/models/templates.py
+RAG_SYSTEM_PROMPT = "You are a helpful assistant."
 
-User: Use the following context to answer. Provide a concise answer and cite sources.
+RAG_USER_TEMPLATE = """Use the following context to answer. Provide a concise answer and cite sources.
 Context:
 {context}
 
 Question:
 {question}
 
-Answer (concise, list sources at end):
+Answer (concise, list sources at end):"""
@@ -1,3 +1,12 @@
-from openai import OpenAI
+import os
+import sys
 
-client = OpenAI()  # Reads API key from OPENAI_API_KEY env variable
+# others/ scripts run from this folder; the shared client lives in src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client  # noqa: E402  (reads OPENAI_API_KEY / LLM_* env variables)
+
+
+def chat(messages, model=None):
+    """Send chat messages through the shared LLM client and return the reply text."""
+    return llm_client.complete(messages, model=model)
@@ -1,7 +1,7 @@
 import os
 import json
 from datetime import datetime
-from gpt_client import client
+from gpt_client import chat
 
 QUIZ_DIR = "quizzes"
 os.makedirs(QUIZ_DIR, exist_ok=True)
@@ -21,14 +21,10 @@ def generate_quiz(topic, num_questions=5):
       ...
     ]
     """
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an educational assistant creating quizzes with explanations."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    quiz_text = response.choices[0].message.content
+    quiz_text = chat([
+        {"role": "system", "content": "You are an educational assistant creating quizzes with explanations."},
+        {"role": "user", "content": prompt}
+    ])
     try:
         quiz = json.loads(quiz_text)
     except json.JSONDecodeError:
@@ -78,14 +74,11 @@ def take_quiz(quiz):
             user_answer = input("Your answer (A/B/C/D) or type '/hint': ").strip().upper()
             if user_answer == "/HINT":
                 hint_prompt = f"Provide a short hint for this question: {q['question']}"
-                hint_response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful tutor providing hints."},
-                        {"role": "user", "content": hint_prompt}
-                    ]
-                )
-                print(f"💡 Hint: {hint_response.choices[0].message.content}")
+                hint = chat([
+                    {"role": "system", "content": "You are a helpful tutor providing hints."},
+                    {"role": "user", "content": hint_prompt}
+                ])
+                print(f"💡 Hint: {hint}")
                 continue
             if user_answer in ["A","B","C","D"]:
                 break
@@ -0,0 +1,226 @@
+# src/pdf_export.py
+import io
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
+
+import profiling
+from single_flight import SingleFlight
+
+PDF_EXPORT_DIR = os.getenv("PDF_EXPORT_DIR", "exports")
+PDF_PERSIST = os.getenv("PDF_PERSIST", "0") == "1"  # also keep rendered PDFs in PDF_EXPORT_DIR
+PDF_MEMORY_CACHE_BYTES = int(float(os.getenv("PDF_MEMORY_CACHE_MB", "64")) * 1024 * 1024)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", "32"))
+PDF_QUEUE_TIMEOUT = float(os.getenv("PDF_QUEUE_TIMEOUT", "10"))
+EXPORTS_MAX_BYTES = int(float(os.getenv("EXPORTS_MAX_MB", "200")) * 1024 * 1024)
+EXPORTS_MAX_AGE = float(os.getenv("EXPORTS_MAX_AGE", str(7 * 24 * 3600)))
+EXPORTS_SWEEP_INTERVAL = 60.0
+
+
+class RenderQueueFull(Exception):
+    """Raised when no render slot frees up within PDF_QUEUE_TIMEOUT."""
+
+
+def build_quiz_pdf(target, topic: str, questions: List[dict], hide_answers: bool = False):
+    """Lay out a quiz with ReportLab into a path or binary file object.
+
+    ReportLab is imported here, on the first render, to keep it out of the
+    API's start-up; render workers pay the import once each.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
+
+    doc = SimpleDocTemplate(target, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph(f"<b>Quiz Topic:</b> {topic.title()}", styles["Title"]),
+        Spacer(1, 0.3 * inch)
+    ]
+
+    for i, q in enumerate(questions, 1):
+        story.append(Paragraph(f"<b>{i}. {q['question']}</b>", styles["Normal"]))
+        if q["type"] == "multiple-choice" and q.get("options"):
+            story.append(ListFlowable([ListItem(Paragraph(opt, styles["Normal"])) for opt in q["options"]]))
+        if not hide_answers:
+            story.append(Paragraph(f"<i>Answer:</i> {q['answer']}", styles["Italic"]))
+        story.append(Spacer(1, 0.2 * inch))
+
+    doc.build(story)
+
+
+def render_pdf_bytes(topic: str, questions: List[dict], hide_answers: bool) -> bytes:
+    """Worker entry point: render into memory and return the PDF bytes."""
+    buffer = io.BytesIO()
+    build_quiz_pdf(buffer, topic, questions, hide_answers)
+    return buffer.getvalue()
+
+
+def write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def pdf_filename(topic: str, key: str) -> str:
+    """File and download name: the topic as a path-safe slug, or the content hash alone if nothing is left."""
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", topic).strip("_")[:64]
+    return f"quiz_{slug}_{key[:16]}.pdf" if slug else f"quiz_{key[:16]}.pdf"
+
+
+def pdf_key(topic: str, questions: List[dict], hide_answers: bool) -> str:
+    """Hash of everything that ends up on the page."""
+    content = [
+        topic,
+        [[q["question"], q["type"], q.get("options"), q["answer"]] for q in questions],
+        bool(hide_answers),
+    ]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def evict_exports(directory: str = PDF_EXPORT_DIR, max_bytes: int = EXPORTS_MAX_BYTES,
+                  max_age: float = EXPORTS_MAX_AGE) -> int:
+    """Delete PDFs older than max_age, then least recently used ones until under max_bytes."""
+    if not os.path.isdir(directory):
+        return 0
+    now = time.time()
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(".pdf"):
+            st = entry.stat()
+            files.append((st.st_mtime, st.st_size, entry.path))
+
+    removed = 0
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in sorted(files):
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+            total -= size
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+class RenderedPDF(NamedTuple):
+    key: str
+    filename: str
+    data: bytes
+
+
+class PDFRenderer:
+    """Renders quiz PDFs in a bounded process pool, reusing output by content hash.
+
+    Rendered bytes are kept in an in-memory LRU (PDF_MEMORY_CACHE_MB) and,
+    with PDF_PERSIST=1, also written to the exports directory. At most
+    PDF_MAX_PENDING renders are queued or running; callers that wait longer
+    than PDF_QUEUE_TIMEOUT for a slot get RenderQueueFull. Identical
+    concurrent requests share one render.
+    """
+
+    def __init__(self, directory: str = PDF_EXPORT_DIR, workers: int = PDF_WORKERS,
+                 max_pending: int = PDF_MAX_PENDING, queue_timeout: float = PDF_QUEUE_TIMEOUT,
+                 persist: bool = PDF_PERSIST, memory_bytes: int = PDF_MEMORY_CACHE_BYTES):
+        self.directory = directory
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.persist = persist
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_used = 0
+        self._max_pending = max_pending
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._flights = SingleFlight()
+        self._last_sweep = 0.0
+        self.renders = 0
+        self.reused = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _remember(self, key: str, data: bytes):
+        if key in self._memory or len(data) > self.memory_bytes:
+            return
+        self._memory[key] = data
+        self._memory_used += len(data)
+        while self._memory_used > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_used -= len(old)
+
+    def _lookup(self, key: str, path: str) -> Optional[bytes]:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            return data
+        if self.persist and os.path.exists(path):
+            os.utime(path)  # mark as recently used for eviction
+            with open(path, "rb") as f:
+                data = f.read()
+            self._remember(key, data)
+            return data
+        return None
+
+    async def render(self, topic: str, questions: List[dict], hide_answers: bool = False) -> RenderedPDF:
+        """Return the PDF for a quiz, rendering it only if it is not already stored."""
+        key = pdf_key(topic, questions, hide_answers)
+        filename = pdf_filename(topic, key)
+        path = os.path.join(self.directory, filename)
+        data = self._lookup(key, path)
+        if data is not None:
+            self.reused += 1
+        else:
+            data = await self._flights.do(key, lambda: self._render(key, path, topic, questions, hide_answers))
+        return RenderedPDF(key, filename, data)
+
+    async def _render(self, key: str, path: str, topic: str, questions: List[dict], hide_answers: bool) -> bytes:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_pending)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise RenderQueueFull("PDF render queue is full")
+        try:
+            if profiling.active():
+                # in-process so the request's profile shows the ReportLab layout
+                data = await asyncio.to_thread(profiling.run_profiled, render_pdf_bytes, topic, questions, hide_answers)
+            else:
+                loop = asyncio.get_running_loop()
+                data = await loop.run_in_executor(self._get_pool(), render_pdf_bytes, topic, questions, hide_answers)
+            self.renders += 1
+        finally:
+            self._slots.release()
+
+        self._remember(key, data)
+        if self.persist:
+            os.makedirs(self.directory, exist_ok=True)
+            await asyncio.to_thread(write_atomic, path, data)
+            self._maybe_sweep()
+        return data
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= EXPORTS_SWEEP_INTERVAL:
+            self._last_sweep = now
+            evict_exports(self.directory)
+
+    def stats(self) -> dict:
+        return {"pdf_renders": self.renders, "pdf_reused": self.reused, "pdf_memory_bytes": self._memory_used}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,206 @@
+# src/prewarm.py
+"""Background pre-generation of popular quizzes while foreground traffic is quiet.
+
+Every PREWARM_INTERVAL seconds the Prewarmer mines recent quiz prompts from
+the conversation store for the PREWARM_TOP_N most requested (topic,
+difficulties) combinations, and generates each one that is not already warm
+in the quiz cache through the normal generation path, so results land in the
+quiz cache and question bank that /quiz reads. Calls are capped at
+PREWARM_CALLS_PER_HOUR with PREWARM_CONCURRENCY in flight, and no new call
+starts while foreground quiz traffic is above PREWARM_QUIET_RPS.
+
+Coverage is measured on foreground requests that arrive while traffic is
+above that threshold (the peak): the share answered from cache or bank for
+a combination this process pre-generated.
+"""
+import os
+import re
+import time
+import asyncio
+from collections import Counter, deque
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from quiz_cache import normalize_topic
+from rate_limit import AsyncTokenBucket
+
+PREWARM = os.getenv("PREWARM", "0") == "1"
+PREWARM_CALLS_PER_HOUR = float(os.getenv("PREWARM_CALLS_PER_HOUR", "60"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "2"))
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "50"))
+PREWARM_MIN_REQUESTS = int(os.getenv("PREWARM_MIN_REQUESTS", "2"))  # requests before a combination is worth warming
+PREWARM_HISTORY = float(os.getenv("PREWARM_HISTORY_HOURS", str(7 * 24))) * 3600
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "600"))  # seconds between rounds
+PREWARM_QUIET_RPS = float(os.getenv("PREWARM_QUIET_RPS", "0.2"))  # foreground quiz requests/s that count as busy
+PREWARM_WINDOW = float(os.getenv("PREWARM_WINDOW", "60"))  # seconds of traffic the rate is measured over
+
+# matches the user message built by app.quiz_prompt
+_PROMPT_RE = re.compile(r"^Create a JSON quiz about '(.+)' with (.+?) difficulty questions\.")
+
+Combo = Tuple[str, Tuple[str, ...]]
+
+
+def parse_quiz_prompt(content: str) -> Optional[Combo]:
+    """(normalized topic, sorted difficulties) of an app quiz prompt, or None for anything else."""
+    match = _PROMPT_RE.match(content or "")
+    if not match:
+        return None
+    difficulties = tuple(sorted({d.strip().lower() for d in match.group(2).split(",") if d.strip()}))
+    return normalize_topic(match.group(1)), difficulties
+
+
+def top_combos(prompts: List[str], limit: int = PREWARM_TOP_N, min_count: int = PREWARM_MIN_REQUESTS) -> List[Combo]:
+    counts = Counter(combo for combo in map(parse_quiz_prompt, prompts) if combo is not None)
+    return [combo for combo, n in counts.most_common(limit) if n >= min_count]
+
+
+class TrafficMonitor:
+    """Foreground request rate over a sliding window."""
+
+    def __init__(self, window: float = PREWARM_WINDOW, quiet_rps: float = PREWARM_QUIET_RPS):
+        self.window = window
+        self.quiet_rps = quiet_rps
+        self._times = deque()
+
+    def record(self, now: Optional[float] = None):
+        self._times.append(time.monotonic() if now is None else now)
+
+    def rate(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        while self._times and self._times[0] < now - self.window:
+            self._times.popleft()
+        return len(self._times) / self.window
+
+    def busy(self) -> bool:
+        return self.rate() > self.quiet_rps
+
+
+class Prewarmer:
+    """Pre-generates popular quizzes within a call budget, pausing whenever foreground traffic is busy.
+
+    history(since) returns prompt texts saved since a timestamp, is_warm(topic,
+    difficulties) says whether /quiz would already be answered without the
+    model, and generate(topic, difficulties) produces and stores one quiz.
+    """
+
+    def __init__(self, history: Callable[[float], List[str]], is_warm: Callable[[str, List[str]], bool],
+                 generate: Callable[[str, List[str]], Awaitable], traffic: Optional[TrafficMonitor] = None,
+                 calls_per_hour: float = PREWARM_CALLS_PER_HOUR, concurrency: int = PREWARM_CONCURRENCY,
+                 top_n: int = PREWARM_TOP_N, min_requests: int = PREWARM_MIN_REQUESTS,
+                 history_window: float = PREWARM_HISTORY, interval: float = PREWARM_INTERVAL, poll: float = 1.0):
+        self.history = history
+        self.is_warm = is_warm
+        self.generate = generate
+        self.traffic = traffic or TrafficMonitor()
+        self.budget = AsyncTokenBucket(calls_per_hour / 3600, capacity=1.0)
+        self.concurrency = concurrency
+        self.top_n = top_n
+        self.min_requests = min_requests
+        self.history_window = history_window
+        self.interval = interval
+        self.poll = poll
+        self._slots = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self.prewarmed = {}  # combo -> time generated
+        self.rounds = 0
+        self.generated = 0
+        self.already_warm = 0
+        self.failures = 0
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        self.requests = 0
+        self.covered = 0
+        self.peak_requests = 0
+        self.peak_covered = 0
+
+    # -- foreground --------------------------------------------------------
+
+    def record_request(self, topic: str, difficulties: List[str], served_without_model: bool):
+        """Count one foreground quiz request (call before it is served, with whether cache or bank answered it)."""
+        peak = self.traffic.busy()
+        self.traffic.record()
+        combo = (normalize_topic(topic), tuple(sorted({d.lower() for d in difficulties})))
+        covered = served_without_model and combo in self.prewarmed
+        self.requests += 1
+        self.covered += covered
+        if peak:
+            self.peak_requests += 1
+            self.peak_covered += covered
+
+    # -- background --------------------------------------------------------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print("Warning: prewarm round failed:", e)
+            await asyncio.sleep(self.interval)
+
+    async def wait_quiet(self):
+        if not self.traffic.busy():
+            return
+        self.pauses += 1
+        start = time.monotonic()
+        while self.traffic.busy():
+            await asyncio.sleep(self.poll)
+        self.paused_seconds += time.monotonic() - start
+
+    async def run_once(self) -> int:
+        """One round over the current top combinations; returns how many were generated."""
+        prompts = await asyncio.to_thread(self.history, time.time() - self.history_window)
+        combos = top_combos(prompts, self.top_n, self.min_requests)
+        self.rounds += 1
+        tasks = []
+        for topic, difficulties in combos:
+            if await asyncio.to_thread(self.is_warm, topic, list(difficulties)):
+                self.already_warm += 1
+                continue
+            await self.wait_quiet()
+            await self.budget.acquire()
+            await self.wait_quiet()
+            await self._slots.acquire()
+            tasks.append(asyncio.create_task(self._warm((topic, difficulties))))
+        results = await asyncio.gather(*tasks)
+        return sum(results)
+
+    async def _warm(self, combo: Combo) -> bool:
+        try:
+            await self.generate(combo[0], list(combo[1]))
+            self.prewarmed[combo] = time.time()
+            self.generated += 1
+            return True
+        except Exception as e:
+            print(f"Warning: prewarm of {combo} failed:", e)
+            self.failures += 1
+            return False
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "prewarm_running": self._task is not None,
+            "prewarm_rounds": self.rounds,
+            "prewarm_generated": self.generated,
+            "prewarm_already_warm": self.already_warm,
+            "prewarm_failures": self.failures,
+            "prewarm_pauses": self.pauses,
+            "prewarm_paused_seconds": round(self.paused_seconds, 3),
+            "prewarm_foreground_rps": round(self.traffic.rate(), 3),
+            "prewarm_coverage": self.covered / self.requests if self.requests else 0.0,
+            "prewarm_peak_requests": self.peak_requests,
+            "prewarm_peak_covered": self.peak_covered,
+            "prewarm_peak_coverage": self.peak_covered / self.peak_requests if self.peak_requests else 0.0,
+        }
@@ -0,0 +1,321 @@
+# src/profiling.py
+"""Opt-in CPU profiling of individual requests.
+
+ProfilingMiddleware profiles a PROFILE_SAMPLE_RATE fraction of requests when
+PROFILE_ENABLED=1, and any request carrying "X-Profile: <PROFILE_TOKEN>".
+One request is profiled at a time; others run untouched meanwhile.
+
+Formats (PROFILE_FORMAT):
+  collapsed  a sampler thread records every thread's stack each
+             PROFILE_INTERVAL_MS; output is one "frame;frame;frame count"
+             line per stack, ready for flamegraph.pl or speedscope.
+  pstats     cProfile on the event-loop thread (plus work handed to
+             run_profiled); load it with pstats or snakeviz.
+
+Both see whatever else the event loop runs during the request, so profile
+on a quiet instance when attributing small costs. Output goes to
+PROFILE_DIR as <endpoint>-<ms timestamp>.<ext> with a .json sidecar, and
+only the newest PROFILE_MAX_FILES profiles are kept.
+"""
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # forces a profile via X-Profile; also guards /admin/profiles
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "collapsed").lower()  # collapsed or pstats
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_SKIP_PREFIXES = ("/admin", "/metrics", "/health")
+
+EXTENSIONS = {"collapsed": "collapsed.txt", "pstats": "pstats"}
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+_active = contextvars.ContextVar("profiling_active", default=None)
+
+
+def check_token(value: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and value is not None and hmac.compare_digest(value, PROFILE_TOKEN)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Counts collapsed stacks of every other thread every `interval` seconds.
+
+    Threads parked in a wait (leaf frame in threading/selectors/queue) are
+    idle and not counted, so the event loop waiting for I/O is not "CPU".
+    A busy thread only yields the GIL every switch interval (5ms by
+    default), so the real spacing of samples is measured rather than assumed.
+    """
+
+    format = "collapsed"
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def sample_seconds(self) -> float:
+        return self.elapsed / self.samples if self.samples else self.interval
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        start = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            self.elapsed = time.perf_counter() - start
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == me or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CProfileCollector:
+    """cProfile on the calling (event-loop) thread, plus profiles from run_profiled workers."""
+
+    format = "pstats"
+
+    def __init__(self):
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self.extra = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def add(self, profile):
+        with self._lock:
+            self.extra.append(profile)
+
+    def dump(self, path: str):
+        import pstats
+
+        stats = pstats.Stats(self.profile)
+        for profile in self.extra:
+            stats.add(profile)
+        stats.dump_stats(path)
+
+
+def active() -> bool:
+    """Is the current request being profiled?"""
+    return _active.get() is not None
+
+
+def run_profiled(fn, *args):
+    """Call fn in a worker thread so the current request's profile covers it.
+
+    The sampler sees every thread already; cProfile only sees its own thread,
+    so under pstats the call gets a profiler of its own that is merged in.
+    """
+    collector = _active.get()
+    if not isinstance(collector, CProfileCollector):
+        return fn(*args)
+    import cProfile
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:  # Python 3.12+: one cProfile per interpreter at a time
+        return fn(*args)
+    try:
+        return fn(*args)
+    finally:
+        profile.disable()
+        collector.add(profile)
+
+
+def endpoint_slug(path: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+
+
+class ProfileStore:
+    """Profiles on disk, newest PROFILE_MAX_FILES kept, each with a JSON sidecar of request metadata."""
+
+    _NAME_RE = re.compile(r"^[A-Za-z0-9_]+-\d+\.(collapsed\.txt|pstats)$")
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, collector, name: str, meta: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        collector.dump(path)
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self._rotate()
+
+    def _rotate(self):
+        with self._lock:
+            entries = self.list()
+            for entry in entries[self.max_files:]:
+                for path in (self.path(entry["name"]), self.path(entry["name"]) + ".json"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def valid_name(self, name: str) -> bool:
+        return bool(self._NAME_RE.match(name)) and os.path.isfile(self.path(name))
+
+    def list(self, endpoint: Optional[str] = None) -> List[dict]:
+        """Newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not self._NAME_RE.match(name):
+                continue
+            try:
+                with open(self.path(name) + ".json", "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if endpoint is None or meta.get("endpoint") == endpoint:
+                entries.append({"name": name, "bytes": os.path.getsize(self.path(name)), **meta})
+        entries.sort(key=lambda e: e.get("created", 0), reverse=True)
+        return entries
+
+    def summary(self, endpoint: Optional[str] = None, limit: int = 20, fmt: str = PROFILE_FORMAT) -> dict:
+        """Top functions by cumulative time over all stored profiles of one format (and endpoint)."""
+        entries = [e for e in self.list(endpoint) if e.get("format") == fmt]
+        cumulative: Dict[str, float] = Counter()
+        own: Dict[str, float] = Counter()
+        calls: Dict[str, int] = Counter()
+        if fmt == "pstats":
+            import pstats
+
+            for entry in entries:
+                for (filename, line, func), (_, nc, tt, ct, _) in pstats.Stats(self.path(entry["name"])).stats.items():
+                    label = f"{func} ({os.path.basename(filename)}:{line})"
+                    cumulative[label] += ct
+                    own[label] += tt
+                    calls[label] += nc
+        else:
+            for entry in entries:
+                interval = entry.get("interval", PROFILE_INTERVAL)
+                with open(self.path(entry["name"]), "r", encoding="utf-8") as f:
+                    for line in f:
+                        stack, _, count = line.rstrip("\n").rpartition(" ")
+                        frames = stack.split(";")[1:]  # first frame is the thread name
+                        seconds = int(count) * interval
+                        for label in set(frames):
+                            cumulative[label] += seconds
+                        if frames:
+                            own[frames[-1]] += seconds
+        top = []
+        for label, ct in cumulative.most_common(limit):
+            row = {"function": label, "cumulative_seconds": round(ct, 6), "self_seconds": round(own[label], 6)}
+            if fmt == "pstats":
+                row["calls"] = calls[label]
+            top.append(row)
+        return {"profiles": len(entries), "format": fmt, "endpoint": endpoint, "top": top}
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles sampled or explicitly requested requests into a ProfileStore."""
+
+    def __init__(self, app, store: Optional[ProfileStore] = None, enabled: bool = PROFILE_ENABLED,
+                 sample_rate: float = PROFILE_SAMPLE_RATE, fmt: str = PROFILE_FORMAT):
+        self.app = app
+        self.store = store or ProfileStore()
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.format = fmt if fmt in EXTENSIONS else "collapsed"
+        self._busy = threading.Lock()
+
+    def _wanted(self, scope) -> bool:
+        if scope["path"].startswith(PROFILE_SKIP_PREFIXES):
+            return False
+        if PROFILE_TOKEN:
+            for key, value in scope.get("headers") or ():
+                if key == b"x-profile" and check_token(value.decode("latin-1")):
+                    return True
+        return self.enabled and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope) or not self._busy.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+        collector = CProfileCollector() if self.format == "pstats" else StackSampler()
+        created = time.time()
+        status = [500]
+        name = [None]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                name[0] = f"{endpoint_slug(route)}-{int(created * 1000)}.{EXTENSIONS[self.format]}"
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", name[0].encode())]
+            await send(message)
+
+        token = _active.set(collector)
+        start = time.perf_counter()
+        collector.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            collector.stop()
+            duration = time.perf_counter() - start
+            _active.reset(token)
+            try:
+                if name[0] is not None:
+                    route = getattr(scope.get("route"), "path", None) or scope["path"]
+                    meta = {"endpoint": endpoint_slug(route), "path": scope["path"], "method": scope["method"],
+                            "status": status[0], "duration_ms": round(duration * 1000, 2), "created": created,
+                            "format": collector.format}
+                    if isinstance(collector, StackSampler):
+                        meta.update(interval=collector.sample_seconds(), samples=collector.samples)
+                    await asyncio.to_thread(self.store.save, collector, name[0], meta)
+            except Exception as e:
+                print("Warning: could not save profile:", e)
+            finally:
+                self._busy.release()
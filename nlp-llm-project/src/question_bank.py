@@ -0,0 +1,224 @@
+# src/question_bank.py
+"""Every validated question the model has produced, indexed for reuse.
+
+Questions are stored once per content hash (normalized question text, type
+and answer) with the topic they were generated for, its normalized key and
+their difficulty. An inverted index maps topic terms to questions, so a
+request for "The TF-IDF" finds questions generated for "tf-idf".
+
+When the bank holds enough fresh questions for a request, assemble() builds
+a quiz from it without an LLM call:
+
+  enough     every requested difficulty has at least its share of the quiz
+             (QUESTION_BANK_QUIZ_SIZE split across difficulties) times
+             QUESTION_BANK_POOL_FACTOR eligible questions
+  freshness  questions older than QUESTION_BANK_MAX_AGE, from another
+             prompt version, or served within QUESTION_BANK_COOLDOWN are
+             not eligible; the least served go first
+  diversity  no repeated question text, and questions from different
+             generations are preferred over several from the same one
+"""
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import hashlib
+import threading
+from typing import List, Optional
+
+from quiz_cache import normalize_topic
+
+QUESTION_BANK = os.getenv("QUESTION_BANK", "1") == "1"  # store generated questions
+QUESTION_BANK_SERVE = os.getenv("QUESTION_BANK_SERVE", "1") == "1"  # assemble quizzes from the bank
+QUESTION_BANK_DB = os.getenv("QUESTION_BANK_DB", "question_bank.db")
+QUESTION_BANK_QUIZ_SIZE = int(os.getenv("QUESTION_BANK_QUIZ_SIZE", "5"))  # questions per assembled quiz
+QUESTION_BANK_POOL_FACTOR = float(os.getenv("QUESTION_BANK_POOL_FACTOR", "2"))  # eligible questions per slot needed
+QUESTION_BANK_COOLDOWN = float(os.getenv("QUESTION_BANK_COOLDOWN", "300"))  # seconds before a question is reused
+QUESTION_BANK_MAX_AGE = float(os.getenv("QUESTION_BANK_MAX_AGE", str(90 * 24 * 3600)))  # seconds, 0 = no limit
+QUESTION_BANK_EXTRA_TERMS = int(os.getenv("QUESTION_BANK_EXTRA_TERMS", "0"))  # extra topic terms a match may have
+
+
+def topic_terms(topic: str) -> List[str]:
+    from sparse_index import tokenize
+
+    return sorted(set(tokenize(normalize_topic(topic))))
+
+
+def content_hash(question: dict) -> str:
+    content = [normalize_topic(question["question"]), question["type"], normalize_topic(question["answer"])]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def difficulty_quotas(difficulties: List[str], size: int) -> dict:
+    """Split `size` questions across the requested difficulties, earlier ones taking the remainder."""
+    unique = list(dict.fromkeys(d.lower() for d in difficulties or ()))
+    if not unique:
+        return {}
+    base, extra = divmod(size, len(unique))
+    return {d: base + (i < extra) for i, d in enumerate(unique) if base + (i < extra) > 0}
+
+
+class QuestionBank:
+    """SQLite question store with a topic-term inverted index; see the module docstring for the serving policy."""
+
+    def __init__(self, path: str = QUESTION_BANK_DB, enabled: bool = QUESTION_BANK, serve: bool = QUESTION_BANK_SERVE,
+                 quiz_size: int = QUESTION_BANK_QUIZ_SIZE, pool_factor: float = QUESTION_BANK_POOL_FACTOR,
+                 cooldown: float = QUESTION_BANK_COOLDOWN, max_age: float = QUESTION_BANK_MAX_AGE,
+                 extra_terms: int = QUESTION_BANK_EXTRA_TERMS):
+        self.enabled = enabled
+        self.serve = enabled and serve
+        self.quiz_size = quiz_size
+        self.pool_factor = pool_factor
+        self.cooldown = cooldown
+        self.max_age = max_age
+        self.extra_terms = extra_terms
+        self._path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self.questions = 0
+        self.added = 0
+        self.duplicates = 0
+        self.served = 0
+        self.misses = 0
+        if enabled:
+            self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self._path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS questions ("
+                "id TEXT PRIMARY KEY, topic TEXT NOT NULL, topic_key TEXT NOT NULL, terms INTEGER NOT NULL, "
+                "difficulty TEXT NOT NULL, type TEXT NOT NULL, body TEXT NOT NULL, source TEXT NOT NULL, "
+                "model TEXT, prompt_version TEXT, created_at REAL NOT NULL, "
+                "served INTEGER NOT NULL DEFAULT 0, served_at REAL NOT NULL DEFAULT 0)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS questions_topic ON questions (topic_key, difficulty)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS question_terms ("
+                "term TEXT NOT NULL, id TEXT NOT NULL, PRIMARY KEY (term, id)) WITHOUT ROWID"
+            )
+            db.commit()
+            self.questions = db.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+            self._db = db
+        return self._db
+
+    def add(self, topic: str, questions: List[dict], model: Optional[str] = None,
+            prompt_version: Optional[str] = None) -> int:
+        """Store one generation's questions; returns how many were new."""
+        if not self.enabled or not questions:
+            return 0
+        topic_key, terms = normalize_topic(topic), topic_terms(topic)
+        source, now = uuid.uuid4().hex, time.time()
+        new = 0
+        with self._lock:
+            db = self._conn()
+            for q in questions:
+                body = {k: q.get(k) for k in ("question", "type", "options", "answer", "difficulty")}
+                qid = content_hash(body)
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO questions (id, topic, topic_key, terms, difficulty, type, body, source, "
+                    "model, prompt_version, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (qid, topic, topic_key, len(terms), (body["difficulty"] or "").lower(), body["type"],
+                     json.dumps(body, ensure_ascii=False), source, model, prompt_version, now),
+                )
+                if cursor.rowcount:
+                    db.executemany("INSERT OR IGNORE INTO question_terms (term, id) VALUES (?, ?)",
+                                   [(term, qid) for term in terms])
+                    new += 1
+            db.commit()
+            self.questions += new
+            self.added += new
+            self.duplicates += len(questions) - new
+        return new
+
+    def _candidates(self, db, topic_key: str, terms: List[str], difficulties: List[str],
+                    prompt_version: Optional[str], now: float) -> List[tuple]:
+        marks = ",".join("?" * len(difficulties))
+        filters = f"q.difficulty IN ({marks}) AND q.created_at >= ? AND q.served_at <= ?"
+        params = [*difficulties, now - self.max_age if self.max_age > 0 else 0, now - self.cooldown]
+        if prompt_version is not None:
+            filters += " AND q.prompt_version = ?"
+            params.append(prompt_version)
+        columns = "q.id, q.topic_key, q.difficulty, q.body, q.source, q.served"
+        if not terms:  # topic made of stopwords only: exact key
+            return db.execute(f"SELECT {columns} FROM questions q WHERE q.topic_key = ? AND {filters}",
+                              [topic_key, *params]).fetchall()
+        # walk the shortest posting list and probe the others by primary key
+        counts = {t: db.execute("SELECT COUNT(*) FROM question_terms WHERE term = ?", (t,)).fetchone()[0] for t in terms}
+        rarest = min(terms, key=counts.get)
+        if counts[rarest] == 0:
+            return []
+        others = [t for t in terms if t != rarest]
+        probe = ""
+        if others:
+            probe = (f" AND (SELECT COUNT(*) FROM question_terms o WHERE o.term IN ({','.join('?' * len(others))}) "
+                     f"AND o.id = t.id) = {len(others)}")
+        return db.execute(
+            f"SELECT {columns} FROM question_terms t JOIN questions q ON q.id = t.id "
+            f"WHERE t.term = ? AND q.terms <= ? AND {filters}{probe}",
+            [rarest, len(terms) + self.extra_terms, *params, *others],
+        ).fetchall()
+
+    def assemble(self, topic: str, difficulties: List[str], prompt_version: Optional[str] = None) -> Optional[List[dict]]:
+        """A quiz from the bank, or None (counted as a miss) if it does not hold enough eligible questions."""
+        if not self.serve:
+            return None
+        quotas = difficulty_quotas(difficulties, self.quiz_size)
+        if not quotas:
+            return None  # nothing asked for: let the model decide
+        topic_key, terms, now = normalize_topic(topic), topic_terms(topic), time.time()
+        with self._lock:
+            db = self._conn()
+            rows = self._candidates(db, topic_key, terms, list(quotas), prompt_version, now)
+            pools = {d: [] for d in quotas}
+            for row in rows:
+                pools[row[2]].append(row)
+            if not rows or any(len(pools[d]) < n * self.pool_factor for d, n in quotas.items()):
+                self.misses += 1
+                return None
+
+            chosen, texts, sources = [], set(), set()
+            for difficulty, n in quotas.items():
+                # exact topic first, then least served, ties broken at random
+                pool = sorted(pools[difficulty], key=lambda r: (r[1] != topic_key, r[5], random.random()))
+                picked = []
+                for fresh_source_only in (True, False):
+                    for row in pool:
+                        if len(picked) == n:
+                            break
+                        body = json.loads(row[3])
+                        text = normalize_topic(body["question"])
+                        if text in texts or (fresh_source_only and row[4] in sources):
+                            continue
+                        texts.add(text)
+                        sources.add(row[4])
+                        picked.append((row[0], body))
+                if len(picked) < n:
+                    self.misses += 1
+                    return None
+                chosen.extend(picked)
+
+            db.executemany("UPDATE questions SET served = served + 1, served_at = ? WHERE id = ?",
+                           [(now, qid) for qid, _ in chosen])
+            db.commit()
+            self.served += 1
+        questions = [body for _, body in chosen]
+        random.shuffle(questions)
+        return questions
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.served + self.misses
+            return {
+                "bank_enabled": self.enabled,
+                "bank_questions": self.questions,
+                "bank_added": self.added,
+                "bank_duplicates": self.duplicates,
+                "bank_served": self.served,
+                "bank_misses": self.misses,
+                "bank_served_fraction": self.served / lookups if lookups else 0.0,
+            }
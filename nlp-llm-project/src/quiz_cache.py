@@ -0,0 +1,156 @@
+# src/quiz_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+QUIZ_CACHE_SIZE = int(os.getenv("QUIZ_CACHE_SIZE", "512"))
+QUIZ_CACHE_TTL = float(os.getenv("QUIZ_CACHE_TTL", str(24 * 3600)))
+QUIZ_CACHE_DB = os.getenv("QUIZ_CACHE_DB", "")  # empty = memory only
+QUIZ_CACHE_DISK_MAX = int(os.getenv("QUIZ_CACHE_DISK_MAX", "20000"))
+
+
+def normalize_topic(topic: str) -> str:
+    """Lower-case and collapse whitespace so 'TF-IDF ' and 'tf-idf' share a key."""
+    return " ".join(topic.lower().split())
+
+
+def make_key(topic: str, difficulties: List[str], model: str, prompt_version: str) -> str:
+    """Content address for a quiz request (session-independent)."""
+    payload = json.dumps(
+        [normalize_topic(topic), sorted({d.lower() for d in difficulties}), model, prompt_version]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QuizCache:
+    """Two-tier cache of parsed quizzes: in-process LRU plus optional SQLite.
+
+    Values are lists of plain question dicts, so callers build fresh model
+    objects (and shuffle them) on every hit.
+    """
+
+    def __init__(self, max_entries: int = QUIZ_CACHE_SIZE, ttl: float = QUIZ_CACHE_TTL,
+                 db_path: str = QUIZ_CACHE_DB, max_disk_entries: int = QUIZ_CACHE_DISK_MAX):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()  # key -> (stored_at, questions)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS quiz_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS quiz_cache_accessed ON quiz_cache (accessed_at)")
+            self._db.commit()
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def _remember(self, key: str, stored_at: float, questions: List[dict]):
+        self._memory[key] = (stored_at, questions)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, questions = entry
+                if not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return questions
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, stored_at FROM quiz_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, stored_at = row
+                    if not self._expired(stored_at, now):
+                        self._db.execute("UPDATE quiz_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        questions = json.loads(value)
+                        self._remember(key, stored_at, questions)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return questions
+                    self._db.execute("DELETE FROM quiz_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def stored_at(self, key: str) -> Optional[float]:
+        """When a live entry for `key` was stored, without counting a lookup or touching recency."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[0], now):
+                return entry[0]
+            if self._db is not None:
+                row = self._db.execute("SELECT stored_at FROM quiz_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self._expired(row[0], now):
+                    return row[0]
+        return None
+
+    def set(self, key: str, questions: List[dict]):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, questions)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO quiz_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(questions, ensure_ascii=False), now, now),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _evict_disk(self, now: float):
+        if self.ttl > 0:
+            self._db.execute("DELETE FROM quiz_cache WHERE stored_at < ?", (now - self.ttl,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM quiz_cache").fetchone()
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM quiz_cache WHERE key IN "
+                "(SELECT key FROM quiz_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM quiz_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
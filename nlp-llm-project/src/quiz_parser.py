@@ -0,0 +1,378 @@
+# src/quiz_parser.py
+import re
+import json
+import time
+import itertools
+import threading
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+M = TypeVar("M", bound=BaseModel)
+
+PARSE_ERROR_ANSWER = "(Error parsing quiz)"
+MAX_JSON_CANDIDATES = 16  # opening brackets tried before giving up on finding the quiz
+
+# Structured-output request for models that support it. The root has to be an
+# object, so the questions live under "questions".
+QUIZ_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "quiz",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "questions": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "question": {"type": "string"},
+                            "type": {"type": "string"},
+                            "options": {"type": ["array", "null"], "items": {"type": "string"}},
+                            "answer": {"type": "string"},
+                            "difficulty": {"type": "string", "enum": ["easy", "medium", "hard"]},
+                        },
+                        "required": ["question", "type", "options", "answer", "difficulty"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["questions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*")
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class QuizParseError(ValueError):
+    """Raised when no JSON quiz can be recovered from the model output."""
+
+
+class ParseStats:
+    """Counters for how model output was parsed; a rising fallback rate means wasted generations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.repaired = 0
+        self.fallbacks = 0
+        self.dropped_items = 0
+        self.seconds = 0.0
+
+    def record(self, repaired: bool = False, fallback: bool = False, dropped: int = 0, seconds: float = 0.0):
+        with self._lock:
+            self.parsed += 1
+            self.repaired += int(repaired)
+            self.fallbacks += int(fallback)
+            self.dropped_items += dropped
+            self.seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "parse_total": self.parsed,
+                "parse_repaired": self.repaired,
+                "parse_fallbacks": self.fallbacks,
+                "parse_dropped_items": self.dropped_items,
+                "parse_seconds_mean": self.seconds / self.parsed if self.parsed else 0.0,
+            }
+
+
+parse_stats = ParseStats()
+
+
+def _block_at(text: str, start: int) -> str:
+    """The bracketed block opening at `start`, or everything from there on if it never closes."""
+    depth = 0
+    in_string = escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _parse_block(block: str) -> Tuple[object, bool]:
+    try:
+        return json.loads(block), False
+    except ValueError:
+        try:
+            return json.loads(repair_json(block)), True
+        except ValueError as e:
+            raise QuizParseError(f"Unrecoverable JSON: {e}") from e
+
+
+def _quiz_items(data) -> Optional[List[dict]]:
+    """The question objects in parsed JSON, or None if it is not shaped like a quiz."""
+    if isinstance(data, dict):
+        lists = [v for v in data.values() if isinstance(v, list)]
+        if "question" in data:
+            return [data]
+        if isinstance(data.get("questions"), list):
+            data = data["questions"]
+        elif len(lists) == 1:
+            data = lists[0]
+        else:
+            return None
+    if not isinstance(data, list):
+        return None
+    return [q for q in data if isinstance(q, dict)]
+
+
+def _find_quiz(text: str) -> Tuple[str, List[dict], bool]:
+    """(block, question objects, repaired) for the first block that holds questions.
+
+    Blocks are tried from each opening bracket in turn (at most
+    MAX_JSON_CANDIDATES), so a bracketed aside before the quiz, or a wrapper
+    object around it, is skipped. If none holds questions, the first block's
+    result or error stands.
+    """
+    text = _FENCE_RE.sub("", text)
+    first = None
+    starts = (i for i, ch in enumerate(text) if ch in "[{")
+    for start in itertools.islice(starts, MAX_JSON_CANDIDATES):
+        block = _block_at(text, start)
+        try:
+            data, repaired = _parse_block(block)
+            items = _quiz_items(data)
+            if items:
+                return block, items, repaired
+            outcome = (block, items, repaired) if items is not None else QuizParseError("Expected a list of questions")
+        except QuizParseError as e:
+            outcome = e
+        if first is None:
+            first = outcome
+    if first is None:
+        raise QuizParseError("No JSON found in model output")
+    if isinstance(first, QuizParseError):
+        raise first
+    return first
+
+
+def extract_json_block(text: str) -> str:
+    """Cut the JSON array (or object) holding the quiz out of prose and code fences.
+
+    If the closing bracket never arrives (truncated output) everything from
+    the opening bracket on is returned, for repair_json to finish.
+    """
+    return _find_quiz(text)[0]
+
+
+def repair_json(text: str) -> str:
+    """Fix the usual LLM JSON defects in one scan.
+
+    Handles single-quoted strings, trailing commas, Python True/False/None,
+    and truncation: an unfinished last element is dropped and open brackets
+    are closed.
+    """
+    out = []
+    stack = []           # open brackets
+    complete = []        # per open bracket: len(out) after the last element that closed inside it
+    quote = None         # current string delimiter, if inside a string
+    escape = False
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+                if ch == "'" and quote == "'":
+                    out[-1] = "'"  # \' is not a JSON escape; keep the bare quote
+                else:
+                    out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == quote:
+                quote = None
+                out.append('"')
+            elif ch == '"' and quote == "'":
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+        elif ch == '"' or ch == "'":
+            quote = ch
+            out.append('"')
+        elif ch in "[{":
+            stack.append(ch)
+            complete.append(None)
+            out.append(ch)
+        elif ch in "]}":
+            if stack:
+                stack.pop()
+                complete.pop()
+            out.append(ch)
+            if complete:
+                complete[-1] = len(out)
+        elif ch == ",":
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if j < n and text[j] in "]}":
+                i += 1
+                continue  # trailing comma
+            out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < n and text[j].isalpha():
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if quote or stack:
+        # cut back to the last complete element of the innermost open array that has one
+        for level in range(len(stack) - 1, -1, -1):
+            if stack[level] == "[" and complete[level] is not None:
+                out = out[:complete[level]]
+                stack = stack[:level + 1]
+                quote = None
+                break
+        if quote:
+            out.append('"')
+        for bracket in reversed(stack):
+            out.append("]" if bracket == "[" else "}")
+    return "".join(out)
+
+
+def load_quiz_items(text: str) -> Tuple[List[dict], bool]:
+    """Return (question dicts, repaired) from raw model output."""
+    _, items, repaired = _find_quiz(text)
+    return items, repaired
+
+
+def normalize_question(q: dict) -> dict:
+    """Apply the defaults the API has always used and coerce scalar answers to text."""
+    q = dict(q)
+    q.setdefault("difficulty", "medium")
+    q.setdefault("show_answer", True)
+    if "answer" in q and not isinstance(q["answer"], str):
+        q["answer"] = str(q["answer"])
+    if isinstance(q.get("options"), list):
+        q["options"] = [o if isinstance(o, str) else str(o) for o in q["options"]]
+    return q
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[M]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def build_question(q: dict, model: Type[M]) -> M:
+    """Validate a single question object."""
+    return model.model_validate(normalize_question(q))
+
+
+def validate_questions(items: List[dict], model: Type[M]) -> Tuple[List[M], int]:
+    """Validate all items in one pydantic pass; invalid items are dropped. Returns (questions, dropped)."""
+    items = [normalize_question(q) for q in items]
+    adapter = _list_adapter(model)
+    try:
+        return adapter.validate_python(items), 0
+    except ValidationError as e:
+        bad = {err["loc"][0] for err in e.errors() if err["loc"]}
+        good = [q for i, q in enumerate(items) if i not in bad]
+        return (adapter.validate_python(good) if good else []), len(items) - len(good)
+
+
+def parse_quiz_json(quiz_str: str, model: Type[M]) -> List[M]:
+    """Parse LLM quiz output into validated questions.
+
+    Tolerates prose, code fences and common JSON defects; falls back to a
+    single placeholder question only when nothing usable can be recovered.
+    """
+    start = time.perf_counter()
+    repaired, dropped = False, 0
+    try:
+        items, repaired = load_quiz_items(quiz_str)
+        questions, dropped = validate_questions(items, model)
+        if not questions:
+            raise QuizParseError("No valid questions in model output")
+    except QuizParseError as e:
+        print("JSON parse failed:", e)
+        parse_stats.record(repaired, fallback=True, dropped=dropped, seconds=time.perf_counter() - start)
+        return [model(question=quiz_str.strip(), type="short-answer", answer=PARSE_ERROR_ANSWER, difficulty="medium")]
+    parse_stats.record(repaired, dropped=dropped, seconds=time.perf_counter() - start)
+    return questions
+
+
+class IncrementalArrayParser:
+    """Pull complete objects out of a JSON array while it is still streaming.
+
+    Text before the opening '[' (code fences, prose) is ignored. feed() returns
+    every top-level object that closed within the new chunk; objects that fail
+    to decode are dropped.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buf: List[str] = []
+
+    def feed(self, chunk: str) -> List[dict]:
+        objects = []
+        for ch in chunk:
+            if self.done:
+                break
+            if not self._started:
+                self._started = ch == "["
+                continue
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = ["{"]
+                elif ch == "]":
+                    self.done = True
+                continue
+
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{" or ch == "[":
+                self._depth += 1
+            elif ch == "}" or ch == "]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        obj = json.loads("".join(self._buf))
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        objects.append(obj)
+                    self._buf = []
+        return objects
@@ -0,0 +1,68 @@
+# src/quiz_store.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import List, Optional
+
+QUIZ_STORE_DB = os.getenv("QUIZ_STORE_DB", "quizzes.db")
+QUIZ_STORE_TTL = float(os.getenv("QUIZ_STORE_TTL", str(30 * 24 * 3600)))  # seconds, 0 = keep forever
+PRUNE_EVERY = 500  # saves between expiry sweeps
+
+
+class QuizStore:
+    """Generated quizzes by id, exactly as they were shown (options already shuffled).
+
+    Lets the UI fetch or export a quiz again without another LLM call.
+    """
+
+    def __init__(self, path: str = QUIZ_STORE_DB, ttl: float = QUIZ_STORE_TTL):
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._saves = 0
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS quizzes ("
+            "quiz_id TEXT PRIMARY KEY, topic TEXT NOT NULL, questions TEXT NOT NULL, "
+            "hide_answers INTEGER NOT NULL, session_id TEXT, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS quizzes_created ON quizzes (created_at)")
+        self._db.commit()
+
+    def save(self, topic: str, questions: List[dict], hide_answers: bool = False,
+             session_id: Optional[str] = None) -> str:
+        quiz_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO quizzes (quiz_id, topic, questions, hide_answers, session_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (quiz_id, topic, json.dumps(questions, ensure_ascii=False), int(bool(hide_answers)),
+                 session_id, time.time()),
+            )
+            self._saves += 1
+            if self.ttl > 0 and self._saves % PRUNE_EVERY == 0:
+                self._db.execute("DELETE FROM quizzes WHERE created_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        return quiz_id
+
+    def get(self, quiz_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT topic, questions, hide_answers, session_id, created_at FROM quizzes WHERE quiz_id = ?",
+                (quiz_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        topic, questions, hide_answers, session_id, created_at = row
+        if self.ttl > 0 and time.time() - created_at > self.ttl:
+            return None
+        return {
+            "quiz_id": quiz_id,
+            "topic": topic,
+            "questions": json.loads(questions),
+            "hide_answers": bool(hide_answers),
+            "session_id": session_id,
+        }
@@ -0,0 +1,46 @@
+# src/reranker.py
+import os
+from typing import List
+
+import numpy as np
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "384"))
+
+
+class CrossEncoderReranker:
+    """Scores (query, passage) pairs jointly with a small cross-encoder on CPU."""
+
+    def __init__(self, model_name: str = RERANK_MODEL, batch_size: int = RERANK_BATCH_SIZE,
+                 max_length: int = RERANK_MAX_LENGTH):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def score(self, query: str, passages: List[str]) -> np.ndarray:
+        scores = []
+        for i in range(0, len(passages), self.batch_size):
+            batch = passages[i:i + self.batch_size]
+            encoded = self.tokenizer([query] * len(batch), batch, padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="pt")
+            with self._torch.inference_mode():
+                logits = self.model(**encoded).logits
+            scores.append(logits[:, 0].float().numpy())
+        return np.concatenate(scores) if scores else np.zeros(0, np.float32)
+
+
+_reranker = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Process-wide cross-encoder, loaded on first use."""
+    global _reranker
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
@@ -0,0 +1,176 @@
+# src/retrieval.py
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from chunking import chunk_text
+from context_window import count_tokens
+from embeddings import Embedder, get_embedder
+from sparse_index import BM25Index
+from vector_index import RAG_INDEX_DIR, VectorIndex
+
+RAG_CHUNK_WORDS = int(os.getenv("RAG_CHUNK_WORDS", "200"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "40"))
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "hybrid").lower()  # hybrid | dense | sparse
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "50"))  # per ranker, before fusion
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_RERANK = os.getenv("RAG_RERANK", "0") == "1"
+RAG_RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.92"))  # cosine above which chunks are duplicates
+
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str):
+    """Add the elapsed milliseconds of the block to timings[stage]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def rrf_fuse(rankings: List[List[int]], k: int = RAG_RRF_K) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion of id lists (best first); returns (id, score) best first."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, i in enumerate(ranking):
+            scores[i] = scores.get(i, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def pack_context(hits: List[dict], budget: int = RAG_CONTEXT_TOKENS, vectors: Optional[np.ndarray] = None,
+                 dedup_threshold: float = RAG_DEDUP_THRESHOLD) -> Tuple[str, List[dict]]:
+    """Number and join hits, best first, until the token budget is used up.
+
+    Exact repeats are dropped, and so are near-duplicates (cosine of their
+    vectors above dedup_threshold) of a chunk already packed, which is what
+    overlapping chunks of the same passage usually are. A chunk that does not
+    fit is skipped so a shorter one further down can still use the space.
+    """
+    packed, parts, kept_vectors, seen = [], [], [], set()
+    used = 0
+    for pos, hit in enumerate(hits):
+        key = " ".join(hit["text"].split()).lower()
+        if key in seen:
+            continue
+        if vectors is not None and kept_vectors and dedup_threshold < 1.0:
+            if float(np.max(np.stack(kept_vectors) @ vectors[pos])) >= dedup_threshold:
+                continue
+        part = f"[{len(packed) + 1}] ({hit.get('source') or hit['doc_id']}) {hit['text']}"
+        tokens = count_tokens(part)
+        if used + tokens > budget:
+            continue
+        seen.add(key)
+        if vectors is not None:
+            kept_vectors.append(vectors[pos])
+        packed.append(hit)
+        parts.append(part)
+        used += tokens
+    return "\n\n".join(parts), packed
+
+
+class Retriever:
+    """Hybrid retrieval over one corpus: dense vectors + BM25, fused with RRF, optionally reranked.
+
+    Both indexes live in the same directory and share chunk ids.
+    """
+
+    def __init__(self, directory: str = RAG_INDEX_DIR, embedder: Optional[Embedder] = None):
+        self.embedder = embedder or get_embedder()
+        self.index = VectorIndex(directory, dim=self.embedder.dim)
+        self.sparse = BM25Index(os.path.join(directory, "bm25.db"))
+        if self.sparse.count != self.index.live_count:
+            self.rebuild_sparse()
+
+    def add_chunks(self, vectors: np.ndarray, metadata: List[dict]) -> List[int]:
+        ids = self.index.add(vectors, metadata)
+        self.sparse.add(ids, [m["text"] for m in metadata])
+        return ids
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]], source: Optional[str] = None) -> int:
+        """Index (doc_id, text) pairs; returns the number of chunks added."""
+        texts, metadata = [], []
+        for doc_id, text in documents:
+            for chunk in chunk_text(text, RAG_CHUNK_WORDS, RAG_CHUNK_OVERLAP):
+                texts.append(chunk)
+                metadata.append({"doc_id": doc_id, "text": chunk, "source": source})
+        if not texts:
+            return 0
+        self.add_chunks(self.embedder.embed(texts), metadata)
+        return len(texts)
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        ids = self.index.delete_docs(doc_ids)
+        self.sparse.delete(ids)
+        return len(ids)
+
+    def rebuild_sparse(self):
+        """Re-derive the BM25 index from the chunk texts (old indexes, or after compact)."""
+        self.sparse.clear()
+        for rows in self.index.iter_chunks():
+            self.sparse.add([r[0] for r in rows], [r[1] for r in rows])
+
+    def compact(self) -> int:
+        removed = self.index.compact()
+        if removed:
+            self.rebuild_sparse()
+        return removed
+
+    def search(self, query: str, k: int = 5, mode: str = RAG_SEARCH_MODE, rerank: bool = RAG_RERANK,
+               timings: Optional[Dict[str, float]] = None) -> List[dict]:
+        """Top-k chunks for a query, best first. Stage latencies (ms) are added to `timings`."""
+        rankings = []
+        n = max(k, RAG_CANDIDATES)
+        if mode in ("hybrid", "dense"):
+            with timed(timings, "embed"):
+                query_vector = self.embedder.embed([query])
+            with timed(timings, "dense"):
+                ids = self.index.search(query_vector, k=n)[1][0]
+            rankings.append([int(i) for i in ids if i >= 0])
+        if mode in ("hybrid", "sparse"):
+            with timed(timings, "sparse"):
+                rankings.append([int(i) for i in self.sparse.search(query, k=n)[1]])
+
+        with timed(timings, "fuse"):
+            fused = rrf_fuse(rankings)
+            if rerank:
+                fused = fused[:max(k, RAG_RERANK_CANDIDATES)]
+            else:
+                fused = fused[:k]
+            metas = self.index.get([i for i, _ in fused])
+            hits = [{**meta, "score": score} for (_, score), meta in zip(fused, metas) if meta is not None]
+
+        if rerank and hits:
+            from reranker import get_reranker
+
+            with timed(timings, "rerank"):
+                scores = get_reranker().score(query, [h["text"] for h in hits])
+                for hit, score in zip(hits, scores):
+                    hit["score"] = float(score)
+                hits.sort(key=lambda h: -h["score"])
+        return hits[:k]
+
+    def build_context(self, query: str, k: int = 5, budget: int = RAG_CONTEXT_TOKENS,
+                      timings: Optional[Dict[str, float]] = None) -> Tuple[str, List[dict]]:
+        """Retrieve, then deduplicate and pack the hits into at most `budget` tokens."""
+        hits = self.search(query, k=k, timings=timings)
+        with timed(timings, "pack"):
+            vectors = None
+            if hits and RAG_DEDUP_THRESHOLD < 1.0:
+                vectors = np.asarray(self.index.matrix()[[h["id"] for h in hits]], dtype=np.float32)
+            return pack_context(hits, budget, vectors)
+
+
+_retriever: Optional[Retriever] = None
+
+
+def get_retriever() -> Retriever:
+    global _retriever
+    if _retriever is None:
+        _retriever = Retriever()
+    return _retriever
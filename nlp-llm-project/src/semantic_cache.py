@@ -0,0 +1,236 @@
+# src/semantic_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from quiz_cache import normalize_topic
+
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))  # cosine similarity
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+SEMANTIC_CACHE_DB = os.getenv("SEMANTIC_CACHE_DB", "semantic_cache.db")  # empty = memory only
+REJECTION_WINDOW = 600  # seconds after a semantic hit in which a no-cache retry counts as a false hit
+
+np = None  # numpy, imported with the embedder on first use so it stays out of app start-up
+
+
+class SemanticCache:
+    """Cache keyed by the meaning of a request rather than its exact text.
+
+    Each entry is (partition, text, vector, value). A lookup embeds the
+    normalized text and returns the most similar live entry in the same
+    partition if its cosine similarity reaches `threshold`; the partition
+    carries everything that must match exactly (difficulties, model, prompt
+    version). The index is a small in-memory matrix scanned with one matmul.
+    Entries are evicted LRU past `max_entries` and expire after `ttl`; with a
+    db_path they are written through to SQLite and reloaded on start.
+
+    The embedder is loaded on first use, or ahead of time on a background
+    thread by load_in_background(); while that load runs, lookups are misses
+    and nothing is stored, so no request waits on a model download. If the
+    embedder cannot be loaded the cache disables itself and every lookup is
+    a miss.
+    """
+
+    def __init__(self, namespace: str, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL,
+                 db_path: str = SEMANTIC_CACHE_DB, embedder=None, enabled: bool = SEMANTIC_CACHE):
+        self.namespace = namespace
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._db_path = db_path
+        self._embedder = embedder
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> (partition, text, vector, value, stored_at)
+        self._matrix = None
+        self._matrix_ids: list = []
+        self._recent_hits = OrderedDict()  # (partition, text) -> time of semantic hit
+        self._db = None
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.false_hits = 0
+        self.similarity_sum = 0.0
+        self._loaded = False
+        self._loader = None  # background load thread, see load_in_background
+
+    # -- setup -------------------------------------------------------------
+
+    def load_in_background(self):
+        """Load the embedder and stored entries on a daemon thread instead of on the first lookup."""
+        if self.enabled and not self._loaded and self._loader is None:
+            self._loader = threading.Thread(target=self._ensure_loaded, name=f"semantic-cache-{self.namespace}",
+                                            daemon=True)
+            self._loader.start()
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded and self.enabled
+
+    def _ensure_loaded(self) -> bool:
+        if not self._loaded and self._loader is not None and threading.current_thread() is not self._loader:
+            return False  # still loading in the background; skip rather than block the caller
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    if self.enabled:
+                        self._load()
+                    self._loaded = True
+        return self.enabled
+
+    def _load(self):
+        global np
+        import numpy as np
+
+        try:
+            if self._embedder is None:
+                from embeddings import get_embedder
+
+                self._embedder = get_embedder()
+        except Exception as e:
+            print(f"Semantic cache '{self.namespace}' disabled, embedder unavailable: {e}")
+            self.enabled = False
+            return
+        if self._db_path:
+            self._db = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS semantic_cache ("
+                "id TEXT PRIMARY KEY, namespace TEXT NOT NULL, embedder TEXT NOT NULL, partition TEXT NOT NULL, "
+                "text TEXT NOT NULL, vector BLOB NOT NULL, value TEXT NOT NULL, stored_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT id, partition, text, vector, value, stored_at FROM semantic_cache "
+                "WHERE namespace = ? AND embedder = ? AND stored_at >= ? ORDER BY accessed_at DESC LIMIT ?",
+                (self.namespace, self._embedder.name, time.time() - self.ttl if self.ttl > 0 else 0,
+                 self.max_entries),
+            ).fetchall()
+            for entry_id, partition, text, vector, value, stored_at in reversed(rows):
+                self._entries[entry_id] = (partition, text, np.frombuffer(vector, dtype=np.float32),
+                                           json.loads(value), stored_at)
+
+    def _entry_id(self, partition: str, text: str) -> str:
+        return hashlib.sha256(json.dumps([self.namespace, partition, text]).encode("utf-8")).hexdigest()
+
+    def _index(self) -> Tuple[Optional["np.ndarray"], list]:
+        if self._matrix is None and self._entries:
+            self._matrix_ids = list(self._entries)
+            self._matrix = np.stack([e[2] for e in self._entries.values()])
+        return self._matrix, self._matrix_ids
+
+    # -- lookups -----------------------------------------------------------
+
+    def get(self, text: str, partition: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, similarity) of the closest cached request, or None on a miss."""
+        if not self._ensure_loaded():
+            return None
+        text = normalize_topic(text)
+        vector = self._embedder.embed([text])[0]
+        now = time.time()
+        with self._lock:
+            matrix, ids = self._index()
+            if matrix is not None:
+                scores = matrix @ vector
+                for pos in np.argsort(-scores):
+                    if scores[pos] < self.threshold:
+                        break
+                    entry_id = ids[pos]
+                    entry = self._entries.get(entry_id)
+                    if entry is None or entry[0] != partition:
+                        continue
+                    if self.ttl > 0 and now - entry[4] > self.ttl:
+                        self._drop(entry_id)
+                        continue
+                    self._entries.move_to_end(entry_id)
+                    similarity = float(scores[pos])
+                    self.hits += 1
+                    self.similarity_sum += similarity
+                    if entry[1] == text:
+                        self.exact_hits += 1
+                    else:
+                        self._note_semantic_hit(partition, text, now)
+                    if self._db is not None:
+                        self._db.execute("UPDATE semantic_cache SET accessed_at = ? WHERE id = ?", (now, entry_id))
+                        self._db.commit()
+                    return entry[3], similarity
+            self.misses += 1
+            return None
+
+    def set(self, text: str, partition: str, value: Any):
+        if not self._ensure_loaded():
+            return
+        text = normalize_topic(text)
+        vector = np.ascontiguousarray(self._embedder.embed([text])[0], dtype=np.float32)
+        entry_id = self._entry_id(partition, text)
+        now = time.time()
+        with self._lock:
+            self._entries[entry_id] = (partition, text, vector, value, now)
+            self._entries.move_to_end(entry_id)
+            self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO semantic_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry_id, self.namespace, self._embedder.name, partition, text, vector.tobytes(),
+                     json.dumps(value, ensure_ascii=False), now, now),
+                )
+                self._db.commit()
+
+    def _drop(self, entry_id: str):
+        self._entries.pop(entry_id, None)
+        self._matrix = None
+        if self._db is not None:
+            self._db.execute("DELETE FROM semantic_cache WHERE id = ?", (entry_id,))
+
+    # -- false hits --------------------------------------------------------
+
+    def _note_semantic_hit(self, partition: str, text: str, now: float):
+        self._recent_hits[(partition, text)] = now
+        self._recent_hits.move_to_end((partition, text))
+        while len(self._recent_hits) > self.max_entries:
+            self._recent_hits.popitem(last=False)
+
+    def record_rejection(self, text: str, partition: str):
+        """A client asked again with the cache bypassed; if we just served it a near match, count a false hit."""
+        key = (partition, normalize_topic(text))
+        with self._lock:
+            served_at = self._recent_hits.pop(key, None)
+            if served_at is not None and time.time() - served_at <= REJECTION_WINDOW:
+                self.false_hits += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            if self._db is not None:
+                self._db.execute("DELETE FROM semantic_cache WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            semantic_hits = self.hits - self.exact_hits
+            prefix = f"semantic_{self.namespace}_"
+            return {
+                prefix + "enabled": self.enabled,
+                prefix + "ready": self.ready,
+                prefix + "hits": self.hits,
+                prefix + "near_hits": semantic_hits,
+                prefix + "misses": self.misses,
+                prefix + "hit_rate": self.hits / lookups if lookups else 0.0,
+                prefix + "false_hits": self.false_hits,
+                prefix + "false_hit_rate": self.false_hits / semantic_hits if semantic_hits else 0.0,
+                prefix + "mean_similarity": self.similarity_sum / self.hits if self.hits else 0.0,
+                prefix + "entries": len(self._entries),
+            }
@@ -0,0 +1,135 @@
+# src/sparse_index.py
+import os
+import re
+import math
+import sqlite3
+import threading
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what "
+    "when where which who why how with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over chunk ids, stored as an inverted index in SQLite.
+
+    Postings carry the chunk length so a query is one range scan per term
+    and the scoring is vectorized in numpy. Ids are the VectorIndex ids of
+    the same chunks.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, id INTEGER NOT NULL, tf INTEGER NOT NULL, dl INTEGER NOT NULL, "
+            "PRIMARY KEY (term, id)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS postings_id ON postings (id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, dl INTEGER NOT NULL)")
+        # running totals, so adds and deletes don't rescan docs for avgdl
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), doc_count INTEGER NOT NULL, total_len INTEGER NOT NULL)"
+        )
+        row = self._db.execute("SELECT doc_count, total_len FROM meta").fetchone()
+        if row is None:  # new index, or one written before the totals were kept
+            row = self._db.execute("SELECT COUNT(*), COALESCE(SUM(dl), 0) FROM docs").fetchone()
+            self._db.execute("INSERT INTO meta VALUES (0, ?, ?)", row)
+        self._db.commit()
+        self._set_totals(*row)
+
+    def _set_totals(self, count: int, total_len: int):
+        self.count, self.total_len = count, total_len
+        self.avgdl = total_len / count if count else 0.0
+
+    def _stored(self, ids: List[int]) -> Tuple[int, int]:
+        """(count, summed length) of those ids that are already indexed."""
+        count = total = 0
+        for lo in range(0, len(ids), 500):
+            part = ids[lo:lo + 500]
+            marks = ",".join("?" * len(part))
+            n, dl = self._db.execute(f"SELECT COUNT(*), COALESCE(SUM(dl), 0) FROM docs WHERE id IN ({marks})",
+                                     part).fetchone()
+            count, total = count + n, total + dl
+        return count, total
+
+    def _commit_totals(self, count: int, total_len: int):
+        self._db.execute("UPDATE meta SET doc_count = ?, total_len = ? WHERE id = 0", (count, total_len))
+        self._db.commit()
+        self._set_totals(count, total_len)
+
+    def add(self, ids: Iterable[int], texts: Iterable[str]):
+        docs, postings = {}, []
+        for i, text in zip(ids, texts):
+            tokens = tokenize(text)
+            docs[i] = len(tokens)
+            postings.extend((term, i, tf, len(tokens)) for term, tf in Counter(tokens).items())
+        if not docs:
+            return
+        with self._lock:
+            replaced, replaced_len = self._stored(list(docs))
+            self._db.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?)", docs.items())
+            self._db.executemany("INSERT OR REPLACE INTO postings VALUES (?, ?, ?, ?)", postings)
+            self._commit_totals(self.count - replaced + len(docs),
+                                self.total_len - replaced_len + sum(docs.values()))
+
+    def delete(self, ids: List[int]):
+        if not ids:
+            return
+        with self._lock:
+            removed, removed_len = self._stored(ids)
+            for lo in range(0, len(ids), 500):
+                part = ids[lo:lo + 500]
+                marks = ",".join("?" * len(part))
+                self._db.execute(f"DELETE FROM postings WHERE id IN ({marks})", part)
+                self._db.execute(f"DELETE FROM docs WHERE id IN ({marks})", part)
+            self._commit_totals(self.count - removed, self.total_len - removed_len)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM docs")
+            self._commit_totals(0, 0)
+
+    def search(self, query: str, k: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, ids) for a query, best first."""
+        terms = set(tokenize(query))
+        if not terms or not self.count:
+            return np.zeros(0, np.float32), np.zeros(0, np.int64)
+        all_ids, all_scores = [], []
+        with self._lock:
+            for term in terms:
+                rows = self._db.execute("SELECT id, tf, dl FROM postings WHERE term = ?", (term,)).fetchall()
+                if not rows:
+                    continue
+                posting = np.array(rows, dtype=np.float64)
+                df = len(rows)
+                idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+                tf, dl = posting[:, 1], posting[:, 2]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * dl / max(self.avgdl, 1e-9))
+                all_ids.append(posting[:, 0].astype(np.int64))
+                all_scores.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+        if not all_ids:
+            return np.zeros(0, np.float32), np.zeros(0, np.int64)
+        ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return scores[top], ids[top]
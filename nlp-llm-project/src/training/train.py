@@ -1,35 +1,299 @@
-from datasets import load_dataset
-from transformers import AutoTokenizer, AutoModelForCausalLM, TrainingArguments, Trainer
+# src/training/train.py
+"""LoRA fine-tuning of the quiz model.
+
+Examples are tokenized once without padding and cached to Arrow under
+TRAIN_CACHE_DIR, keyed by a hash of the tokenizer, the data files and the
+tokenization settings, so reruns skip straight to training. Batches are padded
+only to their longest row by the collator, rows of similar length are grouped
+into the same batch, and with --pack short examples are concatenated into
+max_length rows so little compute goes to padding at all. Packed rows keep an
+all-ones attention mask and continuous positions, so an example can attend to
+the ones before it in the same row, separated only by EOS; leave --pack off
+when examples must be trained in isolation.
+
+Checkpoints are written every --save-steps optimizer steps and a rerun with the
+same --output-dir resumes from the newest complete one, so a crash costs at most
+save_steps of work. --grad-accum raises the effective batch size without raising
+the per-step batch, and --gradient-checkpointing trades recompute for activation
+memory.
+
+    python training/train.py                                  # 7B, 8-bit, fp16 on GPU
+    python training/train.py --config cpu-tiny --max-steps 50 # small model on CPU
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import inspect
+import argparse
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import torch
+from datasets import DatasetDict, load_dataset, load_from_disk
+from datasets.fingerprint import Hasher
+from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, TrainingArguments, Trainer
 from peft import get_peft_model, LoraConfig, TaskType
 
-model_name = "meta-llama/Llama-2-7b"  # example - pick licensed model
-tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
-model = AutoModelForCausalLM.from_pretrained(model_name, device_map="auto", load_in_8bit=True) 
-
-lora_config = LoraConfig(
-    r=8,
-    lora_alpha=32,
-    target_modules=["q_proj", "v_proj"],
-    lora_dropout=0.1,
-    bias="none",
-    task_type=TaskType.CAUSAL_LM
-)
-model = get_peft_model(model, lora_config)
-
-dataset = load_dataset("json", data_files={"train":"data/processed/train.jsonl", "validation":"data/processed/val.jsonl"})
-# tokenization function...
-def tokenize_fn(examples):
-    return tokenizer(examples["input"], truncation=True, padding="max_length", max_length=512)
-
-tokenized = dataset.map(tokenize_fn, batched=True)
-training_args = TrainingArguments(
-    output_dir="outputs",
-    per_device_train_batch_size=4,
-    num_train_epochs=3,
-    save_strategy="epoch",
-    logging_steps=50,
-    fp16=True,
-)
-trainer = Trainer(model=model, args=training_args, train_dataset=tokenized["train"], eval_dataset=tokenized["validation"])
-trainer.train()
-model.save_pretrained("outputs/lora-adapted")
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CONFIGS = {
+    "gpu": {"model": "meta-llama/Llama-2-7b",  # example - pick licensed model
+            "load_in_8bit": True, "fp16": True, "batch_size": 4, "grad_accum": 4, "max_length": 512, "epochs": 3,
+            "gradient_checkpointing": True},
+    "cpu-tiny": {"model": "HuggingFaceTB/SmolLM2-135M",
+                 "load_in_8bit": False, "fp16": False, "batch_size": 8, "grad_accum": 1, "max_length": 256, "epochs": 1,
+                 "gradient_checkpointing": False},
+}
+
+TRAIN_CONFIG = os.getenv("TRAIN_CONFIG", "gpu")
+TRAIN_DATA_DIR = os.getenv("TRAIN_DATA_DIR", "data/processed")
+TRAIN_TEXT_FIELD = os.getenv("TRAIN_TEXT_FIELD", "input")
+TRAIN_CACHE_DIR = os.getenv("TRAIN_CACHE_DIR", "data/cache")
+TRAIN_PACK = os.getenv("TRAIN_PACK", "0") == "1"
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", "0"))  # tokenization processes and data-loader workers
+TRAIN_SAVE_STEPS = int(os.getenv("TRAIN_SAVE_STEPS", "200"))
+TRAIN_SAVE_TOTAL_LIMIT = int(os.getenv("TRAIN_SAVE_TOTAL_LIMIT", "3"))
+TRAIN_LOG_STEPS = int(os.getenv("TRAIN_LOG_STEPS", "10"))
+PAD_TO_MULTIPLE = 8
+PIPELINE_VERSION = 1  # bump when tokenize/pack output changes to invalidate old caches
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def tokenize_fn(examples, tokenizer, max_length: int, text_field: str):
+    enc = tokenizer(examples[text_field], truncation=True, max_length=max_length)
+    enc["length"] = [len(ids) for ids in enc["input_ids"]]
+    return enc
+
+
+def pack_fn(examples, max_length: int, eos_id: int):
+    """Greedily concatenate whole examples, each ending in EOS, into rows of at most max_length tokens.
+
+    The mask is all ones, so attention crosses example boundaries within a row.
+    """
+    rows, current = [], []
+    for ids in examples["input_ids"]:
+        ids = list(ids)
+        if ids[-1] != eos_id and len(ids) < max_length:
+            ids.append(eos_id)
+        if current and len(current) + len(ids) > max_length:
+            rows.append(current)
+            current = []
+        current = current + ids
+    if current:
+        rows.append(current)
+    return {"input_ids": rows, "attention_mask": [[1] * len(r) for r in rows], "length": [len(r) for r in rows]}
+
+
+def cache_key(tokenizer, data_files: Dict[str, str], max_length: int, pack: bool, text_field: str) -> str:
+    files = {split: [path, os.path.getsize(path), os.path.getmtime(path)] for split, path in data_files.items()}
+    settings = json.dumps({"files": files, "max_length": max_length, "pack": pack, "text_field": text_field,
+                           "version": PIPELINE_VERSION}, sort_keys=True)
+    return hashlib.sha256((Hasher.hash(tokenizer) + settings).encode("utf-8")).hexdigest()[:16]
+
+
+def load_tokenized(tokenizer, data_files: Dict[str, str], max_length: int, pack: bool = TRAIN_PACK,
+                   text_field: str = TRAIN_TEXT_FIELD, cache_dir: Optional[str] = TRAIN_CACHE_DIR,
+                   num_proc: int = TRAIN_WORKERS) -> DatasetDict:
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, cache_key(tokenizer, data_files, max_length, pack, text_field))
+        if os.path.isdir(path):
+            print(f"Loaded tokenized dataset from {path}")
+            return load_from_disk(path)
+
+    start = time.perf_counter()
+    dataset = load_dataset("json", data_files=data_files)
+    tokenized = dataset.map(tokenize_fn, batched=True, num_proc=num_proc or None,
+                            remove_columns=dataset["train"].column_names,
+                            fn_kwargs={"tokenizer": tokenizer, "max_length": max_length, "text_field": text_field})
+    if pack:
+        tokenized = tokenized.map(pack_fn, batched=True, remove_columns=tokenized["train"].column_names,
+                                  fn_kwargs={"max_length": max_length, "eos_id": tokenizer.eos_token_id})
+    print(f"Tokenized {sum(len(d) for d in dataset.values())} examples in {time.perf_counter() - start:.1f}s")
+    if path:
+        tokenized.save_to_disk(path)
+        print(f"Cached tokenized dataset to {path}")
+    return tokenized
+
+
+def describe(tokenized: DatasetDict, max_length: int) -> None:
+    for split, ds in tokenized.items():
+        lengths = ds["length"]
+        tokens = sum(lengths)
+        waste = 1 - tokens / (len(lengths) * max_length) if lengths else 0.0
+        print(f"{split}: {len(lengths)} rows, {tokens} tokens, mean length {tokens / max(len(lengths), 1):.0f}, "
+              f"padding waste at fixed max_length={max_length}: {waste:.1%}")
+
+
+@dataclass
+class PaddingCollator:
+    """Pads each batch to its own longest row; padded positions get label -100."""
+    tokenizer: Any
+    pad_to_multiple_of: Optional[int] = PAD_TO_MULTIPLE
+
+    def __call__(self, features: List[Dict[str, Any]]) -> Dict[str, torch.Tensor]:
+        batch = self.tokenizer.pad([{"input_ids": f["input_ids"], "attention_mask": f["attention_mask"]} for f in features],
+                                   padding=True, pad_to_multiple_of=self.pad_to_multiple_of, return_tensors="pt")
+        batch["labels"] = batch["input_ids"].masked_fill(batch["attention_mask"] == 0, -100)
+        return batch
+
+
+class MeteredTrainer(Trainer):
+    """Trainer that adds samples/s, tokens/s, padding-waste ratio and peak RSS to its logs."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.samples = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self._window = (time.perf_counter(), 0, 0)
+
+    def training_step(self, model, inputs, *args, **kwargs):
+        mask = inputs["attention_mask"]
+        self.samples += mask.shape[0]
+        self.real_tokens += int(mask.sum())
+        self.padded_tokens += mask.numel()
+        return super().training_step(model, inputs, *args, **kwargs)
+
+    def log(self, logs, *args, **kwargs):
+        if "loss" in logs:
+            now = time.perf_counter()
+            since, samples, tokens = self._window
+            elapsed = max(now - since, 1e-9)
+            logs["samples_per_sec"] = round((self.samples - samples) / elapsed, 2)
+            logs["tokens_per_sec"] = round((self.real_tokens - tokens) / elapsed, 1)
+            logs["padding_waste"] = round(self.padding_waste(), 4)
+            logs["peak_rss_mb"] = round(peak_rss_mb(), 1)
+            self._window = (now, self.samples, self.real_tokens)
+        super().log(logs, *args, **kwargs)
+
+    def padding_waste(self) -> float:
+        return 1 - self.real_tokens / self.padded_tokens if self.padded_tokens else 0.0
+
+
+def length_grouping() -> Dict[str, Any]:
+    # transformers 5 replaced group_by_length with train_sampling_strategy
+    if "group_by_length" in inspect.signature(TrainingArguments).parameters:
+        return {"group_by_length": True}
+    return {"train_sampling_strategy": "group_by_length"}
+
+
+def last_checkpoint(output_dir: str) -> Optional[str]:
+    """Newest checkpoint-N in output_dir that finished saving (Trainer writes trainer_state.json last)."""
+    if not os.path.isdir(output_dir):
+        return None
+    done = []
+    for name in os.listdir(output_dir):
+        match = re.fullmatch(r"checkpoint-(\d+)", name)
+        if match and os.path.isfile(os.path.join(output_dir, name, "trainer_state.json")):
+            done.append((int(match.group(1)), os.path.join(output_dir, name)))
+    return max(done)[1] if done else None
+
+
+def load_model(name: str, load_in_8bit: bool):
+    if load_in_8bit:
+        return AutoModelForCausalLM.from_pretrained(
+            name, device_map="auto", quantization_config=BitsAndBytesConfig(load_in_8bit=True))
+    return AutoModelForCausalLM.from_pretrained(name, torch_dtype=torch.float32)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="LoRA fine-tuning for the quiz model")
+    parser.add_argument("--config", choices=sorted(CONFIGS), default=TRAIN_CONFIG)
+    parser.add_argument("--model", help="override the config's base model")
+    parser.add_argument("--data-dir", default=TRAIN_DATA_DIR)
+    parser.add_argument("--output-dir", default="outputs")
+    parser.add_argument("--max-length", type=int)
+    parser.add_argument("--batch-size", type=int, help="per-step batch size")
+    parser.add_argument("--grad-accum", type=int, help="steps per optimizer update; effective batch = batch size x this")
+    parser.add_argument("--gradient-checkpointing", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--epochs", type=float)
+    parser.add_argument("--max-steps", type=int, default=-1)
+    parser.add_argument("--pack", action=argparse.BooleanOptionalAction, default=TRAIN_PACK, help="pack short examples into full rows")
+    parser.add_argument("--workers", type=int, default=TRAIN_WORKERS)
+    parser.add_argument("--save-steps", type=int, default=TRAIN_SAVE_STEPS)
+    parser.add_argument("--save-total-limit", type=int, default=TRAIN_SAVE_TOTAL_LIMIT)
+    parser.add_argument("--log-steps", type=int, default=TRAIN_LOG_STEPS)
+    parser.add_argument("--resume", default="auto", help="'auto' (newest checkpoint in --output-dir), 'never', or a checkpoint path")
+    parser.add_argument("--cache-dir", default=TRAIN_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="re-tokenize instead of using the Arrow cache")
+    args = parser.parse_args(argv)
+
+    config = dict(CONFIGS[args.config])
+    for key in ("model", "max_length", "batch_size", "grad_accum", "epochs", "gradient_checkpointing"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    on_gpu = torch.cuda.is_available()
+    if config["load_in_8bit"] and not on_gpu:
+        raise SystemExit(f"Config {args.config!r} needs a GPU; use --config cpu-tiny on CPU")
+
+    tokenizer = AutoTokenizer.from_pretrained(config["model"], use_fast=True)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = load_model(config["model"], config["load_in_8bit"])
+
+    lora_config = LoraConfig(
+        r=8,
+        lora_alpha=32,
+        target_modules=["q_proj", "v_proj"],
+        lora_dropout=0.1,
+        bias="none",
+        task_type=TaskType.CAUSAL_LM
+    )
+    model = get_peft_model(model, lora_config)
+
+    data_files = {"train": os.path.join(args.data_dir, "train.jsonl"),
+                  "validation": os.path.join(args.data_dir, "val.jsonl")}
+    tokenized = load_tokenized(tokenizer, data_files, config["max_length"], pack=args.pack,
+                               cache_dir=None if args.no_cache else args.cache_dir, num_proc=args.workers)
+    describe(tokenized, config["max_length"])
+
+    training_args = TrainingArguments(
+        output_dir=args.output_dir,
+        per_device_train_batch_size=config["batch_size"],
+        gradient_accumulation_steps=config["grad_accum"],
+        gradient_checkpointing=config["gradient_checkpointing"],
+        gradient_checkpointing_kwargs={"use_reentrant": False},  # frozen base: reentrant checkpointing would drop LoRA grads
+        num_train_epochs=config["epochs"],
+        max_steps=args.max_steps,
+        save_strategy="steps",
+        save_steps=args.save_steps,
+        save_total_limit=args.save_total_limit,
+        logging_steps=args.log_steps,
+        fp16=config["fp16"] and on_gpu,
+        use_cpu=not on_gpu,
+        remove_unused_columns=False,  # keep "length" for the sampler; the collator picks its own columns
+        dataloader_num_workers=args.workers,
+        dataloader_persistent_workers=args.workers > 0,
+        dataloader_pin_memory=on_gpu,
+        report_to="none",
+        **length_grouping(),
+    )
+    trainer = MeteredTrainer(model=model, args=training_args, train_dataset=tokenized["train"],
+                             eval_dataset=tokenized["validation"], data_collator=PaddingCollator(tokenizer))
+    resume = {"auto": last_checkpoint(args.output_dir), "never": None}.get(args.resume, args.resume)
+    if resume:
+        print(f"Resuming from {resume}")
+    start = time.perf_counter()
+    trainer.train(resume_from_checkpoint=resume)
+    elapsed = time.perf_counter() - start
+    print(f"Trained on {trainer.samples} samples / {trainer.real_tokens} tokens in {elapsed:.1f}s: "
+          f"{trainer.samples / elapsed:.1f} samples/s, {trainer.real_tokens / elapsed:.0f} tokens/s, "
+          f"padding waste {trainer.padding_waste():.1%}, peak RSS {peak_rss_mb():.0f}MB")
+    model.save_pretrained(os.path.join(args.output_dir, "lora-adapted"))
+
+
+if __name__ == "__main__":
+    main()
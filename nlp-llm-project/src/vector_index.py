@@ -0,0 +1,296 @@
+# src/vector_index.py
+import os
+import json
+import sqlite3
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", "rag_index")
+RAG_VECTOR_DTYPE = os.getenv("RAG_VECTOR_DTYPE", "float32")  # float32 or float16
+RAG_IVF_THRESHOLD = int(os.getenv("RAG_IVF_THRESHOLD", "1000000"))  # use IVF above this many vectors
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "16"))
+SEARCH_BLOCK_ROWS = 65536  # rows scored per matmul, bounds memory on huge indexes
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-wise top-k (descending) of a 2-D score matrix."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((scores.shape[0], 0), np.float32), np.zeros((scores.shape[0], 0), np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part_scores, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def _merge_top_k(a: Tuple[np.ndarray, np.ndarray], b: Tuple[np.ndarray, np.ndarray], k: int):
+    scores = np.concatenate([a[0], b[0]], axis=1)
+    ids = np.concatenate([a[1], b[1]], axis=1)
+    top_scores, pos = _top_k(scores, k)
+    return top_scores, np.take_along_axis(ids, pos, axis=1)
+
+
+class VectorIndex:
+    """Persistent cosine-similarity index over chunk embeddings.
+
+    Layout in `directory`:
+      vectors.bin   raw row-major float32/float16 matrix, appended to, read via np.memmap
+      meta.db       SQLite: one row per live vector id with its document id, text and source,
+                    plus tombstones for vectors whose document was deleted or re-ingested
+      index.json    dim and dtype
+      ivf_*.npy     optional inverted-file index (centroids + posting lists)
+
+    Vectors must be L2-normalized, so the dot product is the cosine score.
+    Search is brute force (vectorized, blockwise over the memmap) unless an
+    IVF index has been built and the index holds at least RAG_IVF_THRESHOLD
+    vectors; rows added after the IVF build are always scanned exactly.
+    Deleted rows stay in vectors.bin (masked out of results) until compact().
+    """
+
+    def __init__(self, directory: str = RAG_INDEX_DIR, dim: Optional[int] = None,
+                 dtype: str = RAG_VECTOR_DTYPE):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.bin")
+        info_path = os.path.join(directory, "index.json")
+        if os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            if dim is not None and dim != info["dim"]:
+                raise ValueError(f"Index at {directory} has dim {info['dim']}, not {dim}")
+            self.dim, self.dtype = info["dim"], np.dtype(info["dtype"])
+        else:
+            if dim is None:
+                raise ValueError(f"No index at {directory}; pass dim to create one")
+            self.dim, self.dtype = dim, np.dtype(dtype)
+            with open(info_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(directory, "meta.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, text TEXT NOT NULL, source TEXT, extra TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tombstones (id INTEGER PRIMARY KEY)")
+        self._db.commit()
+        self._matrix: Optional[np.memmap] = None
+        self._dead: Optional[np.ndarray] = None  # bool mask over rows, None when nothing is deleted
+        self._load_tombstones()
+        self._ivf = self._load_ivf()
+
+    # -- storage -----------------------------------------------------------
+
+    @property
+    def count(self) -> int:
+        if not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self.dim * self.dtype.itemsize)
+
+    def matrix(self) -> np.ndarray:
+        """Read-only memory map of all vectors (remapped after appends)."""
+        with self._lock:
+            n = self.count
+            if self._matrix is None or self._matrix.shape[0] != n:
+                if n == 0:
+                    return np.zeros((0, self.dim), dtype=self.dtype)
+                self._matrix = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(n, self.dim))
+            return self._matrix
+
+    def add(self, vectors: np.ndarray, metadata: List[dict]) -> List[int]:
+        """Append vectors with their metadata (doc_id, text, optional source/extra); returns new ids."""
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of shape (n, {self.dim})")
+        if len(metadata) != len(vectors):
+            raise ValueError("Need one metadata entry per vector")
+        with self._lock:
+            start = self.count
+            ids = list(range(start, start + len(vectors)))
+            self._db.executemany(
+                "INSERT INTO chunks (id, doc_id, text, source, extra) VALUES (?, ?, ?, ?, ?)",
+                [(i, m["doc_id"], m["text"], m.get("source"), json.dumps(m.get("extra")) if m.get("extra") else None)
+                 for i, m in zip(ids, metadata)],
+            )
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._db.commit()
+            if self._dead is not None:
+                self._dead = np.concatenate([self._dead, np.zeros(len(vectors), dtype=bool)])
+        return ids
+
+    def _load_tombstones(self):
+        dead = [r[0] for r in self._db.execute("SELECT id FROM tombstones")]
+        self._dead = None
+        if dead:
+            self._dead = np.zeros(self.count, dtype=bool)
+            self._dead[dead] = True
+
+    @property
+    def live_count(self) -> int:
+        return self.count - (int(self._dead.sum()) if self._dead is not None else 0)
+
+    def delete_docs(self, doc_ids: List[str]) -> List[int]:
+        """Tombstone every chunk of the given documents; returns the removed ids."""
+        if not doc_ids:
+            return []
+        with self._lock:
+            marks = ",".join("?" * len(doc_ids))
+            ids = [r[0] for r in self._db.execute(f"SELECT id FROM chunks WHERE doc_id IN ({marks})", doc_ids)]
+            if ids:
+                self._db.executemany("INSERT OR IGNORE INTO tombstones (id) VALUES (?)", [(i,) for i in ids])
+                self._db.execute(f"DELETE FROM chunks WHERE doc_id IN ({marks})", doc_ids)
+            self._db.commit()
+            if ids:
+                self._load_tombstones()
+        return ids
+
+    def compact(self) -> int:
+        """Rewrite vectors.bin without tombstoned rows and renumber ids; drops the IVF index."""
+        with self._lock:
+            if self._dead is None:
+                return 0
+            matrix = self.matrix()
+            live = np.flatnonzero(~self._dead)
+            tmp = self._vectors_path + ".tmp"
+            with open(tmp, "wb") as f:
+                for lo in range(0, len(live), SEARCH_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(matrix[live[lo:lo + SEARCH_BLOCK_ROWS]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._db.execute("CREATE TEMP TABLE remap (old INTEGER PRIMARY KEY, new INTEGER)")
+            self._db.executemany("INSERT INTO remap VALUES (?, ?)",
+                                 ((int(old), new) for new, old in enumerate(live)))
+            self._db.execute("CREATE TABLE chunks_new AS SELECT remap.new AS id, doc_id, text, source, extra "
+                             "FROM chunks JOIN remap ON chunks.id = remap.old")
+            self._db.execute("DELETE FROM chunks")
+            self._db.execute("INSERT INTO chunks SELECT * FROM chunks_new")
+            self._db.execute("DROP TABLE chunks_new")
+            self._db.execute("DROP TABLE remap")
+            self._db.execute("DELETE FROM tombstones")
+            self._matrix = None
+            os.replace(tmp, self._vectors_path)
+            self._db.commit()
+            removed = int(self._dead.sum())
+            self._dead = None
+            for path in self._ivf_paths():
+                if os.path.exists(path):
+                    os.remove(path)
+            self._ivf = None
+        return removed
+
+    def get(self, ids: List[int]) -> List[Optional[dict]]:
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, doc_id, text, source, extra FROM chunks WHERE id IN ({','.join('?' * len(ids))})",
+                [int(i) for i in ids],
+            ).fetchall()
+        by_id = {r[0]: {"id": r[0], "doc_id": r[1], "text": r[2], "source": r[3],
+                        "extra": json.loads(r[4]) if r[4] else None} for r in rows}
+        return [by_id.get(int(i)) for i in ids]
+
+    def iter_chunks(self, batch: int = 1000) -> Iterator[List[Tuple[int, str]]]:
+        """Live (id, text) pairs in id order, a batch at a time."""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute("SELECT id, text FROM chunks WHERE id > ? ORDER BY id LIMIT ?",
+                                        (last, batch)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last = rows[-1][0]
+
+    # -- search ------------------------------------------------------------
+
+    def _brute_force(self, queries: np.ndarray, k: int, start: int = 0):
+        matrix = self.matrix()
+        best = (np.full((len(queries), 0), -np.inf, np.float32), np.zeros((len(queries), 0), np.int64))
+        for lo in range(start, matrix.shape[0], SEARCH_BLOCK_ROWS):
+            block = np.asarray(matrix[lo:lo + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores = queries @ block.T
+            if self._dead is not None:
+                scores[:, self._dead[lo:lo + len(block)]] = -np.inf
+            scores, ids = _top_k(scores, k)
+            best = _merge_top_k(best, (scores, ids + lo), k)
+        return best
+
+    def _ivf_search(self, queries: np.ndarray, k: int, nprobe: int):
+        centroids, lists, offsets, ivf_count = self._ivf
+        matrix = self.matrix()
+        probe = _top_k(queries @ centroids.T, min(nprobe, len(centroids)))[1]
+        out_scores = np.full((len(queries), k), -np.inf, np.float32)
+        out_ids = np.full((len(queries), k), -1, np.int64)
+        for qi, q in enumerate(queries):
+            cand = np.concatenate([lists[offsets[c]:offsets[c + 1]] for c in probe[qi]])
+            if self._dead is not None:
+                cand = cand[~self._dead[cand]]
+            if len(cand) == 0:
+                continue
+            cand.sort()  # sequential reads from the memmap
+            scores = np.asarray(matrix[cand], dtype=np.float32) @ q
+            s, pos = _top_k(scores[None, :], k)
+            out_scores[qi, :s.shape[1]] = s[0]
+            out_ids[qi, :s.shape[1]] = cand[pos[0]]
+        tail = self._brute_force(queries, k, start=ivf_count) if self.count > ivf_count else None
+        return _merge_top_k((out_scores, out_ids), tail, k) if tail is not None else (out_scores, out_ids)
+
+    def search(self, queries: np.ndarray, k: int = 5, mode: str = "auto",
+               nprobe: int = RAG_IVF_NPROBE) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, ids) per query row. mode: "auto", "exact" or "ivf"."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        use_ivf = self._ivf is not None and (mode == "ivf" or (mode == "auto" and self.count >= RAG_IVF_THRESHOLD))
+        if use_ivf:
+            scores, ids = self._ivf_search(queries, k, nprobe)
+        else:
+            scores, ids = self._brute_force(queries, k)
+        ids[~np.isfinite(scores)] = -1
+        return scores, ids
+
+    # -- IVF ---------------------------------------------------------------
+
+    def _ivf_paths(self):
+        return [os.path.join(self.directory, f"ivf_{name}.npy") for name in ("centroids", "lists", "offsets")]
+
+    def _load_ivf(self):
+        paths = self._ivf_paths()
+        if not all(os.path.exists(p) for p in paths):
+            return None
+        centroids, lists, offsets = (np.load(p) for p in paths)
+        return centroids, lists, offsets, int(offsets[-1])
+
+    def build_ivf(self, n_lists: Optional[int] = None, sample: int = 100_000, iters: int = 10, seed: int = 0):
+        """Cluster vectors with spherical k-means and write posting lists (run offline)."""
+        matrix = self.matrix()
+        n = matrix.shape[0]
+        if n == 0:
+            raise ValueError("Cannot build IVF on an empty index")
+        n_lists = n_lists or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        train = np.asarray(matrix[np.sort(rng.choice(n, size=min(sample, n), replace=False))], dtype=np.float32)
+        centroids = train[rng.choice(len(train), size=min(n_lists, len(train)), replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            empty = np.bincount(assign, minlength=len(centroids)) == 0
+            sums[empty] = centroids[empty]
+            centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True).clip(1e-9)
+
+        assign = np.empty(n, dtype=np.int32)
+        for lo in range(0, n, SEARCH_BLOCK_ROWS):
+            block = np.asarray(matrix[lo:lo + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            assign[lo:lo + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        lists = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))]).astype(np.int64)
+        for path, array in zip(self._ivf_paths(), (centroids.astype(np.float32), lists, offsets)):
+            np.save(path, array)
+        self._ivf = (centroids.astype(np.float32), lists, offsets, n)
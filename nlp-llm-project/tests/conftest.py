@@ -0,0 +1,40 @@
+# tests/conftest.py
+"""Shared fixtures: the benchmark stub server, and the app pointed at it.
+
+app reads its configuration at import, so it is imported once per session
+after use_stub() has set the environment and moved to a scratch directory
+(with the templates linked in, as benchmarks.cold_start does).
+"""
+import os
+
+import pytest
+
+from benchmarks.stub_llm import SRC_DIR, StubLLMServer, use_stub
+
+
+@pytest.fixture(scope="session")
+def session_stub():
+    with StubLLMServer(latency=0.05) as stub:
+        yield stub
+
+
+@pytest.fixture
+def stub(session_stub):
+    """The session stub with its scripted faults and content reset."""
+    content, latency = session_stub.content, session_stub.latency
+    session_stub.failures.clear()
+    yield session_stub
+    session_stub.failures.clear()
+    session_stub.content, session_stub.latency = content, latency
+
+
+@pytest.fixture(scope="session")
+def app_module(session_stub):
+    cwd = os.getcwd()
+    use_stub(session_stub)
+    os.symlink(os.path.join(SRC_DIR, "templates"), "templates")
+    import app
+
+    yield app
+    app.pdf_renderer.shutdown()
+    os.chdir(cwd)
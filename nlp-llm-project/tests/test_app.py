@@ -0,0 +1,115 @@
+# tests/test_app.py
+import json
+import asyncio
+from urllib.parse import unquote
+
+import httpx
+
+
+def request(app_module, method: str, url: str, **kwargs) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(send())
+
+
+def test_pdf_download_name_survives_any_topic(app_module, stub):
+    topic = 'Café "Ökonomie" / 数学'
+    r = request(app_module, "POST", "/generate_pdf", json={"topic": topic})
+    assert r.status_code == 200, r.text
+    assert r.content.startswith(b"%PDF")
+    disposition = r.headers["content-disposition"]
+    disposition.encode("ascii")
+    fallback = disposition.split('filename="')[1].split('"')[0]
+    assert fallback.startswith("quiz_Caf_") and fallback.endswith(".pdf")
+    assert unquote(disposition.split("filename*=UTF-8''")[1]) == fallback
+
+
+def test_quiz_without_difficulties(app_module, stub):
+    r = request(app_module, "POST", "/quiz", json={"topic": "binary search trees", "difficulties": []})
+    assert r.status_code == 200, r.text
+    assert r.json()["quiz"]
+
+
+def test_identical_concurrent_quizzes_share_one_call(app_module, stub):
+    stub.latency = 0.3
+    body = {"topic": "cellular respiration", "difficulties": ["easy", "medium"]}
+    calls, coalesced = stub.calls, request(app_module, "GET", "/cache/stats").json()["coalesced_calls"]
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            return await asyncio.gather(*(client.post("/quiz", json=body) for _ in range(10)))
+
+    responses = asyncio.run(burst())
+    assert all(r.status_code == 200 for r in responses)
+    assert stub.calls == calls + 1
+    assert request(app_module, "GET", "/cache/stats").json()["coalesced_calls"] == coalesced + 9
+    assert len({r.json()["session_id"] for r in responses}) == 10
+
+
+def test_export_stored_quiz_without_model_call(app_module, stub):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            shown = (await client.post("/quiz", json={"topic": "respiration", "no_cache": True})).json()
+            r = await client.post("/quiz/stream", json={"topic": "photosynthesis", "no_cache": True})
+            streamed_id = [json.loads(line) for line in r.text.splitlines() if line][-1]["quiz_id"]
+            calls = stub.calls
+
+            stored = (await client.get(f"/quiz/{shown['quiz_id']}")).json()
+            assert stored["quiz"] == shown["quiz"]
+            for quiz_id in (shown["quiz_id"], streamed_id):
+                pdf = await client.get(f"/quiz/{quiz_id}.pdf")
+                assert pdf.status_code == 200 and pdf.content.startswith(b"%PDF")
+                again = await client.get(f"/quiz/{quiz_id}.pdf", headers={"If-None-Match": pdf.headers["etag"]})
+                assert again.status_code == 304
+            assert (await client.get("/quiz/does-not-exist.pdf")).status_code == 404
+            assert stub.calls == calls
+
+    asyncio.run(scenario())
+
+
+def test_ui_renders_with_lazily_loaded_templates(app_module):
+    r = request(app_module, "GET", "/ui")
+    assert r.status_code == 200 and "<html" in r.text.lower()
+
+
+def stream_events(app_module, body: dict) -> list:
+    r = request(app_module, "POST", "/quiz/stream", json=body)
+    assert r.status_code == 200, r.text
+    return [json.loads(line) for line in r.text.splitlines() if line]
+
+
+def test_stream_emits_questions_as_they_close(app_module, stub):
+    events = stream_events(app_module, {"topic": "stream basics", "no_cache": True})
+    assert [e["event"] for e in events] == ["start", "question", "question", "done"]
+    assert events[-1]["count"] == 2 and events[-1]["quiz_id"]
+
+
+def test_stream_falls_back_to_full_parse(app_module, stub):
+    question = {"question": "Which gas do plants absorb?", "type": "short-answer", "answer": "CO2",
+                "difficulty": "easy"}
+    stub.content = "Here are [2] questions: " + json.dumps([question])
+    events = stream_events(app_module, {"topic": "stream prose", "no_cache": True})
+    assert [e["event"] for e in events] == ["start", "question", "done"]
+    assert events[1]["question"]["question"] == question["question"] and events[-1]["count"] == 1
+
+
+def test_stream_reports_unparseable_output(app_module, stub):
+    stub.content = "Sorry, I cannot write that quiz."
+    events = stream_events(app_module, {"topic": "stream refusal", "no_cache": True})
+    assert [e["event"] for e in events] == ["start", "error"]
+
+
+def test_stream_is_served_from_the_question_bank(app_module, stub):
+    bank = app_module.question_bank
+    questions = [{"question": f"What is fact {i} about tides?", "type": "short-answer", "answer": f"fact {i}",
+                  "difficulty": "easy"} for i in range(2 * bank.quiz_size)]
+    bank.add("ocean tides", questions, app_module.llm_client.LLM_MODEL, app_module.PROMPT_VERSION)
+    calls, served = stub.calls, bank.stats()["bank_served"]
+    events = stream_events(app_module, {"topic": "Ocean Tides", "difficulties": ["easy"]})
+    assert [e["event"] for e in events] == ["start"] + ["question"] * bank.quiz_size + ["done"]
+    assert stub.calls == calls and bank.stats()["bank_served"] == served + 1
@@ -0,0 +1,8 @@
+# tests/test_cold_start.py
+from benchmarks.cold_start import DEFERRED, import_run, scratch_dir
+
+
+def test_heavy_modules_are_not_imported_at_start_up():
+    _, _, loaded = import_run(scratch_dir())
+    assert not loaded, f"imported at start-up but should be deferred (of {DEFERRED})"
+
@@ -0,0 +1,59 @@
+# tests/test_evaluate.py
+import numpy as np
+import pytest
+
+from conversation_store import SQLiteConversationStore
+from eval.evaluate import (build_report, evaluate_classification, iter_conversations, near_duplicates, score_all,
+                           score_batch, synthetic_quizzes)
+from quiz_store import QuizStore
+
+QUESTION = {"question": "What is osmosis?", "type": "short-answer", "answer": "diffusion of water",
+            "difficulty": "hard"}
+
+
+def prompt(topic: str, difficulties: str) -> dict:
+    return {"role": "user", "content": f"Create a JSON quiz about '{topic}' with {difficulties} difficulty "
+                                       "questions. Each question must include question, type, options (if "
+                                       "applicable), answer, and difficulty."}
+
+
+def test_conversations_are_joined_to_stored_quizzes(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+    quizzes = QuizStore(str(tmp_path / "quizzes.db"))
+    store.append("app-session", [prompt("osmosis", "hard"), prompt("cells", "easy, medium"),
+                                 prompt("osmosis", "easy")])
+    store.append("cli-chat", [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}])
+    for topic in ("osmosis", "cells", "osmosis"):
+        quizzes.save(topic, [QUESTION], session_id="app-session")
+    quizzes.save("no session", [QUESTION])
+
+    records = list(iter_conversations(store, str(tmp_path / "quizzes.db")))
+    assert [(r["topic"], r["difficulties"]) for r in records] == [
+        ("osmosis", ["hard"]), ("cells", ["easy", "medium"]), ("osmosis", ["easy"])]
+    assert all(r["questions"] == [QUESTION] for r in records)
+
+
+def test_classification_matches_hand_computed_confusion():
+    # labels a a b b c / preds a b b b a: a tp1 fp1 fn1, b tp2 fp1, c fn1
+    result = evaluate_classification(["a", "b", "b", "b", "a"], ["a", "a", "b", "b", "c"])
+    assert result["accuracy"] == pytest.approx(3 / 5)
+    assert result["f1"] == pytest.approx((2 / 4 + 4 / 5 + 0) / 3)
+    assert evaluate_classification([], []) == {"accuracy": 0.0, "f1": 0.0}
+
+
+def test_near_duplicates_flags_repeats_only():
+    texts = ["What is the powerhouse of the cell?", "Which planet is closest to the sun?",
+             "what is the powerhouse of the cell", "How many legs does a spider have?"]
+    columns = score_batch([{"topic": "t", "questions": [{"question": t} for t in texts]}])
+    assert list(near_duplicates(columns["signature"])) == [False, False, True, False]
+    assert not near_duplicates(columns["signature"], groups=np.array([0, 0, 1, 1])).any()
+
+
+def test_score_all_in_workers_matches_in_process():
+    records = list(synthetic_quizzes(300))
+    report, _ = build_report(score_all(records, workers=2, batch_size=40))
+    expected, _ = build_report(score_all(records, workers=1, batch_size=300))
+    assert report == expected
+    assert report["quizzes"] == 300 and report["questions"] >= 3 * 300
+    assert 0.8 < report["schema_validity_rate"] < 1.0
+    assert 0 < report["duplicate_rate"] < 0.5
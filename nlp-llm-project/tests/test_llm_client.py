@@ -0,0 +1,77 @@
+# tests/test_llm_client.py
+import time
+import asyncio
+
+import pytest
+
+import llm_client
+from circuit_breaker import CircuitBreaker
+from llm_providers import OpenAIProvider
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+RESET = 0.1
+
+
+def tripped_client(stub):
+    """A client whose breaker one 500 has opened, past its reset timeout (the next call is the trial)."""
+    client = llm_client.LLMClient(OpenAIProvider(base_url=stub.base_url, api_key="stub-key"),
+                                  breaker=CircuitBreaker(1, RESET), max_retries=0)
+    stub.failures.append((500, None))
+    with pytest.raises(llm_client.LLMUnavailable):
+        asyncio.run(client.chat_completion(MESSAGES))
+    assert client.breaker.state == "open"
+    time.sleep(RESET * 1.5)
+    assert client.breaker.state == "half-open"
+    return client
+
+
+@pytest.mark.parametrize("status", [429, 400])
+def test_trial_answered_with_client_error_closes_breaker(stub, status):
+    client = tripped_client(stub)
+    stub.failures.append((status, None))
+    with pytest.raises(llm_client.LLMError):
+        asyncio.run(client.chat_completion(MESSAGES))
+    assert client.breaker.state == "closed"
+    assert asyncio.run(client.chat_completion(MESSAGES)) == stub.content
+
+
+def test_cancelled_trial_frees_the_slot(stub):
+    client = tripped_client(stub)
+    stub.latency = 1.0
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(client.chat_completion(MESSAGES), timeout=0.05))
+    assert client.breaker.state == "half-open"
+    stub.latency = 0.01
+    assert asyncio.run(client.chat_completion(MESSAGES)) == stub.content
+    assert client.breaker.state == "closed"
+
+
+def test_cancelled_streaming_trial_frees_the_slot(stub):
+    client = tripped_client(stub)
+
+    async def collect():
+        return "".join([delta async for delta in client.stream_chat_completion(MESSAGES)])
+
+    async def scenario():
+        stub.latency = 1.0
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(collect(), timeout=0.05)
+        stub.latency = 0.01
+        return await collect()
+
+    assert asyncio.run(scenario()) == stub.content
+    assert client.breaker.state == "closed"
+
+
+def test_cancel_during_hedge_delay_cancels_the_primary_call(stub):
+    client = llm_client.LLMClient(OpenAIProvider(base_url=stub.base_url, api_key="stub-key"),
+                                  breaker=CircuitBreaker(3, RESET), max_retries=0, hedge_delay="0.5")
+    stub.latency = 1.0
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.chat_completion(MESSAGES), timeout=0.1)
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(scenario()) == []
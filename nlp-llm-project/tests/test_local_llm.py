@@ -0,0 +1,47 @@
+# tests/test_local_llm.py
+import types
+import asyncio
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from local_llm import BatchEngine
+
+PROMPTS = [[1 + (i * 7 + j) % 120 for j in range(5 + 3 * i)] for i in range(6)]
+NEW_TOKENS = 24
+
+
+@pytest.fixture(scope="module")
+def tiny_model():
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(vocab_size=128, hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+                                      num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=256)
+    return transformers.LlamaForCausalLM(config).eval()
+
+
+def greedy(model, max_batch: int) -> list:
+    engine = BatchEngine(model, types.SimpleNamespace(eos_token_id=None), max_batch=max_batch, temperature=0)
+
+    async def one(prompt):
+        seq = engine.submit(prompt, NEW_TOKENS)
+        tokens = []
+        while (token := await seq.tokens.get()) is not None:
+            tokens.append(token)
+        return tokens
+
+    async def run():
+        return await asyncio.gather(*(one(p) for p in PROMPTS))
+
+    try:
+        return asyncio.run(run())
+    finally:
+        engine.stop()
+
+
+def test_batched_greedy_output_matches_one_at_a_time(tiny_model):
+    alone = greedy(tiny_model, max_batch=1)
+    assert all(len(tokens) == NEW_TOKENS for tokens in alone)
+    assert greedy(tiny_model, max_batch=8) == alone
+
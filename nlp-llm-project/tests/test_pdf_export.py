@@ -0,0 +1,14 @@
+# tests/test_pdf_export.py
+import re
+
+from pdf_export import pdf_filename
+
+KEY = "0123456789abcdef" * 4
+
+
+def test_filename_is_a_safe_slug():
+    assert pdf_filename("Gradient descent", KEY) == "quiz_Gradient_descent_0123456789abcdef.pdf"
+    for topic in ["../../etc/passwd", "a/b\\c", 'Café "Ökonomie"', "x\x00y", "..", "数学", "   "]:
+        name = pdf_filename(topic, KEY)
+        assert re.fullmatch(r"quiz_[A-Za-z0-9_-]*0123456789abcdef\.pdf", name), name
+    assert pdf_filename("../..", KEY) == "quiz_0123456789abcdef.pdf"
@@ -0,0 +1,19 @@
+# tests/test_profiling.py
+import profiling
+from profiling import ProfilingMiddleware
+
+
+def scope(path="/quiz", token=None):
+    headers = [(b"x-profile", token.encode())] if token is not None else []
+    return {"type": "http", "path": path, "headers": headers}
+
+
+def test_wrong_profile_token_falls_back_to_sampling(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    always = ProfilingMiddleware(None, store=object(), enabled=True, sample_rate=1.0)
+    never = ProfilingMiddleware(None, store=object(), enabled=False)
+
+    assert never._wanted(scope(token="secret"))
+    assert not never._wanted(scope(token="wrong"))
+    assert always._wanted(scope(token="wrong"))
+    assert always._wanted(scope())
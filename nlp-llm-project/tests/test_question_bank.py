@@ -0,0 +1,20 @@
+# tests/test_question_bank.py
+from question_bank import QuestionBank, difficulty_quotas
+
+
+def questions(n: int, difficulty: str) -> list:
+    return [{"question": f"What is part {i} of recursion?", "type": "short-answer", "answer": f"part {i}",
+             "difficulty": difficulty} for i in range(n)]
+
+
+def test_quotas_split_the_quiz():
+    assert difficulty_quotas(["Easy", "hard", "easy"], 5) == {"easy": 3, "hard": 2}
+    assert difficulty_quotas(["easy", "medium", "hard"], 2) == {"easy": 1, "medium": 1}
+    assert difficulty_quotas([], 5) == difficulty_quotas(None, 5) == {}
+
+
+def test_assemble_without_difficulties_defers_to_the_model(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.db"), cooldown=0)
+    bank.add("recursion", questions(20, "easy"))
+    assert bank.assemble("recursion", []) is None
+    assert len(bank.assemble("recursion", ["easy"])) == bank.quiz_size
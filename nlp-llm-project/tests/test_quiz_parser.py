@@ -0,0 +1,52 @@
+# tests/test_quiz_parser.py
+import json
+
+import pytest
+
+from quiz_parser import QuizParseError, extract_json_block, load_quiz_items, repair_json
+
+Q1 = {"question": "What is 2 + 2?", "type": "multiple-choice", "options": ["3", "4"], "answer": "4",
+      "difficulty": "easy"}
+Q2 = {"question": "Name a prime.", "type": "short-answer", "answer": "2", "difficulty": "medium"}
+
+
+def test_repair_salvages_truncated_array():
+    text = json.dumps([Q1, Q2])[:-20]
+    assert json.loads(repair_json(text)) == [Q1]
+
+
+@pytest.mark.parametrize("cut", [10, 25, 60])
+def test_repair_salvages_truncated_questions_object(cut):
+    text = json.dumps({"questions": [Q1, Q2]})[:-cut]
+    assert json.loads(repair_json(text)) == {"questions": [Q1]}
+
+
+def test_repair_fixes_llm_defects():
+    text = "[{'question': 'Is it?', 'type': 'true-false', 'answer': True,},]"
+    assert json.loads(repair_json(text)) == [{"question": "Is it?", "type": "true-false", "answer": True}]
+
+
+def test_truncated_questions_object_loads():
+    items, repaired = load_quiz_items("```json\n" + json.dumps({"questions": [Q1, Q2]})[:-15])
+    assert items == [Q1] and repaired
+
+
+@pytest.mark.parametrize("text", [
+    "Here is a quiz on [topic]: " + json.dumps([Q1, Q2]),
+    "Quiz (see {notes} below)\n```json\n" + json.dumps({"questions": [Q1, Q2]}) + "\n```",
+    "[1, 2] " + json.dumps([Q1, Q2]),
+    json.dumps({"quiz": {"title": "Maths", "questions": [Q1, Q2]}, "meta": []}),
+])
+def test_extract_skips_blocks_that_are_not_a_quiz(text):
+    items, _ = load_quiz_items(text)
+    assert items == [Q1, Q2]
+    assert json.loads(repair_json(extract_json_block(text))) in ([Q1, Q2], {"questions": [Q1, Q2]},
+                                                                {"title": "Maths", "questions": [Q1, Q2]})
+
+
+def test_no_quiz_keeps_first_error():
+    with pytest.raises(QuizParseError, match="No JSON"):
+        load_quiz_items("no brackets at all")
+    with pytest.raises(QuizParseError, match="Expected a list"):
+        load_quiz_items('{"a": 1} {"b": 2}')
+    assert load_quiz_items("[]") == ([], False)
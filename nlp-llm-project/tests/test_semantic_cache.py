@@ -0,0 +1,29 @@
+# tests/test_semantic_cache.py
+import threading
+
+import embeddings
+from embeddings import HashingEmbedder
+from semantic_cache import SemanticCache
+
+
+def test_lookups_skip_while_the_embedder_loads_in_the_background(monkeypatch):
+    release = threading.Event()
+
+    def slow_embedder():
+        release.wait(5)
+        return HashingEmbedder()
+
+    monkeypatch.setattr(embeddings, "get_embedder", slow_embedder)
+    cache = SemanticCache("test", db_path="", enabled=True)
+    cache.load_in_background()
+
+    cache.set("recursion", "p", ["q1"])  # dropped, not blocked on the load
+    assert cache.get("recursion", "p") is None
+    assert not cache.stats()["semantic_test_ready"]
+
+    release.set()
+    cache._loader.join(5)
+    assert cache.ready
+    cache.set("recursion", "p", ["q1"])
+    value, similarity = cache.get("Recursion", "p")
+    assert value == ["q1"] and similarity > 0.99
@@ -0,0 +1,44 @@
+# tests/test_sparse_index.py
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from sparse_index import BM25Index
+
+
+def scanned(path: str):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT COUNT(*), COALESCE(SUM(dl), 0) FROM docs").fetchone()
+    finally:
+        db.close()
+
+
+def test_running_totals_follow_adds_deletes_and_reopen(tmp_path):
+    path = str(tmp_path / "bm25.db")
+    index = BM25Index(path)
+    index.add([1, 2, 3], ["gradient descent step", "learning rate schedule tuning", "momentum"])
+    index.add([3, 4], ["momentum and nesterov momentum", "adam optimizer"])  # 3 is replaced
+    index.delete([2, 99])
+    assert (index.count, index.total_len) == scanned(path) == (3, 8)
+    assert index.avgdl == pytest.approx(8 / 3)
+
+    reopened = BM25Index(path)
+    assert (reopened.count, reopened.total_len) == (3, 8)
+    assert list(reopened.search("momentum")[1]) == [3]
+
+    reopened.clear()
+    assert (reopened.count, reopened.total_len, reopened.avgdl) == (0, 0, 0.0)
+
+
+def test_index_without_totals_is_backfilled(tmp_path):
+    path = str(tmp_path / "bm25.db")
+    BM25Index(path).add([1, 2], ["photosynthesis in plants", "chlorophyll"])
+    db = sqlite3.connect(path)
+    db.execute("DROP TABLE meta")
+    db.commit()
+    db.close()
+    index = BM25Index(path)
+    assert (index.count, index.total_len) == scanned(path) == (2, 3)
@@ -0,0 +1,60 @@
+# tests/test_train.py
+import json
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("datasets")
+pytest.importorskip("peft")
+transformers = pytest.importorskip("transformers")
+
+from tokenizers import Tokenizer, models, pre_tokenizers  # noqa: E402
+
+from training.train import last_checkpoint, main  # noqa: E402
+
+TEXTS = ["What is recursion? A function calling itself.",
+         "What is a stack? A last in, first out list.",
+         "What is a queue? A first in, first out list.",
+         "What is a tree? A graph without cycles."]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A randomly initialised two-layer Llama with a word-level tokenizer, so the test runs offline."""
+    path = tmp_path_factory.mktemp("tiny-llama")
+    words = sorted({w for text in TEXTS for w in text.replace("?", " ?").replace(".", " .").replace(",", " ,").split()})
+    vocab = {token: i for i, token in enumerate(["<unk>", "<s>", "</s>"] + words)}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer = transformers.PreTrainedTokenizerFast(tokenizer_object=backend, unk_token="<unk>", bos_token="<s>",
+                                                     eos_token="</s>")
+    tokenizer.save_pretrained(path)
+    config = transformers.LlamaConfig(vocab_size=len(vocab), hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+                                      num_attention_heads=2, num_key_value_heads=2, max_position_embeddings=64,
+                                      bos_token_id=1, eos_token_id=2)
+    transformers.LlamaForCausalLM(config).save_pretrained(path)
+    return str(path)
+
+
+def test_cpu_tiny_run_checkpoints_and_resumes(tiny_model, tmp_path, capsys):
+    data = tmp_path / "data"
+    data.mkdir()
+    for split in ("train", "val"):
+        (data / f"{split}.jsonl").write_text("".join(json.dumps({"input": t}) + "\n" for t in TEXTS))
+    output = tmp_path / "outputs"
+    args = ["--config", "cpu-tiny", "--model", tiny_model, "--data-dir", str(data), "--output-dir", str(output),
+            "--cache-dir", str(tmp_path / "cache"), "--batch-size", "2", "--save-steps", "1"]
+
+    main(args + ["--max-steps", "2"])
+    checkpoint = last_checkpoint(str(output))
+    assert checkpoint == str(output / "checkpoint-2")
+    assert os.path.isdir(output / "lora-adapted")
+    first = capsys.readouterr().out
+    assert "Resuming" not in first and "Cached tokenized dataset" in first
+
+    main(args + ["--max-steps", "3"])
+    second = capsys.readouterr().out
+    assert f"Resuming from {checkpoint}" in second
+    assert "Loaded tokenized dataset" in second
+    assert last_checkpoint(str(output)) == str(output / "checkpoint-3")